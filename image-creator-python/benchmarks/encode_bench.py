@@ -0,0 +1,80 @@
+# encode_bench.py - 인코더 프로필별 인코딩 시간/파일 크기 측정
+#
+# 사용법:
+#   python benchmarks/encode_bench.py                 # 합성 샘플 프레임 (1920x1080)
+#   python benchmarks/encode_bench.py a.png b.png     # 실제 생성 이미지로 측정
+#   python benchmarks/encode_bench.py --repeat 5 --json
+import argparse
+import json
+import os
+import sys
+import time
+from io import BytesIO
+
+from PIL import Image, ImageDraw, ImageFilter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nano_banana.encoders import ENCODER_PROFILES  # noqa: E402
+
+
+def synthetic_frames(size=(1920, 1080)):
+    """사진과 비슷한 합성 프레임 (그라데이션 + 노이즈 + 도형) 2장"""
+    frames = []
+    for seed in range(2):
+        gradient = Image.linear_gradient('L').resize(size).convert('RGB')
+        noise = Image.effect_noise(size, 40 + seed * 20).convert('RGB')
+        image = Image.blend(gradient, noise, 0.35)
+        draw = ImageDraw.Draw(image)
+        for i in range(12):
+            x = (i * 157 + seed * 61) % size[0]
+            y = (i * 89 + seed * 37) % size[1]
+            draw.ellipse((x, y, x + 220, y + 160), fill=((i * 40) % 256, 120, (255 - i * 20) % 256))
+        frames.append(image.filter(ImageFilter.GaussianBlur(1.5)))
+    return frames
+
+
+def bench_profile(profile, frames, repeat):
+    times = []
+    sizes = []
+    for frame in frames:
+        if profile["format"] == "JPEG" and frame.mode == 'RGBA':
+            frame = frame.convert('RGB')
+        for _ in range(repeat):
+            buffer = BytesIO()
+            start = time.perf_counter()
+            frame.save(buffer, format=profile["format"], **profile["params"])
+            times.append(time.perf_counter() - start)
+        sizes.append(buffer.tell())
+    return {
+        "encode_ms": 1000 * sum(times) / len(times),
+        "kb_per_image": sum(sizes) / len(sizes) / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Encoder profile micro-benchmark")
+    parser.add_argument("images", nargs="*", help="sample images (default: synthetic 1920x1080 frames)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--profiles", default=",".join(ENCODER_PROFILES))
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    frames = [Image.open(path).convert('RGB') for path in args.images] or synthetic_frames()
+
+    results = {}
+    for name in args.profiles.split(","):
+        results[name] = bench_profile(ENCODER_PROFILES[name], frames, args.repeat)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{len(frames)} frame(s) x {args.repeat} repeat(s)")
+    print(f"{'profile':<16}{'encode ms':>12}{'KB/image':>12}")
+    for name, result in results.items():
+        print(f"{name:<16}{result['encode_ms']:>12.1f}{result['kb_per_image']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
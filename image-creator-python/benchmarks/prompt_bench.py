@@ -0,0 +1,90 @@
+# prompt_bench.py - 프롬프트 컴파일 속도 측정 (prompts/second)
+#
+# 사용법:
+#   python benchmarks/prompt_bench.py                  # 10,000 장면, v1 + v2
+#   python benchmarks/prompt_bench.py --scenes 50000 --variant v2
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nano_banana.cli import GENERATOR_MODULES, load_generator_class  # noqa: E402
+
+DESCRIPTIONS = [
+    "현대적인 병원 진료실에서 의사가 환자와 상담",
+    "붐비는 서울 명동 거리",
+    "A soft 3D educational illustration of healthy blood vessels",
+    "Infographic chart comparing blood pressure levels",
+    "노인이 공원에서 산책하는 모습",
+    "Close-up of a Korean grandmother cooking in a modern kitchen",
+    "혈관 다이어그램 일러스트",
+    "Family dinner in a contemporary apartment",
+]
+
+
+def make_config(scene_count, seed=0):
+    rng = random.Random(seed)
+    scenes = []
+    for i in range(scene_count):
+        scenes.append({
+            "SCENE_NUMBER": i + 1,
+            "TITLE": f"scene_{i + 1}",
+            "DESCRIPTION": f"{rng.choice(DESCRIPTIONS)} #{i}",
+            "CHARACTERS": rng.choice([[], ["DOCTOR"], ["DOCTOR", "PATIENT"]]),
+            "CAMERA": rng.choice([{}, {"shot": "medium shot"}, {"shot": "wide shot", "angle": "eye level", "lens": "35mm"}]),
+        })
+    return {
+        "OUTPUT_RULES": {"aspect_ratio": "16:9", "size": "1920x1080", "disallow": ["collage", "grid", "text"]},
+        "STYLE": {"photorealism": True, "cinematic": True, "color_grade": "natural warm"},
+        "NEGATIVE_PROMPTS": ["cartoon", "anime"],
+        "CHARACTER_BIBLE": {
+            "DOCTOR": {"age": "40s", "appearance": "short hair", "clothing": "white coat", "description": "doctor"},
+            "PATIENT": {"age": "70s", "appearance": "grey hair", "description": "elderly patient"},
+        },
+        "RUN": {"SCENES": scenes},
+    }
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prompt compiler benchmark")
+    parser.add_argument("--scenes", type=int, default=10000)
+    parser.add_argument("--variant", choices=sorted(GENERATOR_MODULES) + ["all"], default="all")
+    args = parser.parse_args()
+
+    config = make_config(args.scenes)
+    variants = sorted(GENERATOR_MODULES) if args.variant == "all" else [args.variant]
+
+    print(f"{args.scenes} scenes")
+    print(f"{'variant':<8}{'mode':<34}{'prompts/s':>14}")
+    for variant in variants:
+        generator = load_generator_class(variant)("benchmark", config)
+        scenes = generator.scenes
+
+        def rebuild_per_scene():
+            # 이전 동작: 장면마다 스타일/네거티브 등 고정 조각을 다시 생성
+            prompts = []
+            for scene in scenes:
+                generator._compile_prompt_fragments()
+                prompts.append(generator._final_prompt(scene))
+            return prompts
+
+        modes = [
+            ("rebuild fragments per scene", rebuild_per_scene),
+            ("precompiled (compile_prompts)", generator.compile_prompts),
+        ]
+        for name, fn in modes:
+            elapsed = timed(fn)
+            print(f"{variant:<8}{name:<34}{len(scenes) / elapsed:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# throughput_bench.py - 가짜 Gemini 백엔드로 generate_all_images 파이프라인 처리량 측정 (API 할당량 사용 없음)
+#
+# 사용법:
+#   python benchmarks/throughput_bench.py
+#   python benchmarks/throughput_bench.py --workers 5,10,50 --scenes 50,200 --latency 3 --jitter 1 --rate-limit 0.05
+#   python benchmarks/throughput_bench.py --encoder png     # 앱 기본 인코더 (느림)
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def make_config(scene_count, encoder):
+    return {
+        "OUTPUT_RULES": {"aspect_ratio": "16:9", "size": "1920x1080", "encoder": encoder},
+        "STYLE": {"photorealism": True, "cinematic": True},
+        "RUN": {"SCENES": [
+            {"SCENE_NUMBER": i + 1, "TITLE": f"bench_{i + 1}", "DESCRIPTION": f"붐비는 서울 거리 #{i}"}
+            for i in range(scene_count)
+        ]},
+    }
+
+
+async def run_once(args, workers, scene_count):
+    from nano_banana.cli import load_generator_class
+    from nano_banana.engine import generate_scenes
+    from nano_banana.fake_backend import FakeGeminiClient
+    from nano_banana.rate_limit import RateLimiter
+
+    client = FakeGeminiClient(
+        image_size=args.image_size, latency=args.latency, jitter=args.jitter,
+        rate_limit_probability=args.rate_limit, retry_after=args.retry_after, seed=args.seed
+    )
+    config = make_config(scene_count, args.encoder)
+    generator = load_generator_class(args.variant)(None, config, use_cache=False, client=client)
+    # 실행마다 새 제한기 (이전 실행의 429 정지가 다음 측정에 영향을 주지 않도록)
+    generator.key_pool.slots[0].limiter = RateLimiter(args.rpm)
+
+    # 장면별 지연 시간 (동시 실행 슬롯을 얻은 시점 → 완료)
+    latencies = []
+    generate_scene_async = generator.generate_scene_async
+
+    async def timed_generate(*call_args, **call_kwargs):
+        started = time.perf_counter()
+        result = await generate_scene_async(*call_args, **call_kwargs)
+        latencies.append(time.perf_counter() - started)
+        return result
+
+    generator.generate_scene_async = timed_generate
+
+    cpu_started = time.process_time()
+    generator.compile_prompts()
+    prompt_cpu = time.process_time() - cpu_started
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="nano_banana_bench_") as output_dir:
+        cpu_started = time.process_time()
+        started = time.perf_counter()
+        async for result in generate_scenes(generator, generator.scenes, output_dir, 3, workers):
+            results.append(result)
+        elapsed = time.perf_counter() - started
+        main_cpu = time.process_time() - cpu_started
+
+    timings = [r.get('timings', {}) for r in results if r['success']]
+    return {
+        "workers": workers,
+        "scenes": scene_count,
+        "succeeded": sum(1 for r in results if r['success']),
+        "elapsed_s": elapsed,
+        "scenes_per_s": scene_count / elapsed,
+        "p50_s": percentile(latencies, 50),
+        "p95_s": percentile(latencies, 95),
+        "p99_s": percentile(latencies, 99),
+        "rate_limited": client.rate_limited,
+        "cpu_prompt_s": prompt_cpu,
+        "cpu_main_s": main_cpu,
+        "cpu_postprocess_s": sum(t.get("postprocess_cpu", 0.0) for t in timings),
+        "api_wall_mean_s": sum(t.get("api", 0.0) for t in timings) / max(1, len(timings)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline throughput benchmark with a fake Gemini backend")
+    parser.add_argument("--workers", default="1,5,10,25", help="comma-separated concurrency values")
+    parser.add_argument("--scenes", default="20,100", help="comma-separated scene counts")
+    parser.add_argument("--variant", default="v2", choices=["v1", "v2"])
+    parser.add_argument("--encoder", default="png-fast", help="OUTPUT_RULES.encoder profile")
+    parser.add_argument("--image-size", default="native",
+                        help="fake response size (WxH), or 'native' for the requested aspect ratio's model resolution")
+    parser.add_argument("--latency", type=float, default=1.0, help="mean API latency (s)")
+    parser.add_argument("--jitter", type=float, default=0.3, help="latency std-dev (s)")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="probability of an injected 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="retry delay reported by injected 429s (s)")
+    parser.add_argument("--rpm", type=int, default=100000, help="rate limiter requests/minute")
+    parser.add_argument("--cpu-workers", type=int, help="post-processing processes (default: CPU count)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+    args.image_size = None if args.image_size == "native" else tuple(int(v) for v in args.image_size.split("x"))
+
+    if args.cpu_workers:
+        os.environ["NANO_BANANA_CPU_WORKERS"] = str(args.cpu_workers)
+
+    rows = []
+    for scene_count in [int(v) for v in args.scenes.split(",")]:
+        for workers in [int(v) for v in args.workers.split(",")]:
+            # 생성기의 print 로그는 stderr로 (결과 표와 섞이지 않도록)
+            with contextlib.redirect_stdout(sys.stderr):
+                rows.append(asyncio.run(run_once(args, workers, scene_count)))
+            if not args.json:
+                row = rows[-1]
+                if len(rows) == 1:
+                    print(f"{'workers':>8}{'scenes':>8}{'ok':>6}{'scenes/s':>10}{'p50':>8}{'p95':>8}{'p99':>8}"
+                          f"{'429s':>6}{'cpu prompt':>12}{'cpu main':>10}{'cpu post':>10}")
+                print(f"{row['workers']:>8}{row['scenes']:>8}{row['succeeded']:>6}{row['scenes_per_s']:>10.2f}"
+                      f"{row['p50_s']:>8.2f}{row['p95_s']:>8.2f}{row['p99_s']:>8.2f}{row['rate_limited']:>6}"
+                      f"{row['cpu_prompt_s']:>12.3f}{row['cpu_main_s']:>10.2f}{row['cpu_postprocess_s']:>10.2f}")
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+
+
+if __name__ == "__main__":
+    main()
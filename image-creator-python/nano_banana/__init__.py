@@ -0,0 +1 @@
+"""Nano Banana 이미지 생성기 공용 모듈 (Gradio 앱에서 공유)"""
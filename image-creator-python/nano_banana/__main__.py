@@ -0,0 +1,3 @@
+from nano_banana.cli import main
+
+main()
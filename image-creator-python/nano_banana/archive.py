@@ -0,0 +1,94 @@
+"""스트리밍 ZIP - 장면이 완료될 때마다 바로 추가 (실행 중에도 부분 ZIP 다운로드 가능)"""
+import os
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import datetime
+
+# PNG/WebP/JPEG는 이미 압축되어 있으므로 기본은 무압축 저장
+COMPRESSION_METHODS = {
+    "stored": zipfile.ZIP_STORED,
+    "deflated": zipfile.ZIP_DEFLATED,
+    "bzip2": zipfile.ZIP_BZIP2,
+    "lzma": zipfile.ZIP_LZMA,
+}
+
+
+def parse_compression(name):
+    """OUTPUT_RULES.zip_compression 값 → zipfile 상수 (알 수 없으면 stored)"""
+    return COMPRESSION_METHODS.get(str(name or "stored").lower(), zipfile.ZIP_STORED)
+
+
+def new_zip_path(directory=None):
+    """타임스탬프 ZIP 경로 생성"""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    zip_filename = f"nano_banana_scenes_{timestamp}.zip"
+    return os.path.join(directory or tempfile.gettempdir(), zip_filename)
+
+
+class StreamingZip:
+    """점진적으로 항목을 추가하는 ZIP 작성기
+
+    checkpoint()는 ZIP을 닫았다가 append 모드로 다시 열어 중앙 디렉토리를 기록하므로,
+    그 시점의 파일은 그대로 열 수 있는 완전한 ZIP이 된다.
+
+    부분 ZIP을 내보낼 때마다 Gradio가 파일 전체를 해시/복사하므로, 항목 수가 checkpoint_growth배
+    이상 늘었을 때만 checkpoint (1, 2, 4, 8, ... → 복사량 합계가 최종 ZIP 크기의 약 2배 이하)
+    """
+
+    def __init__(self, zip_path=None, compression=zipfile.ZIP_STORED, checkpoint_interval=5.0, checkpoint_growth=2.0):
+        self.zip_path = zip_path or new_zip_path()
+        self.compression = compression
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoint_growth = checkpoint_growth
+        self.count = 0
+        self._checkpointed_count = 0
+        self._last_checkpoint = 0.0
+        self._lock = threading.Lock()
+        self._zipf = zipfile.ZipFile(self.zip_path, 'w', self.compression)
+
+    def add_file(self, filepath, arcname=None):
+        with self._lock:
+            self._zipf.write(filepath, arcname or os.path.basename(filepath))
+            self.count += 1
+
+    def add_bytes(self, arcname, data):
+        with self._lock:
+            self._zipf.writestr(arcname, data, compress_type=self.compression)
+            self.count += 1
+
+    def add_output(self, filepath, data=None):
+        """생성 결과 추가 - data(인코딩된 bytes)가 있으면 디스크를 다시 읽지 않고 바로 기록"""
+        if data is None:
+            self.add_file(filepath)
+        else:
+            self.add_bytes(os.path.basename(filepath), data)
+
+    def checkpoint(self, force=False):
+        """항목 수가 checkpoint_growth배 늘었고 간격이 지났으면 중앙 디렉토리 기록 → 기록했으면 True"""
+        with self._lock:
+            if self._zipf is None or self.count == self._checkpointed_count:
+                return False
+            now = time.monotonic()
+            if not force and (now - self._last_checkpoint < self.checkpoint_interval
+                              or self.count < self._checkpointed_count * self.checkpoint_growth):
+                return False
+            self._zipf.close()
+            self._zipf = zipfile.ZipFile(self.zip_path, 'a', self.compression)
+            self._checkpointed_count = self.count
+            self._last_checkpoint = now
+            return True
+
+    def close(self):
+        with self._lock:
+            if self._zipf is not None:
+                self._zipf.close()
+                self._zipf = None
+        return self.zip_path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
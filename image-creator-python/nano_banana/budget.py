@@ -0,0 +1,164 @@
+"""실행 예산 - API 호출 수 / 추정 비용 / 경과 시간 상한 + 비용·완료 시간 예측
+
+engine.generate_scenes가 장면을 제출하기 전에 admissible()로 확인해서, 예산을 넘길 것 같으면
+새 장면 제출을 멈춤 (진행 중인 장면은 끝까지). 생성기는 API 호출(재시도 포함)마다 take_call()로
+호출 상한/시간 상한을 다시 확인하므로 재시도가 예산을 넘기지 않음.
+
+기본값은 환경변수 (0 = 제한 없음):
+    NANO_BANANA_MAX_CALLS, NANO_BANANA_MAX_COST (USD), NANO_BANANA_MAX_MINUTES,
+    NANO_BANANA_COST_PER_CALL (기본 0.04 - 이미지 한 장 요청의 추정 비용)
+"""
+import os
+import time
+
+COST_PER_CALL = float(os.environ.get("NANO_BANANA_COST_PER_CALL", "0.04"))
+MAX_CALLS = int(os.environ.get("NANO_BANANA_MAX_CALLS", "0"))
+MAX_COST = float(os.environ.get("NANO_BANANA_MAX_COST", "0"))
+MAX_MINUTES = float(os.environ.get("NANO_BANANA_MAX_MINUTES", "0"))
+
+
+def _duration(seconds):
+    if seconds < 10:
+        return f"{seconds:.1f}s"
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+class RunBudget:
+    """한 실행의 호출/비용/시간 상한 (None이면 환경변수 기본값, 0이면 제한 없음)"""
+
+    def __init__(self, max_calls=None, max_cost=None, max_minutes=None, cost_per_call=None):
+        self.max_calls = int(MAX_CALLS if max_calls is None else max_calls or 0)
+        self.max_cost = float(MAX_COST if max_cost is None else max_cost or 0)
+        self.max_seconds = float(MAX_MINUTES if max_minutes is None else max_minutes or 0) * 60
+        self.cost_per_call = float(COST_PER_CALL if cost_per_call is None else cost_per_call)
+        self.started = time.monotonic()
+        self.calls = 0
+        self.refused_calls = 0
+        self.scenes_done = 0
+        self._scene_seconds = 0.0
+        self.blocked = None  # 지금 제출을 막고 있는 예산 (진행 중인 장면이 끝나면 다시 확인)
+        self.stopped = None  # 남은 장면이 있는데 제출을 멈춘 이유
+
+    @property
+    def call_limit(self):
+        """호출 상한 (호출 수 / 비용 상한 중 작은 쪽, 없으면 None)"""
+        limits = []
+        if self.max_calls:
+            limits.append(self.max_calls)
+        if self.max_cost and self.cost_per_call > 0:
+            limits.append(int(self.max_cost / self.cost_per_call + 1e-9))
+        return min(limits) if limits else None
+
+    @property
+    def enabled(self):
+        return self.call_limit is not None or self.max_seconds > 0
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    @property
+    def cost(self):
+        return self.calls * self.cost_per_call
+
+    def _limit_text(self):
+        limit = self.call_limit
+        parts = []
+        if limit is not None:
+            parts.append(f"{limit} calls / ${limit * self.cost_per_call:.2f}")
+        if self.max_seconds:
+            parts.append(_duration(self.max_seconds))
+        return ", ".join(parts)
+
+    def time_left(self):
+        """남은 시간 예산 (초, 시간 상한이 없으면 None)"""
+        return max(0.0, self.max_seconds - self.elapsed) if self.max_seconds else None
+
+    def expected_scene_seconds(self):
+        """끝난 장면들의 평균 처리 시간 (아직 없으면 0)"""
+        return self._scene_seconds / self.scenes_done if self.scenes_done else 0.0
+
+    def admissible(self, in_flight):
+        """지금 새로 제출해도 되는 장면 수 (None = 제한 없음)
+
+        진행 중인 장면은 호출 1번씩 예약된 것으로 계산 (재시도/캐시 적중은 끝난 뒤 실제 호출 수로 반영).
+        시간 상한은 경과 시간 + 평균 장면 처리 시간이 넘으면 더 제출하지 않음.
+        """
+        allowed = None
+        self.blocked = None
+        limit = self.call_limit
+        if limit is not None:
+            allowed = max(0, limit - self.calls - in_flight)
+            if not allowed:
+                self.blocked = f"API call budget reached ({self.calls} calls, ${self.cost:.2f} of ${limit * self.cost_per_call:.2f})"
+        if self.max_seconds and self.elapsed + self.expected_scene_seconds() > self.max_seconds:
+            allowed = 0
+            self.blocked = f"time budget reached ({_duration(self.elapsed)} of {_duration(self.max_seconds)})"
+        return allowed
+
+    def stop(self):
+        """남은 장면을 제출하지 않고 종료 (blocked 이유 유지)"""
+        self.stopped = self.blocked
+
+    def take_call(self):
+        """API 호출 한 번 (재시도 포함) 기록 - 호출/시간 상한을 넘으면 False (호출하지 않음)"""
+        limit = self.call_limit
+        if (limit is not None and self.calls >= limit) or (self.max_seconds and self.elapsed > self.max_seconds):
+            self.refused_calls += 1
+            return False
+        self.calls += 1
+        return True
+
+    def refund_call(self):
+        """take_call 후 실제로 호출하지 못함 (요청 제한 대기 중 시간 예산 소진)"""
+        self.calls -= 1
+        self.refused_calls += 1
+
+    def refusal(self):
+        return f"Run budget exceeded ({self._limit_text()})"
+
+    def scene_done(self, seconds):
+        self.scenes_done += 1
+        self._scene_seconds += seconds
+
+    def projection_line(self, remaining):
+        """💰 지금까지 비용 + 남은 장면까지 예상 비용/완료 시간 (remaining: 아직 안 끝난 장면 수)"""
+        line = f"💰 Cost: ${self.cost:.2f} ({self.calls} calls)"
+        if remaining > 0:
+            # 장면당 평균 호출 수 (캐시 적중 0, 재시도 포함) - 끝난 장면이 없으면 1
+            calls_per_scene = self.calls / self.scenes_done if self.scenes_done else 1.0
+            projected = self.cost + remaining * calls_per_scene * self.cost_per_call
+            line += f" | projected ${projected:.2f}"
+            limit = self.call_limit
+            if limit is not None and projected > limit * self.cost_per_call + 1e-9:
+                line += " ⚠️ over budget"
+            if self.scenes_done:
+                eta = self.elapsed / self.scenes_done * remaining
+                line += f" | ⏱️ ETA {_duration(eta)}"
+                if self.max_seconds and self.elapsed + eta > self.max_seconds:
+                    line += " ⚠️ over time budget"
+        line += f" | elapsed {_duration(self.elapsed)}"
+        if self.enabled:
+            line += f" | budget {self._limit_text()}"
+        return line
+
+    def stopped_line(self, not_started):
+        return f"🛑 Stopped submitting scenes: {self.stopped} - {not_started} scenes not started"
+
+    def summary(self):
+        return {
+            "max_calls": self.max_calls,
+            "max_cost": self.max_cost,
+            "max_seconds": self.max_seconds,
+            "cost_per_call": self.cost_per_call,
+            "calls": self.calls,
+            "refused_calls": self.refused_calls,
+            "estimated_cost": round(self.cost, 4),
+            "elapsed_s": round(self.elapsed, 3),
+            "stopped": self.stopped,
+        }
@@ -0,0 +1,240 @@
+"""헤드리스 배치 실행기 - Gradio 없이 같은 생성 파이프라인 실행 (cron, 워커용)
+
+    cd image-creator-python
+    python -m nano_banana run scenes.json ./out --workers 10 --zip
+
+여러 호스트로 나눠 실행하려면 enqueue / worker / collect (nano_banana.distributed 참고).
+
+장면 입력은 기존 JSON 또는 JSON Lines (첫 줄 = 장면을 뺀 설정, 이후 한 줄 = 한 장면) - 모두 하나씩 읽음.
+진행 상황은 stdout에 JSON Lines로 출력 (사람용 로그는 stderr).
+무거운 모듈(google-genai, PIL)은 실제 실행 시점에만 import.
+"""
+import argparse
+import asyncio
+import contextlib
+import importlib
+import json
+import os
+import sys
+import time
+
+GENERATOR_MODULES = {
+    "v1": "nano_banana.generator_v1",  # json_image.py
+    "v2": "nano_banana.generator_v2",  # v2_json_image.py
+}
+
+
+def load_generator_class(variant):
+    return importlib.import_module(GENERATOR_MODULES[variant]).NanoBananaGenerator
+
+
+def _emitter(stream):
+    def emit(event, **fields):
+        record = {"event": event, "ts": round(time.time(), 3), **fields}
+        stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+        stream.flush()
+    return emit
+
+
+def client_from_args(args):
+    """--record / --replay / --replay-timing 옵션 → replay.make_client (run / worker 공통)"""
+    from nano_banana.replay import make_client
+    return make_client(args.api_key, record=args.record, replay=args.replay, preserve_timing=args.replay_timing)
+
+
+async def run_batch(args, emit):
+    """장면 JSON → 출력 디렉토리 (generate_all_images와 같은 파이프라인)"""
+    from nano_banana.archive import StreamingZip, new_zip_path, parse_compression
+    from nano_banana.budget import RunBudget
+    from nano_banana.engine import generate_scenes
+    from nano_banana.journal import RunJournal
+    from nano_banana.scene_stream import open_scene_source
+
+    # 장면은 파일에서 하나씩 읽음 (.jsonl 또는 기존 JSON 형식)
+    scenes = open_scene_source(args.scenes)
+
+    # 출력 디렉토리의 manifest.jsonl에 장면별 결과 기록 (--resume 시 성공한 장면은 건너뜀)
+    journal = RunJournal(args.output_dir)
+    journal.save_config(scenes)
+    generator = load_generator_class(args.variant)(
+        args.api_key, scenes.config, use_cache=not args.bypass_cache, client=client_from_args(args)
+    )
+    total_scenes = len(scenes)
+    max_retries = 1 if args.no_retry else 3
+    scene_indices = journal.pending_indices(total_scenes) if args.resume else list(range(total_scenes))
+
+    zip_writer = None
+    if args.zip:
+        zip_writer = StreamingZip(
+            new_zip_path(args.output_dir),
+            compression=parse_compression(generator.output_rules.get("zip_compression"))
+        )
+
+    # 💰 호출/비용/시간 예산 (넘길 것 같으면 새 장면 제출 중단)
+    budget = RunBudget(args.max_calls, args.max_cost, args.max_minutes, args.cost_per_call)
+
+    emit("start", total=total_scenes, pending=len(scene_indices), variant=args.variant,
+         workers=args.workers, output_dir=os.path.abspath(args.output_dir), budget=budget.summary())
+
+    started = time.monotonic()
+    completed = total_scenes - len(scene_indices)
+    succeeded = completed
+    try:
+        if zip_writer is not None and args.resume:
+            # 재개 시 건너뛰는 장면만 기존 파일로 (다시 생성하는 장면은 결과가 나올 때 추가 - 이름 중복 방지)
+            pending = set(scene_indices)
+            for idx, filepath in journal.completed_paths().items():
+                if idx not in pending:
+                    zip_writer.add_file(filepath)
+
+        async for result in generate_scenes(generator, scenes, args.output_dir, max_retries, args.workers,
+                                            scene_indices, budget=budget):
+            completed += 1
+            await asyncio.to_thread(journal.record, result)
+            if result['success']:
+                succeeded += 1
+                if zip_writer is not None:
+                    with generator.metrics.timer("zip_add"):
+                        await asyncio.to_thread(zip_writer.add_output, result['filepath'],
+                                                result.pop('image_bytes', None))
+                emit("scene", index=result['scene_index'], status="ok", path=result['filepath'],
+                     cached=bool(result.get('cached')), shared=bool(result.get('deduplicated')),
+                     similar_to=result.get('similar_to'), similarity=result.get('similarity'),
+                     completed=completed, total=total_scenes, calls=budget.calls, cost=round(budget.cost, 4))
+            else:
+                emit("scene", index=result['scene_index'], status="error", error=result['error'],
+                     completed=completed, total=total_scenes, calls=budget.calls, cost=round(budget.cost, 4))
+    finally:
+        zip_path = zip_writer.close() if zip_writer is not None else None
+
+    print(budget.projection_line(total_scenes - completed))
+    if budget.stopped:
+        print(budget.stopped_line(total_scenes - completed))
+        emit("budget_stopped", reason=budget.stopped, not_started=total_scenes - completed)
+
+    # 출력 디렉토리에 단계별 시간/카운터 요약 (metrics.json)
+    metrics_path = generator.metrics.write_summary(
+        os.path.join(args.output_dir, "metrics.json"),
+        total_scenes=total_scenes, succeeded=succeeded, keys=generator.key_pool.summary(),
+        concurrency=generator.concurrency.summary() if generator.concurrency is not None else None,
+        budget=budget.summary()
+    )
+    emit("done", succeeded=succeeded, failed=total_scenes - succeeded, total=total_scenes,
+         elapsed=round(time.monotonic() - started, 3), zip=zip_path,
+         cache_hits=generator.cache.hits, cache_misses=generator.cache.misses,
+         deduplicated=int(generator.metrics.counter("dedup_shared")), metrics=metrics_path,
+         keys=generator.key_pool.summary(), budget=budget.summary())
+    return succeeded == total_scenes
+
+
+def _add_generation_args(parser):
+    """run / worker 공통 옵션 (API 키, 속도 제한, 캐시, 기록/재생)"""
+    parser.add_argument("--api-key", default=os.environ.get("GEMINI_API_KEY"),
+                        help="Gemini API key, or several comma-separated keys (default: $GEMINI_API_KEY)")
+    parser.add_argument("--workers", type=int, default=10,
+                        help="upper bound for concurrent API requests (adjusted automatically below it)")
+    parser.add_argument("--cpu-workers", type=int, help="post-processing processes (default: CPU count)")
+    parser.add_argument("--rpm", type=int, help="requests per minute for the shared rate limiter")
+    parser.add_argument("--no-retry", action="store_true", help="do not retry on rate limit")
+    parser.add_argument("--bypass-cache", action="store_true", help="ignore the render cache")
+    parser.add_argument("--similar-threshold", type=float,
+                        help="reuse a cached render whose prompt is at least this similar, e.g. 0.9 (default: off)")
+    capture = parser.add_mutually_exclusive_group()
+    capture.add_argument("--record", metavar="DIR", help="store every API request/response in DIR for later replay")
+    capture.add_argument("--replay", metavar="DIR",
+                         help="serve responses recorded with --record instead of calling the API")
+    parser.add_argument("--replay-timing", action="store_true",
+                        help="with --replay, reproduce the recorded API latencies")
+    parser.add_argument("--metrics-port", type=int, default=0,
+                        help="serve Prometheus metrics on this port while running (default: off)")
+
+
+def _add_queue_arg(parser):
+    queue_dir = os.environ.get("NANO_BANANA_QUEUE_DIR")
+    parser.add_argument("--queue", default=queue_dir, required=queue_dir is None,
+                        help="shared queue directory, e.g. on an NFS volume (default: $NANO_BANANA_QUEUE_DIR)")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m nano_banana", description="Nano Banana headless batch runner")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run = subparsers.add_parser("run", help="generate all scenes of a JSON config")
+    run.add_argument("scenes", help="scene configuration JSON (same format as the Gradio app) or JSON Lines (.jsonl)")
+    run.add_argument("output_dir", help="directory for generated images")
+    run.add_argument("--variant", choices=sorted(GENERATOR_MODULES), default="v2",
+                     help="v1 = json_image.py prompts, v2 = v2_json_image.py prompts (default)")
+    _add_generation_args(run)
+    run.add_argument("--zip", action="store_true", help="also write a ZIP into the output directory")
+    run.add_argument("--resume", action="store_true",
+                     help="only generate scenes that are missing or failed in output_dir/manifest.jsonl")
+    limits = run.add_argument_group("run budget (stop submitting scenes before a limit is exceeded; 0 = no limit)")
+    limits.add_argument("--max-calls", type=int, help="API calls including retries (default: $NANO_BANANA_MAX_CALLS)")
+    limits.add_argument("--max-cost", type=float, help="estimated cost in USD (default: $NANO_BANANA_MAX_COST)")
+    limits.add_argument("--max-minutes", type=float, help="wall-clock minutes (default: $NANO_BANANA_MAX_MINUTES)")
+    limits.add_argument("--cost-per-call", type=float,
+                        help="estimated USD per API call (default: $NANO_BANANA_COST_PER_CALL or 0.04)")
+
+    # 분산 실행: enqueue (코디네이터) → worker (호스트마다) → collect
+    enqueue = subparsers.add_parser("enqueue", help="put all scenes of a JSON config into a shared queue")
+    enqueue.add_argument("scenes",
+                         help="scene configuration JSON (same format as the Gradio app) or JSON Lines (.jsonl)")
+    enqueue.add_argument("--variant", choices=sorted(GENERATOR_MODULES), default="v2",
+                         help="v1 = json_image.py prompts, v2 = v2_json_image.py prompts (default)")
+    _add_queue_arg(enqueue)
+
+    worker = subparsers.add_parser("worker", help="generate scenes claimed from a shared queue")
+    _add_queue_arg(worker)
+    _add_generation_args(worker)
+    worker.add_argument("--run", help="only take scenes of this run id (default: any run)")
+    worker.add_argument("--worker-id", help="name shown in the queue (default: hostname-pid)")
+    worker.add_argument("--lease", type=float, default=120.0,
+                        help="seconds a claimed scene stays reserved without a heartbeat (default: 120)")
+    worker.add_argument("--max-attempts", type=int, default=3,
+                        help="claims per scene before it is marked failed (default: 3)")
+    worker.add_argument("--poll-interval", type=float, default=2.0, help="seconds between empty polls")
+    worker.add_argument("--forever", action="store_true", help="keep polling after the queue is empty")
+
+    collect = subparsers.add_parser("collect", help="gather a queued run into one output directory")
+    collect.add_argument("run_id", help="run id printed by enqueue")
+    collect.add_argument("output_dir", help="directory for the collected images and manifest")
+    _add_queue_arg(collect)
+    collect.add_argument("--wait", action="store_true", help="wait until no scene is queued or in progress")
+    collect.add_argument("--poll-interval", type=float, default=5.0, help="seconds between progress checks")
+    collect.add_argument("--zip", action="store_true", help="also write a ZIP into the output directory")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    generates = args.command in ("run", "worker")
+
+    if generates and not args.api_key and not args.replay:
+        parser.error("API key required (--api-key or $GEMINI_API_KEY)")
+
+    # 모듈 import 전에 설정해야 적용되는 값 (rate_limit, postprocess는 환경변수로 설정)
+    if generates and args.rpm:
+        os.environ["NANO_BANANA_RPM"] = str(args.rpm)
+    if generates and args.cpu_workers:
+        os.environ["NANO_BANANA_CPU_WORKERS"] = str(args.cpu_workers)
+    if generates and args.similar_threshold is not None:
+        os.environ["NANO_BANANA_SIMILAR_THRESHOLD"] = str(args.similar_threshold)
+
+    # stdout은 JSON 진행 이벤트 전용, 생성기의 print 로그는 stderr로
+    emit = _emitter(sys.stdout)
+    with contextlib.redirect_stdout(sys.stderr):
+        if generates and args.metrics_port:
+            from nano_banana.metrics import start_metrics_server
+            start_metrics_server(args.metrics_port)
+        if args.command == "run":
+            ok = asyncio.run(run_batch(args, emit))
+        else:
+            from nano_banana import distributed
+            if args.command == "worker":
+                ok = asyncio.run(distributed.run_worker(args, emit))
+            elif args.command == "enqueue":
+                ok = distributed.enqueue_run(args, emit)
+            else:
+                ok = distributed.collect_run(args, emit)
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,140 @@
+"""적응형 동시성 제어 (AIMD) - 고정된 Parallel Workers 대신 응답 상태를 보고 동시 요청 수 자동 조절
+
+- 시작은 보수적으로 (INITIAL_CONCURRENCY), slow start로 빠르게 늘린 뒤 혼잡 회피(+1/RTT) 구간으로
+- 429/할당량 오류 → 동시 요청 수 절반으로 (같은 폭주에 대해 여러 번 줄이지 않도록 cooldown)
+- 지연 시간이 기준보다 크게 늘었거나 오류율이 높으면 증가 중단
+"""
+import asyncio
+import os
+import time
+from collections import deque
+
+INITIAL_CONCURRENCY = int(os.environ.get("NANO_BANANA_INITIAL_CONCURRENCY", "4"))
+# 기준 지연 시간(최근 최솟값) 대비 이 배수를 넘으면 증가 중단
+LATENCY_TOLERANCE = 2.0
+# 오류율(지수 이동 평균)이 이 값을 넘으면 증가 중단
+ERROR_RATE_LIMIT = 0.1
+HISTORY_SIZE = 200
+
+
+class AdaptiveConcurrency:
+    """AIMD 동시성 제한 (한 이벤트 루프 안에서 사용, max_limit = 슬라이더 상한)"""
+
+    def __init__(self, max_limit, initial=INITIAL_CONCURRENCY, min_limit=1):
+        self.max_limit = max(1, int(max_limit))
+        self.min_limit = max(1, min(int(min_limit), self.max_limit))
+        self.limit = float(max(self.min_limit, min(int(initial), self.max_limit)))
+        self.ssthresh = float(self.max_limit)
+        self.in_flight = 0
+        self.min_latency = None
+        self.avg_latency = None
+        self.error_rate = 0.0
+        self.backoffs = 0
+        self._cooldown_until = 0.0
+        self._waiters = deque()
+        self._started = time.monotonic()
+        self.history = deque(maxlen=HISTORY_SIZE)  # [(경과 시간, 동시성, 이유)]
+        self._record("start")
+
+    @property
+    def current(self):
+        return int(self.limit)
+
+    def _record(self, reason):
+        current = self.current
+        if self.history and self.history[-1][1] == current:
+            return
+        self.history.append((round(time.monotonic() - self._started, 1), current, reason))
+
+    def _wake(self):
+        free = self.current - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    async def acquire(self):
+        while self.in_flight >= self.current:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # 깨운 직후 취소되면 다른 대기자에게 자리 넘김
+                self._wake()
+                raise
+        self.in_flight += 1
+
+    def release(self):
+        self.in_flight -= 1
+        self._wake()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.release()
+
+    # ---- 생성기가 API 호출마다 알려주는 신호 ----
+
+    def record_success(self, latency):
+        self.error_rate *= 0.9
+        if self.min_latency is None or latency < self.min_latency:
+            self.min_latency = latency
+        else:
+            # 기준값은 천천히 올려서 일시적으로 빨랐던 응답에 고정되지 않도록
+            self.min_latency += (latency - self.min_latency) * 0.01
+        self.avg_latency = latency if self.avg_latency is None else self.avg_latency * 0.8 + latency * 0.2
+
+        healthy = (self.avg_latency <= self.min_latency * LATENCY_TOLERANCE + 0.5
+                   and self.error_rate < ERROR_RATE_LIMIT)
+        if not healthy or self.limit >= self.max_limit:
+            return
+        if self.limit < self.ssthresh:
+            # slow start: 응답 하나마다 +1 (RTT마다 두 배)
+            self.limit = min(self.max_limit, self.limit + 1)
+        else:
+            # 혼잡 회피: RTT마다 +1
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        self._record("increase")
+        self._wake()
+
+    def record_rate_limited(self):
+        now = time.monotonic()
+        self.error_rate = self.error_rate * 0.9 + 0.1
+        if now < self._cooldown_until:
+            return
+        self.limit = max(self.min_limit, self.limit / 2)
+        self.ssthresh = max(self.min_limit, self.limit)
+        self.backoffs += 1
+        # 이미 보낸 요청들이 같은 폭주로 429를 받는 동안은 다시 줄이지 않음
+        self._cooldown_until = now + max(1.0, self.avg_latency or 1.0)
+        self._record("429")
+
+    def record_error(self):
+        self.error_rate = self.error_rate * 0.9 + 0.1
+
+    # ---- 로그 ----
+
+    def status_line(self):
+        return (f"🎚️ Concurrency: {self.current}/{self.max_limit} | In flight: {self.in_flight}"
+                + (f" | Backoffs: {self.backoffs}" if self.backoffs else ""))
+
+    def history_line(self, max_points=12):
+        """시간에 따른 동시성 변화 (예: 0s:4 → 3s:8 → 9s:4(429) → ...)"""
+        points = list(self.history)
+        if len(points) > max_points:
+            step = len(points) / max_points
+            points = [points[int(i * step)] for i in range(max_points - 1)] + [points[-1]]
+        parts = [f"{t:.0f}s:{value}" + ("(429)" if reason == "429" else "") for t, value, reason in points]
+        return f"🎚️ Concurrency over time (cap {self.max_limit}): " + " → ".join(parts)
+
+    def summary(self):
+        return {
+            "max": self.max_limit,
+            "final": self.current,
+            "backoffs": self.backoffs,
+            "history": [{"t": t, "concurrency": value, "reason": reason} for t, value, reason in self.history],
+        }
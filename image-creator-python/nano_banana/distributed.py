@@ -0,0 +1,197 @@
+"""분산 실행 - 코디네이터가 장면을 공유 대기열에 넣고, 여러 호스트의 워커가 lease로 가져가서 생성
+
+    python -m nano_banana enqueue scenes.json --queue /mnt/shared/nb_queue        # → run_id
+    python -m nano_banana worker --queue /mnt/shared/nb_queue --workers 10        # 호스트마다 실행
+    python -m nano_banana collect <run_id> ./out --queue /mnt/shared/nb_queue --wait --zip
+
+워커는 이미지를 대기열 디렉토리(공유 볼륨)의 runs/<run_id>/ 에 저장하고,
+collect가 결과를 출력 디렉토리로 모아서 manifest.jsonl (+ ZIP) 작성.
+"""
+import asyncio
+import json
+import os
+import shutil
+import socket
+import sqlite3
+import time
+from collections import Counter
+
+from nano_banana.cli import client_from_args, load_generator_class
+from nano_banana.work_queue import DONE, FAILED, LEASED, QUEUED, WorkQueue
+
+
+def _pending(counts):
+    return counts.get(QUEUED, 0) + counts.get(LEASED, 0)
+
+
+def enqueue_run(args, emit):
+    """장면 JSON → 대기열 (실행 ID 출력)"""
+    from nano_banana.scene_stream import open_scene_source
+
+    scenes = open_scene_source(args.scenes)
+    queue = WorkQueue(args.queue)
+    run_id = queue.enqueue(scenes, args.variant)
+    total_scenes = len(scenes)
+    print(f"📥 Enqueued run {run_id}: {total_scenes} scenes")
+    emit("enqueued", run=run_id, total=total_scenes, variant=args.variant, queue=os.path.abspath(args.queue))
+    return True
+
+
+async def run_worker(args, emit):
+    """대기열에서 장면을 가져와 생성 (대기/처리 중인 장면이 모두 끝나면 종료, --forever면 계속 대기)"""
+    from nano_banana.concurrency import AdaptiveConcurrency
+    from nano_banana.journal import prompt_hash
+
+    queue = WorkQueue(args.queue)
+    worker_id = args.worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    max_retries = 1 if args.no_retry else 3
+    client = client_from_args(args)
+    # 실행이 여러 개여도 이 워커의 동시 요청은 하나의 AIMD 제한으로
+    concurrency = AdaptiveConcurrency(args.workers)
+    generators = {}  # {run_id: 생성기} - 실행 설정별로 한 번만 생성
+    held = set()  # lease를 가진 (run_id, scene_index)
+    tasks = set()
+    outcome = Counter()
+
+    def generator_for(run_id):
+        generator = generators.get(run_id)
+        if generator is None:
+            run = queue.get_run(run_id)
+            generator = load_generator_class(run["variant"])(
+                args.api_key, run["config"], use_cache=not args.bypass_cache, client=client
+            )
+            generator.concurrency = concurrency
+            generators[run_id] = generator
+        return generator
+
+    async def process(run_id, scene_index, scene):
+        try:
+            try:
+                generator = generator_for(run_id)
+                result = await generator.generate_scene_async(scene, scene_index, queue.run_dir(run_id), max_retries)
+            except Exception as e:
+                result = {'success': False, 'scene_index': scene_index, 'error': f"{type(e).__name__}: {e}"}
+            result.pop('image_bytes', None)
+
+            if result['success']:
+                owned = await asyncio.to_thread(queue.complete, worker_id, run_id, scene_index,
+                                                result['filepath'], prompt_hash(result['prompt']))
+                outcome["ok"] += 1
+                emit("scene", run=run_id, index=scene_index, status="ok", path=result['filepath'],
+                     cached=bool(result.get('cached')), shared=bool(result.get('deduplicated')),
+                     similar_to=result.get('similar_to'), similarity=result.get('similarity'), lease_lost=not owned)
+            else:
+                requeued = await asyncio.to_thread(queue.fail, worker_id, run_id, scene_index,
+                                                   result['error'], args.max_attempts)
+                outcome["requeued" if requeued else "failed"] += 1
+                emit("scene", run=run_id, index=scene_index, status="error", error=result['error'],
+                     requeued=requeued)
+        finally:
+            held.discard((run_id, scene_index))
+            concurrency.release()
+
+    async def heartbeat():
+        while True:
+            await asyncio.sleep(args.lease / 3)
+            try:
+                await asyncio.to_thread(queue.renew, worker_id, list(held), args.lease)
+            except sqlite3.OperationalError as e:
+                print(f"⚠️ Lease renewal failed: {e}")
+
+    print(f"👷 Worker {worker_id} polling {os.path.abspath(args.queue)}")
+    emit("worker_start", worker=worker_id, queue=os.path.abspath(args.queue), workers=args.workers, run=args.run)
+    started = time.monotonic()
+    heartbeat_task = asyncio.create_task(heartbeat())
+    try:
+        while True:
+            await concurrency.acquire()
+            job = await asyncio.to_thread(queue.claim, worker_id, args.lease, args.run)
+            if job is None:
+                concurrency.release()
+                # 다른 워커가 처리 중인 장면이 남아 있으면 계속 대기 (lease가 만료되면 이어받음)
+                if not tasks and not args.forever:
+                    if not _pending(await asyncio.to_thread(queue.counts, args.run)):
+                        break
+                await asyncio.sleep(args.poll_interval)
+                continue
+            held.add(job[:2])
+            task = asyncio.create_task(process(*job))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+    finally:
+        # 취소한 작업이 끝날 때까지 기다림 (lease 갱신/결과 기록이 대기열을 닫은 뒤에 실행되지 않도록)
+        pending = [heartbeat_task, *tasks]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    # 실행별 단계 시간/카운터는 워커마다 따로 기록 (collect 결과 옆에 남음)
+    for run_id, generator in generators.items():
+        generator.metrics.write_summary(
+            os.path.join(queue.run_dir(run_id), f"metrics_{worker_id}.json"),
+            worker=worker_id, keys=generator.key_pool.summary(), concurrency=concurrency.summary()
+        )
+    emit("worker_done", worker=worker_id, succeeded=outcome["ok"], failed=outcome["failed"],
+         requeued=outcome["requeued"], runs=sorted(generators), elapsed=round(time.monotonic() - started, 3))
+    return outcome["failed"] == 0
+
+
+def collect_run(args, emit):
+    """대기열의 실행 결과 → 출력 디렉토리 (이미지 복사 + manifest.jsonl, 선택적으로 ZIP)"""
+    from nano_banana.archive import StreamingZip, new_zip_path, parse_compression
+    from nano_banana.journal import RunJournal
+
+    queue = WorkQueue(args.queue)
+    run = queue.get_run(args.run_id)
+    config_dict = run["config"]
+
+    counts = queue.counts(args.run_id)
+    while args.wait and _pending(counts):
+        emit("waiting", run=args.run_id, done=counts.get(DONE, 0), failed=counts.get(FAILED, 0),
+             pending=_pending(counts), total=sum(counts.values()))
+        time.sleep(args.poll_interval)
+        counts = queue.counts(args.run_id)
+
+    # 이미 모은 장면은 건너뜀 (collect를 여러 번 실행해도 됨)
+    jobs = queue.jobs(args.run_id)
+    total_scenes = len(jobs)
+    journal = RunJournal(args.output_dir)
+    journal.save_config({**config_dict, "RUN": {**config_dict["RUN"],
+                                                "SCENES": [json.loads(job["scene"]) for job in jobs]}})
+    by_worker = Counter()
+    for job in jobs:
+        scene_index = job["scene_index"]
+        if journal.is_done(scene_index):
+            continue
+        source = job["output_path"]
+        if job["state"] == DONE and source and os.path.exists(source):
+            target = os.path.join(args.output_dir, os.path.basename(source))
+            if os.path.abspath(target) != os.path.abspath(source):
+                shutil.copy2(source, target)
+            journal.record({'scene_index': scene_index, 'success': True, 'filepath': target,
+                            'prompt_hash': job["prompt_hash"]})
+            by_worker[job["worker"]] += 1
+        elif job["state"] == DONE:
+            journal.record({'scene_index': scene_index, 'success': False,
+                            'error': f"Output missing on shared volume: {source}"})
+        elif job["state"] == FAILED:
+            journal.record({'scene_index': scene_index, 'success': False, 'error': job["error"]})
+
+    completed_paths = journal.completed_paths()
+    zip_path = None
+    if args.zip and completed_paths:
+        zip_writer = StreamingZip(
+            new_zip_path(args.output_dir),
+            compression=parse_compression(config_dict.get("OUTPUT_RULES", {}).get("zip_compression"))
+        )
+        try:
+            for scene_index in sorted(completed_paths):
+                zip_writer.add_file(completed_paths[scene_index])
+        finally:
+            zip_path = zip_writer.close()
+
+    succeeded = len(completed_paths)
+    print(f"📦 Collected {succeeded}/{total_scenes} scenes into {os.path.abspath(args.output_dir)}")
+    emit("done", run=args.run_id, succeeded=succeeded, failed=total_scenes - succeeded, total=total_scenes,
+         pending=_pending(counts), zip=zip_path, workers=dict(by_worker))
+    return succeeded == total_scenes
@@ -0,0 +1,50 @@
+"""출력 인코더 프로필 - OUTPUT_RULES.encoder로 실행마다 선택 (기본: 기존과 같은 PNG optimize)"""
+
+ENCODER_PROFILES = {
+    # 무손실, 가장 작지만 가장 느림 (기존 동작)
+    "png": {
+        "label": "PNG",
+        "format": "PNG",
+        "extension": "png",
+        "params": {"optimize": True},
+    },
+    # 무손실, 낮은 zlib 레벨로 빠르게 (파일은 조금 커짐)
+    "png-fast": {
+        "label": "PNG (fast)",
+        "format": "PNG",
+        "extension": "png",
+        "params": {"compress_level": 1},
+    },
+    # 무손실 WebP - PNG보다 훨씬 작음
+    "webp-lossless": {
+        "label": "WebP (lossless)",
+        "format": "WEBP",
+        "extension": "webp",
+        "params": {"lossless": True, "quality": 50, "method": 2},
+    },
+    # 고품질 JPEG - 가장 빠르고 작음 (손실)
+    "jpeg-hq": {
+        "label": "JPEG (q95)",
+        "format": "JPEG",
+        "extension": "jpg",
+        "params": {"quality": 95, "subsampling": 0},
+    },
+}
+
+DEFAULT_ENCODER = "png"
+
+
+def resolve_encoder(output_rules):
+    """OUTPUT_RULES → 인코더 프로필
+
+    "encoder": 프로필 이름, "encoder_options": 저장 파라미터 덮어쓰기 (예: {"compress_level": 3})
+    """
+    name = str(output_rules.get("encoder", DEFAULT_ENCODER)).lower()
+    if name not in ENCODER_PROFILES:
+        raise ValueError(f"Unknown encoder '{name}'. Available: {', '.join(ENCODER_PROFILES)}")
+
+    profile = dict(ENCODER_PROFILES[name])
+    profile["name"] = name
+    profile["params"] = dict(profile["params"])
+    profile["params"].update(output_rules.get("encoder_options", {}))
+    return profile
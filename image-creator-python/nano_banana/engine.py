@@ -0,0 +1,89 @@
+"""asyncio 생성 엔진 - 하나의 이벤트 루프에서 여러 장면 요청을 동시에 처리"""
+import asyncio
+import contextlib
+import os
+import time
+from itertools import islice
+
+from nano_banana.concurrency import AdaptiveConcurrency
+
+# 동시에 제출해 두는 장면 수 (0 = 동시성 상한의 4배) - 장면 목록 전체를 한 번에 태스크로 만들지 않음
+SCENE_WINDOW = int(os.environ.get("NANO_BANANA_SCENE_WINDOW", "0"))
+
+
+def scene_window(max_concurrency, window=None):
+    """한 번에 제출해 두는 장면 수 (window → NANO_BANANA_SCENE_WINDOW → 동시성 상한의 4배)"""
+    return max(1, int(window or SCENE_WINDOW or 4 * max_concurrency))
+
+
+async def generate_scenes(generator, scenes, temp_dir, max_retries=3, max_concurrency=10, scene_indices=None,
+                          session_id=None, scheduler=None, window=None, budget=None):
+    """장면들을 동시에 생성하고 완료되는 순서대로 결과를 yield (async generator)
+
+    scenes: 장면 리스트 또는 반복자 (예: scene_stream.SceneSource) - 필요한 만큼만 읽음
+    scene_indices: 일부 장면만 생성할 때 (예: 재개 시 실패/누락 장면)
+    max_concurrency: 동시 요청 수 상한 (실제 동시성은 generator.concurrency가 응답 상태로 조절)
+    session_id: 서버 전역 스케줄러에서 공정 분배 단위 (Gradio 세션)
+    scheduler: scheduler.FairScheduler - 주면 장면마다 서버 전역 슬롯을 받아서 실행 (Gradio 앱), 없으면 max_concurrency만 적용
+    window: 한 번에 제출해 두는 장면 수 (기본: NANO_BANANA_SCENE_WINDOW 또는 동시성 상한의 4배)
+    budget: budget.RunBudget - 예산을 넘길 것 같으면 새 장면 제출을 멈춤 (budget.stopped에 이유)
+    """
+    window = scene_window(max_concurrency, window)
+    if scene_indices is None:
+        items = enumerate(scenes)
+    else:
+        wanted = set(scene_indices)
+        items = ((i, scene) for i, scene in enumerate(scenes) if i in wanted)
+
+    # 🎚️ 적응형 동시성 (생성기가 API 응답마다 성공/429 신호를 전달)
+    concurrency = AdaptiveConcurrency(max_concurrency)
+    generator.concurrency = concurrency
+    # 💰 API 호출마다 예산 확인 (재시도가 예산을 넘기지 않도록)
+    generator.budget = budget
+
+    async def run(scene_index, scene, prompt):
+        # 실행별 동시성 → 서버 전역 슬롯 (세션별 라운드 로빈, 스케줄러를 준 경우만)
+        slot = scheduler.slot(session_id) if scheduler is not None else contextlib.nullcontext()
+        async with concurrency, slot:
+            started = time.monotonic()
+            result = await generator.generate_scene_async(scene, scene_index, temp_dir, max_retries, prompt)
+            if budget is not None:
+                budget.scene_done(time.monotonic() - started)
+            return result
+
+    pending = set()
+
+    def refill():
+        # 창이 절반 이하로 비면 다음 장면들을 읽어서 프롬프트를 묶음으로 컴파일 후 제출
+        if len(pending) > window // 2:
+            return
+        count = window - len(pending)
+        if budget is not None:
+            allowed = budget.admissible(len(pending))
+            if allowed is not None:
+                count = min(count, allowed)
+            if not count:
+                # 진행 중인 장면이 없는데도 막혀 있고 남은 장면이 있으면 예산 초과로 종료
+                if not pending and next(items, None) is not None:
+                    budget.stop()
+                return
+        batch = list(islice(items, count))
+        if not batch:
+            return
+        prompts = generator.build_prompts([scene for _, scene in batch])
+        for (scene_index, scene), prompt in zip(batch, prompts):
+            pending.add(asyncio.create_task(run(scene_index, scene, prompt)))
+
+    try:
+        refill()
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            pending.difference_update(done)
+            refill()
+            # 끝난 장면은 결과를 넘긴 뒤 참조하지 않음 (장면 수와 무관한 메모리)
+            for task in done:
+                yield task.result()
+    finally:
+        # 소비자가 중단하면 (예: Gradio 취소) 남은 요청 취소
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,109 @@
+"""로컬 가짜 Gemini 이미지 백엔드 - API 할당량 없이 파이프라인 처리량 측정용
+
+genai.Client 대신 생성기에 넣어 사용:
+    client = FakeGeminiClient(latency=2.0, jitter=0.5, rate_limit_probability=0.05)
+    generator = NanoBananaGenerator(api_key=None, config_dict=config, client=client)
+"""
+import asyncio
+import random
+import threading
+import time
+from io import BytesIO
+from types import SimpleNamespace
+
+from PIL import Image
+
+from nano_banana.geometry import NATIVE_SIZES
+
+
+def make_response(parts):
+    """genai 응답과 같은 모양의 객체 (response.candidates[0].content.parts[i].inline_data.data)
+
+    parts: [(mime_type, data)] - data가 bytes면 이미지, str이면 텍스트
+    """
+    response_parts = []
+    for mime_type, data in parts:
+        if isinstance(data, str):
+            response_parts.append(SimpleNamespace(text=data, inline_data=None))
+        else:
+            response_parts.append(SimpleNamespace(
+                text=None, inline_data=SimpleNamespace(mime_type=mime_type, data=data)
+            ))
+    return SimpleNamespace(candidates=[SimpleNamespace(content=SimpleNamespace(parts=response_parts))])
+
+
+def render_sample_png(size):
+    """사진과 비슷한 압축률의 샘플 PNG (그라데이션 + 노이즈)"""
+    gradient = Image.linear_gradient('L').resize(size).convert('RGB')
+    noise = Image.effect_noise(size, 48).convert('RGB')
+    buffer = BytesIO()
+    Image.blend(gradient, noise, 0.3).save(buffer, format='PNG', compress_level=1)
+    return buffer.getvalue()
+
+
+class FakeGeminiClient:
+    """설정 가능한 지연/지터/429 주입을 가진 genai.Client 대체품 (sync + aio)"""
+
+    def __init__(self, image_size=None, latency=1.0, jitter=0.2,
+                 rate_limit_probability=0.0, retry_after=1.0, seed=None):
+        # image_size가 None이면 실제 API처럼 요청한 aspect_ratio의 기본 해상도로 응답
+        self.image_size = tuple(image_size) if image_size else None
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_probability = rate_limit_probability
+        self.retry_after = retry_after
+        self.calls = 0
+        self.rate_limited = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._images = {}  # {크기: 샘플 PNG}
+        self.models = _FakeModels(self)
+        self.aio = SimpleNamespace(models=_FakeAsyncModels(self))
+
+    def _next_call(self):
+        """(지연 시간, 429 여부) 결정"""
+        with self._lock:
+            self.calls += 1
+            delay = max(0.0, self._rng.gauss(self.latency, self.jitter))
+            limited = self._rng.random() < self.rate_limit_probability
+            if limited:
+                self.rate_limited += 1
+            return delay, limited
+
+    def _image_for(self, config):
+        size = self.image_size
+        if size is None:
+            ratio = getattr(getattr(config, "image_config", None), "aspect_ratio", None)
+            size = NATIVE_SIZES.get(ratio, NATIVE_SIZES["1:1"])
+        with self._lock:
+            data = self._images.get(size)
+            if data is None:
+                data = self._images[size] = render_sample_png(size)
+            return data
+
+    def _result(self, limited, config):
+        if limited:
+            raise RuntimeError(
+                f"429 RESOURCE_EXHAUSTED. Quota exceeded (fake backend). Please retry in {self.retry_after}s."
+            )
+        return make_response([("image/png", self._image_for(config))])
+
+
+class _FakeModels:
+    def __init__(self, client):
+        self._client = client
+
+    def generate_content(self, model, contents, config=None):
+        delay, limited = self._client._next_call()
+        time.sleep(delay)
+        return self._client._result(limited, config)
+
+
+class _FakeAsyncModels:
+    def __init__(self, client):
+        self._client = client
+
+    async def generate_content(self, model, contents, config=None):
+        delay, limited = self._client._next_call()
+        await asyncio.sleep(delay)
+        return self._client._result(limited, config)
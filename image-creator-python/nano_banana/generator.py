@@ -0,0 +1,465 @@
+"""장면 생성 공통 로직 - API 호출, 재시도, 후처리, 저장 (asyncio 기반)"""
+import asyncio
+import base64
+import os
+import re
+import time
+
+from nano_banana.encoders import resolve_encoder
+from nano_banana.geometry import OutputGeometry
+from nano_banana.journal import prompt_hash
+from nano_banana.key_pool import KeyPool
+from nano_banana.metrics import Metrics, get_global_metrics
+from nano_banana.postprocess import get_postprocess_stage, make_preview, preview_path_for, process_image
+from nano_banana.render_cache import RenderCache, make_cache_key
+from nano_banana.similar_cache import SIMILAR_THRESHOLD, get_similar_index, prompt_signature
+from nano_banana.single_flight import LeaderCancelled, SharedRender, get_single_flight
+
+MODEL_NAME = "gemini-2.5-flash-image"
+
+
+class SceneGenerator:
+    """JSON 설정 → 장면 이미지 생성기 (프롬프트 규칙은 앱별 서브클래스에서 정의)"""
+
+    # 429 외의 오류도 재시도할지 여부
+    retry_other_errors = False
+
+    def __init__(self, api_key, config_dict, use_cache=True, client=None):
+        # api_key: 키 하나, 쉼표/줄바꿈으로 구분한 여러 키, 또는 키 리스트 (키마다 클라이언트 + 요청 제한기)
+        # client: genai.Client 대체품 주입용 (예: fake_backend.FakeGeminiClient)
+        self.key_pool = KeyPool.from_keys(api_key, client=client)
+        self.client = self.key_pool.slots[0].client
+        self.cache = RenderCache()
+        self.use_cache = use_cache
+        # 🧩 유사 프롬프트 재사용 임계값 (0 = 끄기, 정확히 같은 프롬프트만 캐시 적중)
+        self.similar_threshold = SIMILAR_THRESHOLD
+        self.similar_index = get_similar_index()
+        self.postprocess_stage = get_postprocess_stage()
+        self.single_flight = get_single_flight()
+        # 실행별 단계 지표 (프로세스 전역 /metrics 에도 함께 집계)
+        self.metrics = Metrics(parent=get_global_metrics())
+        # 적응형 동시성 제어 (engine.generate_scenes가 설정, 단일 장면 생성 시 None)
+        self.concurrency = None
+        # 실행 예산 (engine.generate_scenes가 설정, 없으면 제한 없음)
+        self.budget = None
+        # 갤러리 미리보기 생성 여부 (Gradio 앱이 켬 → 결과의 'preview')
+        self.previews = False
+        self.config = config_dict
+        self.output_rules = self.config.get("OUTPUT_RULES", {})
+        self.style = self.config.get("STYLE", {})
+        self.negative_prompts = self.config.get("NEGATIVE_PROMPTS", [])
+        self.character_bible = self.config.get("CHARACTER_BIBLE", {})
+        self.encoder = resolve_encoder(self.output_rules)
+        # 📐 요청 비율 + 크롭/리샘플 계획 (앱별 비율/크기 설정으로)
+        self.geometry = OutputGeometry(self._parse_aspect_ratio(), self._parse_target_size())
+        # 장면 목록은 선택 (스트리밍 입력이면 비어 있고 장면은 generate_scene_async로 하나씩 전달)
+        self.scenes = self.config.get("RUN", {}).get("SCENES", [])
+        self._compile_prompt_fragments()
+
+    # ---- 서브클래스 확장 지점 ----
+
+    def _create_prompt(self, scene):
+        raise NotImplementedError
+
+    def _compile_prompt_fragments(self):
+        """실행 내내 변하지 않는 프롬프트 조각(스타일, 네거티브 등)을 한 번만 계산"""
+
+    def _parse_aspect_ratio(self):
+        """API에 요청할 비율 (None이면 목표 크기의 비율)"""
+        return None
+
+    def _parse_target_size(self):
+        """최종 크기 (None이면 모델이 준 해상도를 그대로 - 크롭만)"""
+        return (1920, 1080)
+
+    def _final_prompt(self, scene):
+        """API로 보낼 최종 프롬프트"""
+        return self._create_prompt(scene)
+
+    def compile_prompts(self, scenes=None):
+        """여러 장면의 최종 프롬프트 (장면마다 _final_prompt - 고정 조각은 이미 컴파일됨)"""
+        return [self._final_prompt(scene) for scene in (self.scenes if scenes is None else scenes)]
+
+    def build_prompts(self, scenes=None):
+        """compile_prompts + prompt 단계 시간 기록"""
+        started = time.perf_counter()
+        prompts = self.compile_prompts(scenes)
+        self.metrics.observe("prompt", time.perf_counter() - started, count=len(prompts))
+        return prompts
+
+    def _image_config(self):
+        """API 요청의 image_config (dict, 없으면 None) - 비율을 직접 요청해서 크롭/리샘플을 줄임"""
+        return self.geometry.image_config()
+
+    def _postprocess_settings(self):
+        """앱별 후처리 설정 (flatten_alpha 등 - postprocess.process_image 참고)"""
+        return {}
+
+    # ---- 공통 로직 ----
+
+    def _scene_filename(self, scene, scene_index):
+        scene_num_raw = scene.get("SCENE_NUMBER", scene_index + 1)
+        scene_num = int(scene_num_raw) if isinstance(scene_num_raw, (str, int)) else scene_index + 1
+        title = scene.get("TITLE", f"Scene_{scene_index+1}")
+        safe_title = title.replace(' ', '_').replace('/', '_')
+        return f"scene_{scene_num:02d}_{safe_title}.{self.encoder['extension']}"
+
+    def _postprocess_options(self):
+        """프로세스 풀로 넘길 후처리 옵션 (캐시 키에도 포함)"""
+        options = self.geometry.postprocess_options()
+        options.update(self._postprocess_settings())
+        options.update({
+            "format": self.encoder["format"],
+            "save_params": self.encoder["params"],
+        })
+        return options
+
+    def _cache_key(self, prompt):
+        return make_cache_key(MODEL_NAME, prompt, self._image_config(), self._postprocess_options())
+
+    def _similar_context(self):
+        """유사 프롬프트 색인의 구역 (모델 + 이미지 설정 + 후처리가 같은 항목끼리만 비교)"""
+        return make_cache_key(MODEL_NAME, "", self._image_config(), self._postprocess_options())[:16]
+
+    def _find_similar(self, prompt, scene, filepath):
+        """비슷한 프롬프트의 렌더를 filepath로 복사 → (캐시 키, 유사도, prompt_hash) 또는 None (스레드에서 호출)"""
+        match = self.similar_index.lookup(
+            self._similar_context(), prompt_signature(prompt, scene), self.similar_threshold
+        )
+        if match is None:
+            return None
+        # 정확히 일치하는 캐시 조회는 이미 실패로 집계됐으므로 여기서는 적중/실패 수를 건드리지 않음
+        if not self.cache.get(match[0], filepath, count=False):
+            # 렌더 캐시에서 이미 지워진 항목 (LRU) → 색인에서도 제거
+            self.similar_index.discard(match[0])
+            return None
+        return match
+
+    def _index_similar(self, cache_key, prompt, scene):
+        """새로 저장한 렌더를 유사 프롬프트 색인에 등록 (스레드에서 호출)"""
+        self.similar_index.add(
+            cache_key, self._similar_context(), prompt_signature(prompt, scene), prompt_hash(prompt)
+        )
+
+    def _request_config(self):
+        from google.genai import types
+
+        image_config = self._image_config()
+        if image_config is None:
+            return None
+        return types.GenerateContentConfig(
+            response_modalities=["IMAGE"],
+            image_config=types.ImageConfig(**image_config)
+        )
+
+    @staticmethod
+    def _decode_inline_data(image_data_raw):
+        if isinstance(image_data_raw, str):
+            return base64.b64decode(image_data_raw)
+        if isinstance(image_data_raw, (bytes, bytearray)):
+            # 복사 없이 그대로 전달 (프로세스 풀로 넘길 때 한 번만 직렬화)
+            return image_data_raw
+        return bytes(image_data_raw)
+
+    async def generate_scene_async(self, scene, scene_index, temp_dir, max_retries=3, prompt=None):
+        """단일 장면 생성 (재시도 로직 포함) - 인코더 프로필 형식으로 저장"""
+        if prompt is None:
+            prompt = self.build_prompts([scene])[0]
+        result = await self._generate_scene(scene, scene_index, temp_dir, max_retries, prompt)
+        self.metrics.inc("scenes_ok" if result['success'] else "scenes_failed")
+        return result
+
+    async def _generate_scene(self, scene, scene_index, temp_dir, max_retries, prompt):
+        try:
+            filepath = os.path.join(temp_dir, self._scene_filename(scene, scene_index))
+        except (AttributeError, TypeError, ValueError) as e:
+            # SCENE_NUMBER가 숫자가 아니거나 TITLE이 문자열이 아닌 장면 → 이 장면만 실패 (실행 전체는 계속)
+            print(f"❌ Scene {scene_index + 1}: invalid SCENE_NUMBER/TITLE ({e})")
+            return {
+                'success': False,
+                'scene_index': scene_index,
+                'error': f"Invalid scene: {e}",
+                'scene': scene
+            }
+
+        # 💾 렌더 캐시 확인 (모델 + 프롬프트 + 이미지 설정 + 후처리 설정)
+        cache_key = self._cache_key(prompt)
+        if self.use_cache:
+            with self.metrics.timer("cache_lookup"):
+                cache_hit = await asyncio.to_thread(self.cache.get, cache_key, filepath)
+            self.metrics.inc("cache_hits" if cache_hit else "cache_misses")
+        else:
+            cache_hit = False
+        # 🧩 정확히 같은 프롬프트가 없으면 비슷한 프롬프트의 렌더 (NANO_BANANA_SIMILAR_THRESHOLD)
+        match = None
+        if not cache_hit and self.use_cache and self.similar_threshold > 0:
+            with self.metrics.timer("similar_lookup"):
+                match = await asyncio.to_thread(self._find_similar, prompt, scene, filepath)
+            self.metrics.inc("similar_hits" if match else "similar_misses")
+        if cache_hit or match:
+            result = {
+                'success': True,
+                'scene_index': scene_index,
+                'filepath': filepath,
+                'prompt': prompt,
+                'scene': scene,
+                'cached': True
+            }
+            if match:
+                _key, score, match_hash = match
+                result['similar_to'] = match_hash
+                result['similarity'] = round(score, 3)
+                print(f"🧩 Scene {scene_index + 1} reused a similar render (score {score:.2f}, prompt {match_hash})")
+        elif not self.use_cache:
+            # 캐시를 끄면 (새로 생성 요청) 동일 요청 합치기도 하지 않음
+            result = await self._render_scene(scene, scene_index, filepath, cache_key, max_retries, prompt)
+        else:
+            result = await self._render_shared(scene, scene_index, filepath, cache_key, max_retries, prompt)
+
+        if self.previews and result['success'] and 'preview' not in result:
+            # 캐시/공유 결과는 후처리를 거치지 않았으므로 저장된 이미지에서 미리보기 생성
+            result['preview'] = await self._make_preview(result)
+        return result
+
+    async def _make_preview(self, result):
+        """미리보기 경로 (실패하면 원본 경로 - 갤러리는 원본을 그대로 표시)"""
+        preview_path = preview_path_for(result['filepath'])
+        try:
+            stage_timings = await self.postprocess_stage.run(
+                make_preview, result.get('image_bytes') or result['filepath'], preview_path
+            )
+        except OSError as e:
+            print(f"⚠️ Preview failed for scene {result['scene_index'] + 1}: {e}")
+            return result['filepath']
+        self.metrics.inc("postprocess_cpu_seconds", stage_timings.pop("postprocess_cpu", 0.0))
+        self.metrics.observe_all(stage_timings)
+        return preview_path
+
+    async def _render_shared(self, scene, scene_index, filepath, cache_key, max_retries, prompt):
+        """🔁 같은 요청이 이미 진행 중이면 (다른 장면/세션) 그 결과를 받아서 저장"""
+        while True:
+            future, leader = self.single_flight.claim(cache_key)
+            if leader:
+                break
+            self.metrics.inc("dedup_waits")
+            try:
+                shared = await self.single_flight.wait(future)
+            except LeaderCancelled:
+                # 먼저 요청한 쪽이 실패/취소됨 → 이 장면이 자기 예산/재시도 설정으로 다시 요청 (또는 다른 대기자를 기다림)
+                continue
+            await asyncio.to_thread(self._write_file, filepath, shared.image_bytes)
+            self.metrics.inc("dedup_shared")
+            return {
+                'success': True,
+                'scene_index': scene_index,
+                'filepath': filepath,
+                'prompt': prompt,
+                'scene': scene,
+                'deduplicated': True,
+                'image_bytes': shared.image_bytes
+            }
+
+        try:
+            result = await self._render_scene(scene, scene_index, filepath, cache_key, max_retries, prompt)
+        except BaseException:
+            self.single_flight.abandon(cache_key, future)
+            raise
+        if result['success']:
+            self.single_flight.resolve(cache_key, future, SharedRender(result.get('image_bytes')))
+        else:
+            # 실패는 공유하지 않음 (예산 초과/요청 제한 소진은 이 실행에만 해당)
+            self.single_flight.abandon(cache_key, future)
+        return result
+
+    async def _acquire_key(self):
+        """키 선택 + 요청 제한 대기 (시간 예산이 있으면 남은 시간까지만 기다리고 None)"""
+        time_left = self.budget.time_left() if self.budget is not None else None
+        if time_left is None:
+            return await self.key_pool.acquire()
+        try:
+            return await asyncio.wait_for(self.key_pool.acquire(), time_left)
+        except asyncio.TimeoutError:
+            return None
+
+    @staticmethod
+    def _write_file(filepath, data):
+        with open(filepath, 'wb') as f:
+            f.write(data)
+
+    async def _render_scene(self, scene, scene_index, filepath, cache_key, max_retries, prompt):
+        """API 호출 (재시도 포함) → 후처리 → 파일/캐시 저장"""
+        # 단계별 시간 (api: 호출 대기 시간 합계, postprocess_cpu: 워커 CPU 시간)
+        timings = {"api": 0.0}
+
+        for attempt in range(max_retries):
+            slot = None
+            if self.budget is not None and not self.budget.take_call():
+                # 💰 호출/시간 예산 소진 → 재시도도 하지 않음
+                self.metrics.inc("budget_refused")
+                return {
+                    'success': False,
+                    'scene_index': scene_index,
+                    'error': self.budget.refusal(),
+                    'scene': scene
+                }
+            try:
+                # 🚦 남은 할당량이 가장 많은 키 선택 + 그 키의 요청 제한 (키별로 모든 실행이 공유)
+                with self.metrics.timer("rate_limit_wait"):
+                    slot = await self._acquire_key()
+                if slot is None:
+                    # 💰 요청 제한을 기다리는 동안 시간 예산 소진 → 호출하지 않음
+                    self.budget.refund_call()
+                    self.metrics.inc("budget_refused")
+                    return {
+                        'success': False,
+                        'scene_index': scene_index,
+                        'error': self.budget.refusal(),
+                        'scene': scene
+                    }
+                self.metrics.inc("api_calls")
+                if attempt:
+                    self.metrics.inc("retries")
+                api_started = time.perf_counter()
+                try:
+                    response = await slot.client.aio.models.generate_content(
+                        model=MODEL_NAME,
+                        contents=[prompt],
+                        config=self._request_config()
+                    )
+                finally:
+                    api_elapsed = time.perf_counter() - api_started
+                    timings["api"] += api_elapsed
+                    self.metrics.observe("api", api_elapsed)
+
+                if self.concurrency is not None:
+                    self.concurrency.record_success(api_elapsed)
+
+                if not response.candidates:
+                    return {
+                        'success': False,
+                        'scene_index': scene_index,
+                        'error': "No response from API",
+                        'scene': scene
+                    }
+
+                for part in response.candidates[0].content.parts:
+                    if getattr(part, 'inline_data', None):
+                        try:
+                            encoded, preview_path = await self._postprocess_response(
+                                part.inline_data.data, filepath, cache_key, prompt, scene, timings
+                            )
+                        except Exception as e:
+                            # 로컬 디코드/인코딩/저장 실패 → API 오류/키 오류로 세지 않음 (재시도해도 같은 결과)
+                            self.metrics.inc("postprocess_errors")
+                            print(f"❌ Scene {scene_index + 1} post-processing failed: {e}")
+                            return {
+                                'success': False,
+                                'scene_index': scene_index,
+                                'error': f"Post-processing failed: {e}",
+                                'scene': scene
+                            }
+
+                        result = {
+                            'success': True,
+                            'scene_index': scene_index,
+                            'filepath': filepath,
+                            'prompt': prompt,
+                            'scene': scene,
+                            'timings': timings,
+                            # 인코딩된 이미지 (ZIP에 디스크 재읽기 없이 기록 - archive.StreamingZip.add_output)
+                            'image_bytes': encoded
+                        }
+                        if preview_path:
+                            result['preview'] = preview_path
+                        return result
+
+                return {
+                    'success': False,
+                    'scene_index': scene_index,
+                    'error': "No image data in response",
+                    'scene': scene
+                }
+
+            except Exception as e:
+                error_str = str(e)
+
+                # Rate limit 처리
+                if "429" in error_str or "RESOURCE_EXHAUSTED" in error_str or "quota" in error_str.lower():
+                    wait_match = re.search(r'retry in (\d+(?:\.\d+)?)', error_str)
+                    if wait_match:
+                        wait_time = float(wait_match.group(1))
+                    else:
+                        wait_time = 60
+
+                    # 429를 받은 키는 잠시 격리 (그 키를 쓰는 모든 요청 정지, 다른 키는 계속 사용)
+                    self.metrics.inc("rate_limited")
+                    if self.concurrency is not None:
+                        self.concurrency.record_rate_limited()
+                    if slot is not None:
+                        self.key_pool.quarantine(slot, wait_time + 1)
+
+                    if attempt < max_retries - 1:
+                        if len(self.key_pool.slots) > 1:
+                            print(f"⏳ Scene {scene_index + 1} rate limit hit on key {slot.label}. "
+                                  f"Quarantining it for {wait_time:.0f} seconds...")
+                        else:
+                            print(f"⏳ Scene {scene_index + 1} rate limit hit. Pausing all requests for {wait_time:.0f} seconds...")
+                        continue
+                    else:
+                        return {
+                            'success': False,
+                            'scene_index': scene_index,
+                            'error': f"Rate limit exceeded. Wait {wait_time:.0f}s",
+                            'scene': scene
+                        }
+
+                # 기타 에러
+                self.metrics.inc("api_errors")
+                if self.concurrency is not None:
+                    self.concurrency.record_error()
+                if slot is not None:
+                    self.key_pool.record_error(slot)
+                if self.retry_other_errors and attempt < max_retries - 1:
+                    wait_time = (attempt + 1) * 2
+                    print(f"⚠️ Scene {scene_index + 1} failed (attempt {attempt + 1}/{max_retries}): {error_str}")
+                    await asyncio.sleep(wait_time)
+                    continue
+
+                return {
+                    'success': False,
+                    'scene_index': scene_index,
+                    'error': error_str,
+                    'scene': scene
+                }
+
+        return {
+            'success': False,
+            'scene_index': scene_index,
+            'error': "Max retries exceeded",
+            'scene': scene
+        }
+
+    async def _postprocess_response(self, image_data_raw, filepath, cache_key, prompt, scene, timings):
+        """응답 이미지 → 후처리/저장 + 렌더 캐시 → (인코딩된 이미지, 미리보기 경로)"""
+        image_data = self._decode_inline_data(image_data_raw)
+        preview_path = preview_path_for(filepath) if self.previews else None
+        # 🖼️ 디코드/크롭/리사이즈/인코딩(+미리보기)은 프로세스 풀에서 (네트워크 대기와 분리)
+        encoded, stage_timings, counters = await self.postprocess_stage.run(
+            process_image, image_data, self._postprocess_options(), filepath, preview_path
+        )
+        del image_data
+        for name in counters:
+            self.metrics.inc(name)
+        timings.update(stage_timings)
+        self.metrics.inc("postprocess_cpu_seconds", stage_timings.pop("postprocess_cpu", 0.0))
+        self.metrics.observe_all(stage_timings)
+        # 캐시는 디스크를 다시 읽지 않고 인코딩 결과로 바로 저장
+        with self.metrics.timer("cache_put"):
+            await asyncio.to_thread(self.cache.put_bytes, cache_key, encoded)
+        if self.use_cache and self.similar_threshold > 0:
+            await asyncio.to_thread(self._index_similar, cache_key, prompt, scene)
+        return encoded, preview_path
+
+    def generate_scene(self, scene, scene_index, temp_dir, max_retries=3):
+        """동기 호출용 래퍼 (이벤트 루프가 없는 스레드에서 사용)"""
+        return asyncio.run(self.generate_scene_async(scene, scene_index, temp_dir, max_retries))
@@ -0,0 +1,145 @@
+"""json_image.py 생성기 - 모든 장면에 한국인 & 한국 배경 적용"""
+import re
+
+from nano_banana.generator import SceneGenerator
+from nano_banana.geometry import parse_size
+
+# "Korea" / "Korean" / "korea" / "korean" 포함 여부
+KOREA_PATTERN = re.compile(r"[Kk]orea")
+# 사람이 등장하는 장면 (환자, 의사, 사람)
+PEOPLE_PATTERN = re.compile(r"환자|의사|사람")
+
+
+class NanoBananaGenerator(SceneGenerator):
+    def _parse_aspect_ratio(self):
+        ratio = self.output_rules.get("aspect_ratio", "16:9")
+        return str(ratio)
+    
+    def _parse_target_size(self):
+        """OUTPUT_RULES.size ("1920x1080", "native" = 모델 해상도 그대로)"""
+        return parse_size(self.output_rules.get("size", "1920x1080"))
+    
+    def _build_style_description(self):
+        style_parts = []
+        if self.style.get("photorealism"):
+            style_parts.append("photorealistic")
+        if self.style.get("cinematic"):
+            style_parts.append("cinematic composition")
+        if "color_grade" in self.style:
+            style_parts.append(f"{self.style['color_grade']} color grading")
+        if "depth_of_field" in self.style:
+            style_parts.append(f"{self.style['depth_of_field']} depth of field")
+        if "skin_texture" in self.style:
+            style_parts.append(f"{self.style['skin_texture']} skin texture")
+        if "film_grain" in self.style:
+            style_parts.append(f"{self.style['film_grain']} film grain")
+        return ", ".join(style_parts)
+    
+    def _build_negative_prompt(self):
+        avoid_items = []
+        avoid_items.extend(self.negative_prompts)
+        disallow = self.output_rules.get("disallow", [])
+        avoid_items.extend(disallow)
+        
+        avoid_items.extend([
+            "non-Korean people",
+            "Western faces",
+            "Caucasian",
+            "African",
+            "European setting",
+            "American setting",
+            "foreign country"
+        ])
+        
+        if avoid_items:
+            return f"Avoid: {', '.join(avoid_items)}. "
+        return ""
+    
+    def _build_character_description(self, character_names):
+        descriptions = []
+        
+        for char_name in character_names:
+            if char_name in self.character_bible:
+                char = self.character_bible[char_name]
+                desc = f"Korean person, {char.get('age', 'adult')}"
+                
+                if 'appearance' in char:
+                    desc += f", {char['appearance']}"
+                if 'clothing' in char:
+                    desc += f", wearing {char['clothing']}"
+                
+                descriptions.append(desc)
+            else:
+                descriptions.append(f"Korean person")
+        
+        return "; ".join(descriptions) if descriptions else "Korean people"
+    
+    def _build_camera_description(self, camera_info):
+        parts = []
+        if "shot" in camera_info:
+            parts.append(camera_info["shot"])
+        if "lens" in camera_info:
+            parts.append(f"{camera_info['lens']} lens")
+        if "angle" in camera_info:
+            parts.append(camera_info["angle"])
+        if "lighting" in camera_info:
+            parts.append(camera_info["lighting"])
+        return ", ".join(parts) if parts else ""
+    
+    def _add_korean_context(self, description):
+        if KOREA_PATTERN.search(description):
+            return description
+        return f"{description} Set in Korea with Korean architecture and environment."
+    
+    def _compile_prompt_fragments(self):
+        """장면과 무관한 프롬프트 조각 (스타일, 네거티브, 고정 문구)을 한 번만 생성"""
+        middle_parts = [
+            "\nLocation: Korea (South Korea)",
+            "Environment: Korean setting with authentic Korean architectural elements, Korean street signs, Korean interior design"
+        ]
+        style_desc = self._build_style_description()
+        if style_desc:
+            middle_parts.append(f"\nStyle: {style_desc}")
+        
+        tail_parts = []
+        negative = self._build_negative_prompt()
+        if negative:
+            tail_parts.append(f"\n{negative}")
+        tail_parts.append("\nCreate a single cohesive scene with realistic details.")
+        tail_parts.append("Ensure Korean ethnicity for all people and Korean setting for all locations.")
+        
+        self._prompt_head = "IMPORTANT: All people must be Korean with East Asian facial features. Setting must be in Korea."
+        self._prompt_middle = "\n".join(middle_parts)
+        self._prompt_tail = "\n".join(tail_parts)
+        self._character_descriptions = {}  # {등장인물 이름 tuple: 설명}
+    
+    def _character_description(self, characters):
+        key = tuple(characters)
+        if key not in self._character_descriptions:
+            self._character_descriptions[key] = self._build_character_description(characters)
+        return self._character_descriptions[key]
+    
+    def _create_prompt(self, scene):
+        prompt_parts = [self._prompt_head]
+        
+        main_description = scene.get("DESCRIPTION", "")
+        main_description = self._add_korean_context(main_description)
+        prompt_parts.append(f"\n{main_description}")
+        
+        characters = scene.get("CHARACTERS", [])
+        if characters or PEOPLE_PATTERN.search(main_description):
+            char_desc = self._character_description(characters)
+            prompt_parts.append(f"\nCharacters: {char_desc}")
+        else:
+            prompt_parts.append("\nIf any people appear: They must be Korean with East Asian features.")
+        
+        prompt_parts.append(self._prompt_middle)
+        
+        camera = scene.get("CAMERA", {})
+        camera_desc = self._build_camera_description(camera)
+        if camera_desc:
+            prompt_parts.append(f"\nCamera: {camera_desc}")
+        
+        prompt_parts.append(self._prompt_tail)
+        
+        return "\n".join(prompt_parts)
@@ -0,0 +1,174 @@
+"""v2_json_image.py 생성기 - 16:9 크롭, 현대 한국 배경, 일러스트는 깔끔한 배경"""
+import re
+
+from nano_banana.generator import SceneGenerator
+
+ILLUSTRATION_KEYWORDS = [
+    'illustration', 'diagram', '3d', 'icon', 'infographic', 
+    'graphic', 'chart', 'visualization', 'concept',
+    '일러스트', '다이어그램', '그래픽', '도표', '아이콘'
+]
+# 모든 키워드를 한 번에 찾는 정규식 (소문자 설명에 적용)
+ILLUSTRATION_PATTERN = re.compile("|".join(re.escape(keyword) for keyword in ILLUSTRATION_KEYWORDS))
+
+
+class NanoBananaGenerator(SceneGenerator):
+    # 일시적 오류도 재시도
+    retry_other_errors = True
+    
+    def _parse_aspect_ratio(self):
+        """16:9 고정"""
+        return "16:9"
+    
+    def _parse_target_size(self):
+        """1920x1080 고정 (유튜브 롱폼)"""
+        return (1920, 1080)
+    
+    def _build_style_description(self):
+        style_parts = []
+        if self.style.get("photorealism"):
+            style_parts.append("photorealistic")
+        if self.style.get("cinematic"):
+            style_parts.append("cinematic composition")
+        if "color_grade" in self.style:
+            style_parts.append(f"{self.style['color_grade']} color grading")
+        if "depth_of_field" in self.style:
+            style_parts.append(f"{self.style['depth_of_field']} depth of field")
+        if "skin_texture" in self.style:
+            style_parts.append(f"{self.style['skin_texture']} skin texture")
+        if "film_grain" in self.style:
+            style_parts.append(f"{self.style['film_grain']} film grain")
+        return ", ".join(style_parts)
+    
+    def _is_illustration_or_diagram(self, description):
+        """3D 일러스트, 다이어그램, 그래픽인지 판단"""
+        return ILLUSTRATION_PATTERN.search(description.lower()) is not None
+    
+    def _build_negative_prompt(self, is_illustration=False):
+        """네거티브 프롬프트 생성 (장면 타입에 따라 다르게)"""
+        avoid_items = []
+        avoid_items.extend(self.negative_prompts)
+        disallow = self.output_rules.get("disallow", [])
+        avoid_items.extend(disallow)
+        
+        if is_illustration:
+            # 일러스트/다이어그램: 배경 요소 제거
+            avoid_items.extend([
+                "busy background",
+                "complex background",
+                "architectural background",
+                "landscape background",
+                "Korean buildings",
+                "traditional architecture",
+                "street scene"
+            ])
+        else:
+            # 실사 장면: 비한국적 요소 및 전통 요소 제거
+            avoid_items.extend([
+                "non-Korean people",
+                "Western faces",
+                "Caucasian",
+                "African",
+                "European setting",
+                "American setting",
+                "foreign country",
+                "traditional hanbok",
+                "traditional Korean clothing",
+                "hanok",
+                "traditional Korean architecture",
+                "traditional Korean building",
+                "historic Korea",
+                "ancient Korea",
+                "Joseon era"
+            ])
+        
+        if avoid_items:
+            return f"Avoid: {', '.join(avoid_items)}. "
+        return ""
+    
+    def _build_camera_description(self, camera):
+        camera_parts = []
+        if "shot" in camera:
+            camera_parts.append(camera["shot"])
+        if "angle" in camera:
+            camera_parts.append(camera["angle"])
+        if "movement" in camera:
+            camera_parts.append(camera["movement"])
+        return ", ".join(camera_parts)
+    
+    def _compile_prompt_fragments(self):
+        """장면 타입(일러스트/실사)별로 변하지 않는 프롬프트 조각을 한 번만 생성"""
+        style_desc = self._build_style_description()
+        self._style_part = f"\nStyle: {style_desc}" if style_desc else None
+        
+        # 일러스트/다이어그램: 깔끔한 배경 / 실사 장면: 현대 한국 배경
+        self._background_parts = {
+            True: "\n".join([
+                "\nBackground: Clean, minimal background with soft gradient or solid color",
+                "Style: Professional 3D illustration or educational diagram with clear focus on subject"
+            ]),
+            False: "\n".join([
+                "\nLocation: Present-day Korea (2020s), modern Korean setting",
+                "Environment: Contemporary Korean architecture with modern buildings, city streets with Korean signage, modern Korean interior design",
+                "People: Korean ethnicity with natural Korean features, wearing modern casual clothing (contemporary fashion, casual wear, everyday clothes)",
+                "Time period: Modern era (2020s), contemporary lifestyle"
+            ]),
+        }
+        
+        # 네거티브 프롬프트 + 마무리
+        self._tail_parts = {}
+        for is_illustration in (True, False):
+            tail_parts = []
+            negative = self._build_negative_prompt(is_illustration)
+            if negative:
+                tail_parts.append(f"\n{negative}")
+            tail_parts.append("\nCreate a single cohesive scene with realistic details.")
+            if not is_illustration:
+                tail_parts.append("Ensure Korean ethnicity for all people in modern casual clothing and contemporary Korean setting (2020s).")
+            self._tail_parts[is_illustration] = "\n".join(tail_parts)
+    
+    def _create_prompt(self, scene):
+        """프롬프트 생성 - 조건부 배경 적용"""
+        prompt_parts = []
+        
+        # 기본 설명
+        description = scene.get("DESCRIPTION", "")
+        prompt_parts.append(description)
+        
+        # 캐릭터 추가
+        characters = scene.get("CHARACTERS", [])
+        if characters:
+            for char in characters:
+                char_info = self.character_bible.get(char, {})
+                if char_info:
+                    char_desc = f"{char}: {char_info.get('description', '')}"
+                    prompt_parts.append(char_desc)
+        
+        # 🔧 장면 타입 판단
+        is_illustration = self._is_illustration_or_diagram(description)
+        
+        prompt_parts.append(self._background_parts[is_illustration])
+        
+        # 스타일
+        if self._style_part:
+            prompt_parts.append(self._style_part)
+        
+        # 카메라
+        camera = scene.get("CAMERA", {})
+        camera_desc = self._build_camera_description(camera)
+        if camera_desc:
+            prompt_parts.append(f"\nCamera: {camera_desc}")
+        
+        # 네거티브 프롬프트 + 마무리
+        prompt_parts.append(self._tail_parts[is_illustration])
+        
+        return "\n".join(prompt_parts)
+    
+    def _final_prompt(self, scene):
+        prompt = self._create_prompt(scene)
+        # 16:9 비율 강조 및 현대적 설정 강조
+        return f"16:9 aspect ratio, widescreen format, modern contemporary setting. {prompt}"
+    
+    def _postprocess_settings(self):
+        # 16:9 크롭은 geometry 계획에서 (비율을 API에 직접 요청, 남는 크롭은 리샘플에 합쳐서 처리)
+        return {"flatten_alpha": "white"}
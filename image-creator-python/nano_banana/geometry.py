@@ -0,0 +1,132 @@
+"""출력 형태 계획 - API에 비율을 직접 요청하고, 후처리는 필요한 단계만 (크롭/리샘플 생략 가능)
+
+1. 요청: OUTPUT_RULES 비율(또는 목표 크기의 비율)에 가장 가까운 모델 지원 비율을 image_config로
+2. 크롭: 받은 이미지 비율이 목표 크기 비율과 다를 때만 (리샘플에 box로 합쳐서 복사 없이)
+3. 리샘플: 가장 싼 경로 - none (크기 같음) / reduce (정수배 축소) / downscale / upscale
+"""
+import re
+
+# Gemini 2.5 Flash Image가 지원하는 aspect_ratio → 기본 출력 해상도
+NATIVE_SIZES = {
+    "1:1": (1024, 1024),
+    "2:3": (832, 1248),
+    "3:2": (1248, 832),
+    "3:4": (864, 1184),
+    "4:3": (1184, 864),
+    "4:5": (896, 1152),
+    "5:4": (1152, 896),
+    "9:16": (768, 1344),
+    "16:9": (1344, 768),
+    "21:9": (1536, 672),
+}
+
+# 리샘플 경로 (metrics 카운터: geometry_<경로>)
+RESAMPLE_PATHS = ("none", "reduce", "downscale", "upscale")
+
+_SIZE_PATTERN = re.compile(r"^\s*(\d+)\s*[xX×]\s*(\d+)\s*$")
+
+
+def parse_ratio(ratio):
+    """"16:9" → (16, 9)"""
+    if isinstance(ratio, str) and ':' in ratio:
+        width, height = ratio.split(':')
+        return (float(width), float(height))
+    return tuple(ratio)
+
+
+def parse_size(size, default=(1920, 1080)):
+    """"1920x1080" → (1920, 1080), "native" → None (모델이 준 해상도 유지)"""
+    if size is None:
+        return default
+    if isinstance(size, str):
+        if size.strip().lower() == "native":
+            return None
+        match = _SIZE_PATTERN.match(size)
+        return (int(match.group(1)), int(match.group(2))) if match else default
+    return tuple(size)
+
+
+def nearest_supported_ratio(ratio):
+    """임의의 비율 → 모델이 지원하는 가장 가까운 aspect_ratio 문자열"""
+    width, height = parse_ratio(ratio)
+    wanted = width / height
+    return min(NATIVE_SIZES, key=lambda name: abs(_ratio_value(name) - wanted))
+
+
+def _ratio_value(name):
+    width, height = parse_ratio(name)
+    return width / height
+
+
+def crop_box_for_aspect_ratio(size, target_ratio=(16, 9)):
+    """왜곡 없이 목표 비율로 중앙 크롭할 영역 (left, top, right, bottom) - 이미 맞으면 None"""
+    img_width, img_height = size
+    img_ratio = img_width / img_height
+    target_ratio_value = target_ratio[0] / target_ratio[1]
+
+    if abs(img_ratio - target_ratio_value) < 0.01:
+        # 이미 비율이 맞으면 크롭 안 함
+        return None
+
+    if img_ratio > target_ratio_value:
+        # 이미지가 더 가로로 넓음 -> 좌우 크롭
+        new_width = int(img_height * target_ratio_value)
+        left = (img_width - new_width) // 2
+        return (left, 0, left + new_width, img_height)
+    else:
+        # 이미지가 더 세로로 길음 -> 상하 크롭
+        new_height = int(img_width / target_ratio_value)
+        top = (img_height - new_height) // 2
+        return (0, top, img_width, top + new_height)
+
+
+def plan_resample(size, crop=None, target_size=None):
+    """받은 이미지 크기 → (crop_box 또는 None, 최종 크기, 리샘플 경로)
+
+    crop: 목표 비율 ("16:9" 또는 (w, h)), target_size: None이면 크롭한 크기 그대로
+    """
+    box = crop_box_for_aspect_ratio(size, parse_ratio(crop)) if crop else None
+    source = size if box is None else (box[2] - box[0], box[3] - box[1])
+    target = tuple(target_size) if target_size else source
+
+    if source == target:
+        return box, target, "none"
+    factor_x, rest_x = divmod(source[0], target[0])
+    factor_y, rest_y = divmod(source[1], target[1])
+    if factor_x == factor_y and factor_x > 1 and not rest_x and not rest_y:
+        # 정확한 정수배 → 평균 풀링 (LANCZOS보다 훨씬 쌈)
+        return box, target, "reduce"
+    if source[0] >= target[0] and source[1] >= target[1]:
+        return box, target, "downscale"
+    return box, target, "upscale"
+
+
+class OutputGeometry:
+    """생성기 설정 → API 요청 비율 + 후처리 옵션 (crop, size)"""
+
+    def __init__(self, aspect_ratio=None, size=(1920, 1080)):
+        self.size = tuple(size) if size else None
+        # 요청 비율: 설정값이 있으면 그것, 없으면 목표 크기의 비율 (모델이 지원하는 값으로 맞춤)
+        wanted = aspect_ratio or (f"{self.size[0]}:{self.size[1]}" if self.size else None)
+        self.request_ratio = nearest_supported_ratio(wanted) if wanted else None
+        # 크롭 비율: 목표 크기가 있으면 그 비율 (늘이지 않도록), 없으면 요청 비율
+        if self.size:
+            self.crop = f"{self.size[0]}:{self.size[1]}"
+        else:
+            self.crop = aspect_ratio
+
+    def image_config(self):
+        return {"aspect_ratio": self.request_ratio} if self.request_ratio else None
+
+    def postprocess_options(self):
+        return {"crop": self.crop, "size": self.size}
+
+
+def geometry_line(metrics):
+    """📐 리샘플 경로별 장면 수 (한 번도 안 쓴 경로는 생략)"""
+    counts = [(path, int(metrics.counter(f"geometry_{path}"))) for path in RESAMPLE_PATHS]
+    parts = [f"{path} {count}" for path, count in counts if count]
+    cropped = int(metrics.counter("geometry_cropped"))
+    if cropped:
+        parts.append(f"cropped {cropped}")
+    return "📐 Resample paths: " + (" | ".join(parts) if parts else "-")
@@ -0,0 +1,131 @@
+"""실행 기록(manifest) - 장면이 끝날 때마다 기록해서 중단/실패 후 남은 장면만 재실행"""
+import hashlib
+import json
+import os
+import re
+import secrets
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from nano_banana.scene_stream import SceneSource, open_scene_source
+
+RUNS_DIR = os.environ.get("NANO_BANANA_RUNS_DIR", os.path.join(tempfile.gettempdir(), "nano_banana_runs"))
+
+MANIFEST_NAME = "manifest.jsonl"
+CONFIG_NAME = "config.json"
+
+_RUN_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+def new_run_id(prefix=""):
+    """타임스탬프 + 랜덤 실행 ID (예: 20250101_120000_a1b2c3)"""
+    run_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{secrets.token_hex(3)}"
+    return f"{prefix}_{run_id}" if prefix else run_id
+
+
+def prompt_hash(prompt):
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+
+
+class RunJournal:
+    """실행 디렉토리의 manifest.jsonl (한 줄 = 한 장면 결과, 추가 전용 + fsync)"""
+
+    def __init__(self, run_dir):
+        self.run_dir = run_dir
+        self.manifest_path = os.path.join(run_dir, MANIFEST_NAME)
+        self.entries = {}  # {scene_index: 마지막 기록}
+        self._lock = threading.Lock()
+        os.makedirs(run_dir, exist_ok=True)
+        self._load()
+
+    @property
+    def run_id(self):
+        return os.path.basename(os.path.normpath(self.run_dir))
+
+    @classmethod
+    def new_run(cls, config, runs_dir=None):
+        """새 실행 디렉토리 생성 + 설정 저장"""
+        journal = cls(os.path.join(runs_dir or RUNS_DIR, new_run_id()))
+        journal.save_config(config)
+        return journal
+
+    @classmethod
+    def load_run(cls, run_id, runs_dir=None):
+        """기존 실행 열기 (없으면 ValueError)"""
+        run_id = (run_id or "").strip()
+        run_dir = os.path.join(runs_dir or RUNS_DIR, run_id)
+        if not _RUN_ID_PATTERN.match(run_id) or not os.path.isdir(run_dir):
+            raise ValueError(f"Unknown run: {run_id}")
+        return cls(run_dir)
+
+    def _load(self):
+        if not os.path.exists(self.manifest_path):
+            return
+        with open(self.manifest_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # 프로세스가 죽으면서 잘린 마지막 줄은 무시
+                    continue
+                self.entries[entry["scene_index"]] = entry
+
+    def save_config(self, config):
+        """설정 저장 (dict 또는 SceneSource - 장면은 하나씩 기록)"""
+        path = os.path.join(self.run_dir, CONFIG_NAME)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            if isinstance(config, SceneSource):
+                config.write_json(f)
+            else:
+                json.dump(config, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def load_config(self):
+        with open(os.path.join(self.run_dir, CONFIG_NAME), encoding="utf-8") as f:
+            return json.load(f)
+
+    def load_scene_source(self):
+        """저장된 설정을 장면 단위로 읽기 (재개 시 전체 목록을 메모리에 올리지 않음)"""
+        return open_scene_source(os.path.join(self.run_dir, CONFIG_NAME))
+
+    def record(self, result):
+        """generate_scene 결과 한 건 기록"""
+        scene_index = result['scene_index']
+        with self._lock:
+            previous = self.entries.get(scene_index, {})
+            entry = {
+                "scene_index": scene_index,
+                "prompt_hash": (prompt_hash(result['prompt']) if result.get('prompt')
+                                else result.get('prompt_hash') or previous.get("prompt_hash")),
+                "status": "ok" if result['success'] else "error",
+                "output_path": result.get('filepath'),
+                "error": result.get('error'),
+                "attempts": previous.get("attempts", 0) + 1,
+                "ts": round(time.time(), 3),
+            }
+            if result.get('similar_to'):
+                # 🧩 비슷한 프롬프트의 렌더를 재사용한 장면 (그 프롬프트의 hash + 유사도)
+                entry["similar_to"] = result['similar_to']
+                entry["similarity"] = result.get('similarity')
+            with open(self.manifest_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.entries[scene_index] = entry
+        return entry
+
+    def is_done(self, scene_index):
+        entry = self.entries.get(scene_index)
+        return bool(entry and entry["status"] == "ok" and entry["output_path"]
+                    and os.path.exists(entry["output_path"]))
+
+    def completed_paths(self):
+        """{scene_index: 출력 파일} - 성공했고 파일이 남아 있는 장면"""
+        return {idx: entry["output_path"] for idx, entry in self.entries.items() if self.is_done(idx)}
+
+    def pending_indices(self, total_scenes):
+        """아직 없거나 실패한 장면 인덱스"""
+        return [i for i in range(total_scenes) if not self.is_done(i)]
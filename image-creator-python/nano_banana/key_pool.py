@@ -0,0 +1,151 @@
+"""여러 API 키 풀 - 키마다 클라이언트/요청 제한기, 남은 할당량이 가장 많은 키로 장면 분배"""
+import asyncio
+import re
+import threading
+import time
+
+from nano_banana.rate_limit import get_rate_limiter, key_fingerprint
+
+
+def parse_api_keys(value):
+    """"key1, key2\\nkey3" 또는 리스트 → 중복 없는 키 리스트 (입력 순서 유지)"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = re.split(r"[,\s]+", value)
+    keys = []
+    for key in value:
+        key = (key or "").strip()
+        if key and key not in keys:
+            keys.append(key)
+    return keys
+
+
+def mask_key(api_key):
+    """로그용 키 표시 (끝 4자리만)"""
+    if not api_key:
+        return "client"
+    return f"…{api_key[-4:]}"
+
+
+class KeySlot:
+    """키 하나 = 클라이언트 하나 + 요청 제한기 + 격리 상태 + 요청 수"""
+
+    def __init__(self, api_key, client, limiter):
+        self.label = mask_key(api_key)
+        self.fingerprint = key_fingerprint(api_key)
+        self.client = client
+        self.limiter = limiter
+        self.quarantined_until = 0.0
+        self.requests = 0  # 토큰을 받아 실제로 보낸 요청 수
+        self.acquiring = 0  # 이 키를 골라 토큰을 기다리는 중인 요청 수
+        self.rate_limited = 0
+        self.errors = 0
+
+    def quarantined(self, now=None):
+        return (now or time.monotonic()) < self.quarantined_until
+
+
+class KeyPool:
+    """키 선택 (격리되지 않은 키 중 토큰이 가장 많은 키) + 429 시 해당 키만 격리"""
+
+    def __init__(self, slots):
+        if not slots:
+            raise ValueError("At least one API key is required")
+        self.slots = slots
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_keys(cls, api_keys, client=None):
+        """키마다 genai.Client 생성 (client가 주어지면 그 클라이언트 하나만 사용)"""
+        if client is not None:
+            return cls([KeySlot(None, client, get_rate_limiter())])
+
+        from google import genai
+
+        keys = parse_api_keys(api_keys)
+        if not keys:
+            raise ValueError("At least one API key is required")
+        return cls([KeySlot(key, genai.Client(api_key=key), get_rate_limiter(key)) for key in keys])
+
+    def _pick(self):
+        """(선택된 키, 모든 키가 격리 중이면 남은 격리 시간)"""
+        now = time.monotonic()
+        with self._lock:
+            available = [slot for slot in self.slots if not slot.quarantined(now)]
+            if not available:
+                return None, min(slot.quarantined_until for slot in self.slots) - now
+            # 남은 토큰이 가장 많은 키 → 같으면 요청을 덜 보낸 키 (토큰 대기 중인 요청 포함)
+            slot = max(available, key=lambda s: (s.limiter.available(), -(s.requests + s.acquiring)))
+            slot.acquiring += 1
+            return slot, 0.0
+
+    async def acquire(self):
+        """요청을 보낼 키를 골라 그 키의 토큰까지 획득"""
+        while True:
+            slot, wait = self._pick()
+            if slot is not None:
+                break
+            await asyncio.sleep(wait)
+        acquired = False
+        try:
+            await slot.limiter.acquire()
+            acquired = True
+        finally:
+            # 요청 수는 토큰을 받은 뒤에만 (대기 중 시간 초과/취소된 요청은 세지 않음)
+            with self._lock:
+                slot.acquiring -= 1
+                if acquired:
+                    slot.requests += 1
+        return slot
+
+    def quarantine(self, slot, seconds):
+        """429/할당량 오류를 받은 키를 seconds 동안 제외 (다른 키로 계속 진행)"""
+        with self._lock:
+            slot.rate_limited += 1
+            slot.quarantined_until = max(slot.quarantined_until, time.monotonic() + seconds)
+        slot.limiter.pause(seconds)
+
+    def record_error(self, slot):
+        with self._lock:
+            slot.errors += 1
+
+    def all_quarantined(self):
+        now = time.monotonic()
+        return all(slot.quarantined(now) for slot in self.slots)
+
+    def summary(self):
+        """키별 요청 수 (실행 요약용)"""
+        with self._lock:
+            return [
+                {
+                    "key": slot.label,
+                    "fingerprint": slot.fingerprint,
+                    "requests": slot.requests,
+                    "rate_limited": slot.rate_limited,
+                    "errors": slot.errors,
+                }
+                for slot in self.slots
+            ]
+
+    def keys_line(self):
+        """🔑 …abcd 12 req (2×429) | …wxyz 10 req"""
+        now = time.monotonic()
+        parts = []
+        for slot in self.slots:
+            part = f"{slot.label} {slot.requests} req"
+            if slot.rate_limited:
+                part += f" ({slot.rate_limited}×429)"
+            if slot.quarantined(now):
+                part += " ⏸️"
+            parts.append(part)
+        return "🔑 Keys: " + " | ".join(parts)
+
+    def status_line(self):
+        """단일 키면 요청 제한기 상태, 여러 키면 키별 요청 수도 함께"""
+        if len(self.slots) == 1:
+            return self.slots[0].limiter.status_line()
+        rate = sum(slot.limiter.current_rate() for slot in self.slots)
+        capacity = sum(slot.limiter.requests_per_minute for slot in self.slots)
+        queue = sum(slot.limiter.queue_depth for slot in self.slots)
+        return f"🚦 Rate: {rate}/{capacity} req/min | Queue: {queue} waiting\n{self.keys_line()}"
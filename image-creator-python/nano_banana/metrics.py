@@ -0,0 +1,189 @@
+"""단계별 지연/처리량 지표 - Prometheus 텍스트 엔드포인트 + 실행별 JSON 요약"""
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 초 단위 히스토그램 버킷 (Prometheus 기본값 + 긴 API 대기용)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# /metrics는 인증이 없으므로 기본은 끔 (예: 9464로 켬), 켜도 기본은 로컬에서만 접근 가능
+METRICS_PORT = int(os.environ.get("NANO_BANANA_METRICS_PORT", "0"))
+METRICS_HOST = os.environ.get("NANO_BANANA_METRICS_HOST", "127.0.0.1")
+
+
+class _Stage:
+    __slots__ = ("count", "total", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * len(BUCKETS)
+
+
+class Metrics:
+    """단계 타이머 + 카운터 (parent가 있으면 프로세스 전역 지표에도 같이 기록)"""
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.started = time.time()
+        self._stages = defaultdict(_Stage)
+        self._counters = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds, count=1):
+        """stage에 걸린 시간 기록 (count > 1이면 seconds를 count개 항목의 합계로 간주)"""
+        per_item = seconds / count if count else 0.0
+        with self._lock:
+            entry = self._stages[stage]
+            entry.count += count
+            entry.total += seconds
+            entry.max = max(entry.max, per_item)
+            for i, bound in enumerate(BUCKETS):
+                if per_item <= bound:
+                    entry.buckets[i] += count
+        if self.parent is not None:
+            self.parent.observe(stage, seconds, count)
+
+    def observe_all(self, timings):
+        """{stage: seconds} 한 번에 기록 (프로세스 풀 워커가 돌려준 시간)"""
+        for stage, seconds in timings.items():
+            self.observe(stage, seconds)
+
+    @contextmanager
+    def timer(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    def inc(self, name, value=1):
+        with self._lock:
+            self._counters[name] += value
+        if self.parent is not None:
+            self.parent.inc(name, value)
+
+    def counter(self, name):
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def snapshot(self):
+        with self._lock:
+            stages = {
+                name: {
+                    "count": entry.count,
+                    "total_s": round(entry.total, 6),
+                    "mean_s": round(entry.total / entry.count, 6) if entry.count else 0.0,
+                    "max_s": round(entry.max, 6),
+                }
+                for name, entry in self._stages.items()
+            }
+            counters = dict(self._counters)
+        return {"stages": stages, "counters": counters}
+
+    def summary(self, **extra):
+        """실행 요약 (JSON 저장용)"""
+        elapsed = time.time() - self.started
+        data = self.snapshot()
+        scenes_done = data["counters"].get("scenes_ok", 0) + data["counters"].get("scenes_failed", 0)
+        data.update({
+            "started_at": self.started,
+            "elapsed_s": round(elapsed, 3),
+            "scenes_per_s": round(scenes_done / elapsed, 4) if elapsed > 0 else 0.0,
+        })
+        data.update(extra)
+        return data
+
+    def write_summary(self, path, **extra):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(**extra), f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+        return path
+
+    def stage_line(self):
+        """로그용 한 줄 요약 (단계별 평균 시간)"""
+        stages = self.snapshot()["stages"]
+        if not stages:
+            return "⏱️ Stages: no data yet"
+        parts = [f"{name} {entry['mean_s']:.3f}s" for name, entry in stages.items()]
+        return "⏱️ Stages (mean): " + " | ".join(parts)
+
+    def render_prometheus(self, prefix="nano_banana", gauges=None):
+        """Prometheus 텍스트 형식 (stage 히스토그램 + 카운터 + 게이지)"""
+        lines = [
+            f"# HELP {prefix}_stage_seconds Time spent per pipeline stage.",
+            f"# TYPE {prefix}_stage_seconds histogram",
+        ]
+        with self._lock:
+            for name, entry in sorted(self._stages.items()):
+                for bound, bucket_count in zip(BUCKETS, entry.buckets):
+                    lines.append(f'{prefix}_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {bucket_count}')
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {entry.count}')
+                lines.append(f'{prefix}_stage_seconds_sum{{stage="{name}"}} {entry.total}')
+                lines.append(f'{prefix}_stage_seconds_count{{stage="{name}"}} {entry.count}')
+
+            lines.append(f"# HELP {prefix}_events_total Pipeline event counters.")
+            lines.append(f"# TYPE {prefix}_events_total counter")
+            for name, value in sorted(self._counters.items()):
+                lines.append(f'{prefix}_events_total{{event="{name}"}} {value:g}')
+
+        for name, value in sorted((gauges or {}).items()):
+            lines.append(f"# TYPE {prefix}_{name} gauge")
+            lines.append(f"{prefix}_{name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+_global_metrics = Metrics()
+
+
+def get_global_metrics():
+    """프로세스 전역 지표 (/metrics 엔드포인트에서 노출)"""
+    return _global_metrics
+
+
+def _current_gauges():
+    from nano_banana.rate_limit import all_rate_limiters
+
+    limiters = all_rate_limiters().values()
+    return {
+        "rate_limiter_requests_per_minute": sum(limiter.current_rate() for limiter in limiters),
+        "rate_limiter_queue_depth": sum(limiter.queue_depth for limiter in limiters),
+    }
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = _global_metrics.render_prometheus(gauges=_current_gauges()).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # 스크레이프 요청마다 stderr에 로그를 남기지 않음
+        pass
+
+
+def start_metrics_server(port=METRICS_PORT, host=METRICS_HOST):
+    """백그라운드 스레드에서 /metrics HTTP 엔드포인트 시작 (port 0이면 시작 안 함)"""
+    if not port:
+        return None
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        # 다른 앱이 이미 포트를 쓰는 경우 등 - 생성 자체는 계속 진행
+        print(f"⚠️ Metrics endpoint disabled (port {port}): {e}")
+        return None
+    print(f"📊 Metrics endpoint: http://{host}:{port}/metrics")
+    threading.Thread(target=server.serve_forever, name="nano-banana-metrics", daemon=True).start()
+    return server
@@ -0,0 +1,211 @@
+"""출력 저장소 - 실행 디렉토리(이미지 + ZIP + manifest)의 총 크기/보관 기간 제한
+
+실행 하나 = RUNS_DIR 아래 디렉토리 하나. 오래되었거나 총 크기를 넘으면 가장 오래 쓰지 않은 실행부터 삭제.
+생성 중인 실행(active)과 다운로드 유예 기간(.lease)이 남은 실행은 삭제하지 않음.
+
+Gradio가 gr.File/gr.Gallery에 넘긴 파일을 복사해 두는 캐시(GRADIO_TEMP_DIR)는 사용량에만 포함:
+호스트의 다른 Gradio 앱과 공유하는 디렉토리라 여기서는 지우지 않음 (삭제는 gr.Blocks(delete_cache=...)).
+"""
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from nano_banana.journal import RUNS_DIR, new_run_id
+
+DEFAULT_MAX_BYTES = int(os.environ.get("NANO_BANANA_OUTPUT_MAX_MB", "5120")) * 1024 * 1024
+DEFAULT_MAX_AGE = float(os.environ.get("NANO_BANANA_OUTPUT_MAX_AGE_HOURS", "72")) * 3600
+# 생성이 끝난 뒤에도 ZIP/이미지 다운로드를 위해 보존하는 시간
+DOWNLOAD_GRACE = float(os.environ.get("NANO_BANANA_DOWNLOAD_GRACE_MIN", "60")) * 60
+# 정리 작업 최소 간격 (실행마다 전체 디렉토리를 훑지 않도록)
+CLEANUP_INTERVAL = 60.0
+# Gradio가 출력 파일(ZIP, 미리보기, 원본)을 복사해 두는 캐시의 보관 시간 (gr.Blocks delete_cache)
+GRADIO_CACHE_MAX_AGE = float(os.environ.get("NANO_BANANA_GRADIO_CACHE_MAX_AGE_MIN", "120")) * 60
+# Gradio 캐시 위치 (gradio.utils.get_upload_folder와 같은 규칙)
+GRADIO_CACHE_DIR = os.environ.get("GRADIO_TEMP_DIR") or os.path.join(tempfile.gettempdir(), "gradio")
+
+LEASE_NAME = ".lease"
+
+
+def _format_bytes(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class OutputStore:
+    """실행 디렉토리 수명 관리 (크기/기간 제한, LRU 삭제, 사용량 보고, 사용 중 실행 보호) + Gradio 캐시 사용량 보고"""
+
+    def __init__(self, runs_dir=None, max_bytes=DEFAULT_MAX_BYTES, max_age=DEFAULT_MAX_AGE,
+                 download_grace=DOWNLOAD_GRACE, gradio_dir=GRADIO_CACHE_DIR):
+        self.runs_dir = runs_dir or RUNS_DIR
+        self.gradio_dir = gradio_dir  # 사용량 보고만 (None이면 보고하지 않음)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.download_grace = download_grace
+        self._active = {}  # {실행 디렉토리: 사용 중인 핸들러 수}
+        self._lock = threading.Lock()
+        self._last_cleanup = 0.0
+        self._usage = {"runs": 0, "bytes": 0, "gradio_bytes": 0}
+        os.makedirs(self.runs_dir, exist_ok=True)
+
+    def new_run_dir(self, prefix=""):
+        """정리 대상에 포함되는 새 실행 디렉토리 (예: 단일 장면 생성)"""
+        run_dir = os.path.join(self.runs_dir, new_run_id(prefix))
+        os.makedirs(run_dir, exist_ok=True)
+        return run_dir
+
+    def _key(self, run_dir):
+        return os.path.abspath(run_dir)
+
+    def acquire(self, run_dir):
+        """생성 중인 실행 보호 시작 (release 전까지 삭제 안 함)"""
+        key = self._key(run_dir)
+        with self._lock:
+            self._active[key] = self._active.get(key, 0) + 1
+        self.touch(run_dir)
+
+    def release(self, run_dir):
+        """보호 해제 - 이후 다운로드 유예 기간(lease) 동안은 계속 보존"""
+        key = self._key(run_dir)
+        with self._lock:
+            remaining = self._active.get(key, 0) - 1
+            if remaining > 0:
+                self._active[key] = remaining
+            else:
+                self._active.pop(key, None)
+        self.touch(run_dir)
+
+    @contextmanager
+    def active(self, run_dir):
+        self.acquire(run_dir)
+        try:
+            yield run_dir
+        finally:
+            self.release(run_dir)
+
+    def touch(self, run_dir):
+        """최근 사용 시각 갱신 + 다운로드 유예 기간 연장 (다른 프로세스의 정리 작업도 존중)"""
+        expires = time.time() + self.download_grace
+        try:
+            with open(os.path.join(run_dir, LEASE_NAME), "w") as f:
+                f.write(f"{expires:.0f}")
+            os.utime(run_dir)
+        except OSError:
+            pass
+
+    def _lease_expires(self, run_dir):
+        try:
+            with open(os.path.join(run_dir, LEASE_NAME)) as f:
+                return float(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0.0
+
+    def _is_protected(self, run_dir, now):
+        with self._lock:
+            if self._key(run_dir) in self._active:
+                return True
+        return self._lease_expires(run_dir) > now
+
+    def _scan(self):
+        """[(마지막 사용 시각, 크기, 경로)] - 오래된 순"""
+        runs = []
+        try:
+            names = os.listdir(self.runs_dir)
+        except OSError:
+            return runs
+        for name in names:
+            path = os.path.join(self.runs_dir, name)
+            if not os.path.isdir(path):
+                continue
+            try:
+                last_used = os.path.getmtime(path)
+            except OSError:
+                continue
+            runs.append((last_used, _dir_size(path), path))
+        runs.sort()
+        return runs
+
+    def _set_usage(self, runs):
+        gradio_bytes = _dir_size(self.gradio_dir) if self.gradio_dir else 0
+        with self._lock:
+            self._usage = {
+                "runs": len(runs),
+                "bytes": sum(size for _, size, _ in runs),
+                "gradio_bytes": gradio_bytes,
+            }
+
+    def cleanup(self, force=False):
+        """기간 초과 → 총 크기 초과 순으로 오래된 실행 삭제. 반환: (삭제한 실행 수, 확보한 바이트)"""
+        now = time.time()
+        with self._lock:
+            if not force and now - self._last_cleanup < CLEANUP_INTERVAL:
+                return 0, 0
+            self._last_cleanup = now
+
+        runs = self._scan()
+        total = sum(size for _, size, _ in runs)
+        removed, freed = 0, 0
+        kept = []
+        for entry in runs:
+            last_used, size, path = entry
+            expired = self.max_age and now - last_used > self.max_age
+            if (not expired and total <= self.max_bytes) or self._is_protected(path, now):
+                kept.append(entry)
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            removed += 1
+            freed += size
+
+        self._set_usage(kept)
+        if removed:
+            print(f"🧹 Output store: removed {removed} old runs ({_format_bytes(freed)})")
+        return removed, freed
+
+    def usage(self, refresh=False):
+        """사용량 {"runs", "bytes", "gradio_bytes", "max_bytes"} (refresh=False면 마지막 정리 시점 값)"""
+        if refresh:
+            self._set_usage(self._scan())
+        with self._lock:
+            return dict(self._usage, max_bytes=self.max_bytes)
+
+    def usage_line(self):
+        """현재 사용량 한 줄 (디렉토리를 다시 훑으므로 이벤트 루프 밖에서 호출)"""
+        usage = self.usage(refresh=True)
+        return (f"🗄️ Output store: {_format_bytes(usage['bytes'])} / {_format_bytes(usage['max_bytes'])} "
+                f"({usage['runs']} runs) | Gradio cache {_format_bytes(usage['gradio_bytes'])} "
+                f"(expired by delete_cache)")
+
+
+_shared_store = None
+_shared_lock = threading.Lock()
+
+
+def gradio_delete_cache():
+    """gr.Blocks(delete_cache=...) 값 - (정리 주기, 보관 시간) 초 단위 (다운로드 유예 기간보다 짧지 않게)"""
+    max_age = int(max(GRADIO_CACHE_MAX_AGE, DOWNLOAD_GRACE))
+    return (min(3600, max_age), max_age)
+
+
+def get_output_store():
+    """프로세스 전역 OutputStore (최초 호출 시 생성)"""
+    global _shared_store
+    with _shared_lock:
+        if _shared_store is None:
+            _shared_store = OutputStore()
+        return _shared_store
@@ -0,0 +1,209 @@
+"""이미지 후처리 단계 - 디코드/크롭/RGB 변환/리사이즈/인코딩을 프로세스 풀에서 실행"""
+import asyncio
+import os
+import threading
+import time
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from PIL import Image
+
+from nano_banana.geometry import crop_box_for_aspect_ratio, plan_resample
+
+CPU_WORKERS = int(os.environ.get("NANO_BANANA_CPU_WORKERS", "0")) or os.cpu_count() or 1
+# 프로세스 풀로 넘길 수 있는 대기 작업 수 (디코드 전 이미지 데이터가 메모리에 쌓이지 않도록 제한)
+CPU_QUEUE = int(os.environ.get("NANO_BANANA_CPU_QUEUE", "0")) or CPU_WORKERS * 2
+# 갤러리 미리보기 (원본 대신 브라우저로 보내는 작은 JPEG)
+PREVIEW_WIDTH = int(os.environ.get("NANO_BANANA_PREVIEW_WIDTH", "480"))
+PREVIEW_QUALITY = int(os.environ.get("NANO_BANANA_PREVIEW_QUALITY", "80"))
+PREVIEW_DIR = "previews"
+
+
+def crop_to_aspect_ratio(image, target_ratio=(16, 9)):
+    """이미지를 왜곡 없이 목표 비율로 중앙 크롭"""
+    box = crop_box_for_aspect_ratio(image.size, target_ratio)
+    return image if box is None else image.crop(box)
+
+
+def flatten_alpha(image):
+    """RGBA를 RGB로 변환 (흰 배경)"""
+    rgb_image = Image.new('RGB', image.size, (255, 255, 255))
+    rgb_image.paste(image, mask=image.split()[3])
+    return rgb_image
+
+
+def preview_path_for(filepath):
+    """출력 파일 → 같은 실행 디렉토리의 previews/<이름>.jpg"""
+    directory, filename = os.path.split(filepath)
+    return os.path.join(directory, PREVIEW_DIR, os.path.splitext(filename)[0] + ".jpg")
+
+
+def preview_or_original(filepath):
+    """미리보기가 있으면 미리보기, 없으면 원본 (재개 시 이전 실행 결과 표시용)"""
+    preview_path = preview_path_for(filepath)
+    return preview_path if os.path.exists(preview_path) else filepath
+
+
+def save_preview(image, preview_path, width=PREVIEW_WIDTH):
+    """이미 디코드된 이미지에서 미리보기 JPEG 저장 (너비 width, 비율 유지)"""
+    if image.width > width:
+        height = max(1, round(image.height * width / image.width))
+        # reducing_gap: 먼저 정수배로 빠르게 줄인 뒤 보간 (미리보기 품질이면 충분)
+        image = image.resize((width, height), Image.BICUBIC, reducing_gap=2.0)
+    if image.mode == 'RGBA':
+        image = flatten_alpha(image)
+    elif image.mode != 'RGB':
+        image = image.convert('RGB')
+    os.makedirs(os.path.dirname(preview_path), exist_ok=True)
+    image.save(preview_path, format="JPEG", quality=PREVIEW_QUALITY)
+
+
+def make_preview(source, preview_path):
+    """저장된 이미지(경로 또는 bytes)에서 미리보기 생성 - 캐시/공유 결과용 (프로세스 풀 워커에서 실행)
+
+    반환값: 단계별 시간(초) - preview + postprocess_cpu
+    """
+    cpu_started = time.process_time()
+    started = time.perf_counter()
+    with Image.open(source if isinstance(source, str) else BytesIO(source)) as image:
+        # JPEG 원본이면 디코드 단계에서 바로 축소
+        image.draft('RGB', (PREVIEW_WIDTH, PREVIEW_WIDTH))
+        image.load()
+        save_preview(image, preview_path)
+    return {"preview": time.perf_counter() - started, "postprocess_cpu": time.process_time() - cpu_started}
+
+
+# 워커 프로세스마다 재사용하는 인코딩 버퍼 (장면마다 큰 버퍼를 새로 늘리지 않도록 truncate하지 않음)
+_encode_buffer = BytesIO()
+
+
+def process_image(image_data, options, filepath=None, preview_path=None):
+    """API 응답 이미지 → 후처리 → 인코딩 (프로세스 풀 워커에서 실행)
+
+    options: crop ("16:9" 등), flatten_alpha ("white"), size ((w, h), None이면 크롭한 크기 그대로), format, save_params
+    filepath가 있으면 인코딩 결과를 그대로 한 번만 디스크에 기록
+    preview_path가 있으면 같은 이미지에서 갤러리용 미리보기도 저장 (다시 디코드하지 않음)
+    반환값: (인코딩된 bytes,
+             단계별 시간(초) - decode, crop, flatten, resize, encode, write, preview + postprocess_cpu,
+             카운터 이름 목록 - geometry_<리샘플 경로> (+ geometry_cropped))
+    """
+    cpu_started = time.process_time()
+    timings = {}
+
+    # 응답 버퍼에서 바로 디코드 (BytesIO는 bytes를 복사하지 않고 공유)
+    started = time.perf_counter()
+    image = Image.open(BytesIO(image_data))
+    image.load()
+    timings["decode"] = time.perf_counter() - started
+
+    # 📐 받은 크기에 맞춰 크롭/리샘플 경로 결정 (크롭은 영역만 계산하고 리샘플 때 함께 처리)
+    started = time.perf_counter()
+    crop_box, target_size, resample = plan_resample(image.size, options.get("crop"), options.get("size"))
+    timings["crop"] = time.perf_counter() - started
+
+    # RGB 모드 변환 (PNG 호환성)
+    started = time.perf_counter()
+    image_format = options.get("format", "PNG")
+    if image.mode == 'RGBA':
+        # JPEG는 알파 채널을 지원하지 않음
+        if options.get("flatten_alpha") or image_format == "JPEG":
+            image = flatten_alpha(image)
+    elif image.mode != 'RGB':
+        image = image.convert('RGB')
+    timings["flatten"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    if resample == "reduce":
+        # 정수배 축소는 평균 풀링으로
+        source_width = image.width if crop_box is None else crop_box[2] - crop_box[0]
+        image = image.reduce(source_width // target_size[0], box=crop_box)
+    elif resample == "downscale":
+        # 먼저 정수배로 줄이고 LANCZOS (결과는 거의 같고 큰 축소에서 훨씬 빠름)
+        image = image.resize(target_size, Image.LANCZOS, box=crop_box, reducing_gap=3.0)
+    elif resample == "upscale":
+        image = image.resize(target_size, Image.LANCZOS, box=crop_box)
+    elif crop_box is not None:
+        image = image.crop(crop_box)
+    elapsed = time.perf_counter() - started
+    if resample == "none":
+        timings["crop"] += elapsed
+    else:
+        timings["resize"] = elapsed
+    counters = [f"geometry_{resample}"] + (["geometry_cropped"] if crop_box is not None else [])
+
+    if preview_path:
+        started = time.perf_counter()
+        save_preview(image, preview_path)
+        timings["preview"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    _encode_buffer.seek(0)
+    image.save(_encode_buffer, format=image_format, **options.get("save_params", {"optimize": True}))
+    encoded = _encode_buffer.getbuffer()[:_encode_buffer.tell()]
+    timings["encode"] = time.perf_counter() - started
+
+    try:
+        if filepath:
+            started = time.perf_counter()
+            with open(filepath, 'wb') as f:
+                f.write(encoded)
+            timings["write"] = time.perf_counter() - started
+        # 프로세스 경계를 넘기기 위한 복사는 한 번만
+        data = encoded.tobytes()
+    finally:
+        # 재사용 버퍼의 export를 풀어야 다음 장면에서 다시 쓸 수 있음
+        encoded.release()
+
+    timings["postprocess_cpu"] = time.process_time() - cpu_started
+    return data, timings, counters
+
+
+class PostProcessStage:
+    """CPU 작업용 프로세스 풀 + 이벤트 루프별 제한된 대기열"""
+
+    def __init__(self, max_workers=CPU_WORKERS, max_pending=CPU_QUEUE):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._slots = weakref.WeakKeyDictionary()  # {event loop: asyncio.Semaphore}
+
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+    def _get_slots(self):
+        loop = asyncio.get_running_loop()
+        slots = self._slots.get(loop)
+        if slots is None:
+            slots = asyncio.Semaphore(self.max_pending)
+            self._slots[loop] = slots
+        return slots
+
+    async def run(self, fn, *args):
+        """fn(*args)를 프로세스 풀에서 실행 (대기열이 가득 차면 자리가 날 때까지 대기)"""
+        async with self._get_slots():
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+
+    def shutdown(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+_shared_stage = None
+_shared_lock = threading.Lock()
+
+
+def get_postprocess_stage():
+    """프로세스 전역 PostProcessStage (최초 호출 시 생성)"""
+    global _shared_stage
+    with _shared_lock:
+        if _shared_stage is None:
+            _shared_stage = PostProcessStage()
+        return _shared_stage
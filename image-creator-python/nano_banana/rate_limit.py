@@ -0,0 +1,117 @@
+"""프로세스 전역 요청 제한기 - API 키별 분당 요청 수(토큰 버킷) + 429 발생 시 해당 키 전체 일시정지"""
+import asyncio
+import hashlib
+import math
+import os
+import threading
+import time
+from collections import deque
+
+DEFAULT_RPM = int(os.environ.get("NANO_BANANA_RPM", "60"))
+
+
+class RateLimiter:
+    """모든 장면 요청이 공유하는 토큰 버킷 (스레드/이벤트 루프 무관하게 안전)"""
+
+    def __init__(self, requests_per_minute=DEFAULT_RPM, burst=None):
+        self.requests_per_minute = max(1, int(requests_per_minute))
+        self.capacity = burst or max(1, self.requests_per_minute // 10)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._waiting = 0
+        self._recent = deque()  # 최근 60초 요청 시각
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        rate = self.requests_per_minute / 60.0
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * rate)
+        self._updated = now
+
+    def _try_take(self):
+        """토큰을 얻으면 0, 아니면 기다려야 할 시간(초) 반환"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self._paused_until:
+                return self._paused_until - now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                self._recent.append(now)
+                return 0
+            return (1 - self._tokens) * 60.0 / self.requests_per_minute
+
+    async def acquire(self):
+        """API 호출 전 토큰 획득 (없으면 asyncio.sleep으로 대기)"""
+        with self._lock:
+            self._waiting += 1
+        try:
+            while True:
+                wait = self._try_take()
+                if wait <= 0:
+                    return
+                await asyncio.sleep(wait)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+    def pause(self, seconds):
+        """RESOURCE_EXHAUSTED 발생 시 모든 요청을 서버가 알려준 시간만큼 정지"""
+        with self._lock:
+            now = time.monotonic()
+            self._paused_until = max(self._paused_until, now + seconds)
+            self._tokens = 0
+
+    def available(self):
+        """지금 바로 쓸 수 있는 토큰 수 - 대기 중인 요청 수 (일시정지 중이면 음수)"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self._paused_until:
+                return -self.capacity - self._waiting
+            return self._tokens - self._waiting
+
+    @property
+    def queue_depth(self):
+        return self._waiting
+
+    def current_rate(self):
+        """최근 60초 동안의 요청 수 (요청/분)"""
+        with self._lock:
+            cutoff = time.monotonic() - 60
+            while self._recent and self._recent[0] < cutoff:
+                self._recent.popleft()
+            return len(self._recent)
+
+    def status_line(self):
+        line = f"🚦 Rate: {self.current_rate()}/{self.requests_per_minute} req/min | Queue: {self.queue_depth} waiting"
+        remaining = self._paused_until - time.monotonic()
+        if remaining > 0:
+            line += f" | ⏸️ Paused {math.ceil(remaining)}s (rate limit)"
+        return line
+
+
+_shared_limiters = {}  # {API 키 지문: RateLimiter} - 할당량은 키마다 따로
+_shared_lock = threading.Lock()
+
+
+def key_fingerprint(api_key):
+    """API 키를 메모리/로그에 그대로 두지 않기 위한 지문"""
+    if not api_key:
+        return "default"
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+
+
+def get_rate_limiter(api_key=None):
+    """API 키별 프로세스 전역 RateLimiter (최초 호출 시 생성, 같은 키를 쓰는 모든 실행이 공유)"""
+    fingerprint = key_fingerprint(api_key)
+    with _shared_lock:
+        limiter = _shared_limiters.get(fingerprint)
+        if limiter is None:
+            limiter = _shared_limiters[fingerprint] = RateLimiter()
+        return limiter
+
+
+def all_rate_limiters():
+    with _shared_lock:
+        return dict(_shared_limiters)
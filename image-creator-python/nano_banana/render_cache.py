@@ -0,0 +1,179 @@
+"""렌더 캐시 - 동일한 요청(모델, 프롬프트, 이미지 설정, 후처리)의 결과 이미지를 디스크에 재사용
+
+캐시 디렉토리는 처음 저장할 때 한 번만 훑어서 (항목 크기 + 사용 순서) 메모리에 유지하고
+저장/적중/삭제 때 갱신 → 장면마다 디렉토리 전체를 훑지 않음. 합계가 상한을 넘었을 때만
+(다른 프로세스가 같은 디렉토리를 쓸 수 있으므로) 다시 훑어서 상한의 EVICT_LOW_WATER까지 삭제.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "NANO_BANANA_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "nano_banana", "renders")
+)
+DEFAULT_MAX_BYTES = int(os.environ.get("NANO_BANANA_CACHE_MAX_MB", "2048")) * 1024 * 1024
+
+# 상한을 넘으면 이 비율까지 비움 (상한 근처에서 저장할 때마다 다시 훑지 않도록)
+EVICT_LOW_WATER = 0.9
+
+# 여러 실행(스레드)이 같은 캐시 디렉토리를 공유하므로 색인/eviction은 프로세스 전역 락으로 보호
+_lock = threading.Lock()
+_indexes = {}  # {캐시 디렉토리: _CacheIndex}
+
+
+def make_cache_key(model, prompt, image_config, postprocess):
+    """캐시 키 생성 (요청 + 후처리 설정의 SHA-256)"""
+    payload = json.dumps(
+        {
+            "model": model,
+            "prompt": prompt,
+            "image_config": image_config or {},
+            "postprocess": postprocess or {},
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def cache_path(cache_dir, key):
+    """캐시 키의 렌더 파일 경로 (키 앞 2글자로 디렉토리 분산)"""
+    return os.path.join(cache_dir, key[:2], f"{key}.img")
+
+
+class _CacheIndex:
+    """캐시 디렉토리의 항목 {경로: 크기} (오래 쓰지 않은 순) + 합계 - _lock을 잡고 사용"""
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.entries = OrderedDict()
+        self.total = 0
+        self.loaded = False
+
+    def scan(self):
+        """디렉토리를 훑어서 다시 구성 (mtime 순)"""
+        found = []
+        for root, _dirs, files in os.walk(self.cache_dir):
+            for name in files:
+                # 렌더 항목만 (작성 중인 .tmp, 같은 디렉토리의 유사 프롬프트 색인 등은 제외)
+                if not name.endswith(".img"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                found.append((st.st_mtime, st.st_size, path))
+        found.sort()
+        self.entries = OrderedDict((path, size) for _mtime, size, path in found)
+        self.total = sum(self.entries.values())
+        self.loaded = True
+
+    def touch(self, path, size=None):
+        """최근 사용으로 이동 (size가 있으면 새로 저장/덮어쓴 항목)"""
+        if size is not None:
+            self.total += size - self.entries.get(path, 0)
+            self.entries[path] = size
+        if path in self.entries:
+            self.entries.move_to_end(path)
+
+    def discard(self, path):
+        self.total -= self.entries.pop(path, 0)
+
+
+def _index_for(cache_dir):
+    key = os.path.abspath(cache_dir)
+    index = _indexes.get(key)
+    if index is None:
+        index = _indexes[key] = _CacheIndex(key)
+    return index
+
+
+class RenderCache:
+    """크기 제한 LRU 디스크 캐시 (접근 시 mtime 갱신 → 오래된 항목부터 삭제)"""
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with _lock:
+            self._index = _index_for(self.cache_dir)
+
+    def _path(self, key):
+        return cache_path(self.cache_dir, key)
+
+    def get(self, key, dest_path, count=True):
+        """캐시 적중 시 dest_path로 복사하고 True 반환 (count=False면 적중/실패 수에 넣지 않음)"""
+        path = self._path(key)
+        try:
+            shutil.copyfile(path, dest_path)
+            os.utime(path)  # LRU 순서 갱신 (다른 프로세스가 다시 훑을 때도)
+        except OSError:
+            if count:
+                self.misses += 1
+            return False
+        with _lock:
+            self._index.touch(os.path.abspath(path))
+        if count:
+            self.hits += 1
+        return True
+
+    def contains(self, key):
+        return os.path.exists(self._path(key))
+
+    def put(self, key, src_path):
+        """생성된 파일을 캐시에 저장 (원자적 rename) 후 용량 초과분 정리"""
+        self._store(key, lambda tmp_path: shutil.copyfile(src_path, tmp_path))
+
+    def put_bytes(self, key, data):
+        """인코딩된 이미지 bytes를 그대로 캐시에 저장 (출력 파일을 다시 읽지 않음)"""
+        def write(tmp_path):
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+        self._store(key, write)
+
+    def _store(self, key, write):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        os.close(fd)
+        try:
+            write(tmp_path)
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        with _lock:
+            if not self._index.loaded:
+                # 처음 저장할 때 한 번만 디렉토리 전체를 훑음 (방금 저장한 항목 포함)
+                self._index.scan()
+            else:
+                self._index.touch(os.path.abspath(path), size)
+            if self._index.total > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """합계가 상한을 넘음 → 다시 훑어서 (다른 프로세스의 저장/삭제 반영) 오래된 항목부터 삭제 (_lock 안에서)"""
+        index = self._index
+        index.scan()
+        target = self.max_bytes * EVICT_LOW_WATER
+        while index.total > target and index.entries:
+            path = next(iter(index.entries))
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            index.discard(path)
+
+    def stats_line(self):
+        return f"💾 Cache: {self.hits} hits / {self.misses} misses"
@@ -0,0 +1,238 @@
+"""Gemini 응답 기록/재생 - 실제 API 응답으로 파이프라인을 오프라인에서 재현 가능하게 테스트
+
+기록 (genai.Client를 감싸서 사용):
+    client = RecordingClient(genai.Client(api_key=api_key), "captures/run1")
+    generator = NanoBananaGenerator(api_key, config, client=client)
+
+재생 (API 키 없이, 같은 요청 → 같은 응답):
+    client = ReplayClient("captures/run1", preserve_timing=True)
+    generator = NanoBananaGenerator(None, config, client=client)
+
+아카이브 구조: index.jsonl (요청 1건 = 1줄) + blobs/<sha256>.bin (같은 이미지는 한 번만 저장)
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+
+from nano_banana.fake_backend import make_response
+
+INDEX_NAME = "index.jsonl"
+BLOBS_DIR = "blobs"
+
+
+def _config_to_dict(config):
+    """GenerateContentConfig(pydantic) / dict / None → JSON 직렬화 가능한 dict"""
+    if config is None:
+        return None
+    if hasattr(config, "model_dump"):
+        return config.model_dump(mode="json", exclude_none=True)
+    return config
+
+
+def request_key(model, contents, config):
+    """요청 식별자 (모델 + 내용 + 설정의 sha256)"""
+    payload = json.dumps(
+        {"model": model, "contents": contents, "config": _config_to_dict(config)},
+        sort_keys=True, ensure_ascii=False, default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ReplayArchive:
+    """index.jsonl + 내용 주소 기반 blob 저장소"""
+
+    def __init__(self, archive_dir):
+        self.archive_dir = archive_dir
+        self.index_path = os.path.join(archive_dir, INDEX_NAME)
+        self.blobs_dir = os.path.join(archive_dir, BLOBS_DIR)
+        self._lock = threading.Lock()
+
+    def put_blob(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        path = os.path.join(self.blobs_dir, f"{digest}.bin")
+        if not os.path.exists(path):
+            os.makedirs(self.blobs_dir, exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return digest
+
+    def get_blob(self, digest):
+        with open(os.path.join(self.blobs_dir, f"{digest}.bin"), "rb") as f:
+            return f.read()
+
+    def append(self, entry):
+        with self._lock:
+            os.makedirs(self.archive_dir, exist_ok=True)
+            with open(self.index_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def entries(self):
+        if not os.path.exists(self.index_path):
+            return []
+        with open(self.index_path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+
+def _response_parts(response):
+    """응답 → [{"mime_type", "blob"} | {"text"}] (후보가 없으면 None)"""
+    if not response.candidates:
+        return None
+    parts = []
+    for part in response.candidates[0].content.parts:
+        inline_data = getattr(part, "inline_data", None)
+        if inline_data:
+            data = inline_data.data
+            if isinstance(data, str):
+                data = base64.b64decode(data)
+            parts.append({"mime_type": inline_data.mime_type, "data": bytes(data)})
+        elif getattr(part, "text", None):
+            parts.append({"text": part.text})
+    return parts
+
+
+class RecordingClient:
+    """genai.Client 래퍼 - 요청/응답/지연 시간을 아카이브에 기록하고 응답은 그대로 전달"""
+
+    def __init__(self, client, archive_dir):
+        self.client = client
+        self.archive = ReplayArchive(archive_dir)
+        self.recorded = 0
+        self.models = SimpleNamespace(generate_content=self._generate_content)
+        self.aio = SimpleNamespace(models=SimpleNamespace(generate_content=self._generate_content_async))
+
+    def _record(self, model, contents, config, latency, response=None, error=None):
+        entry = {
+            "key": request_key(model, contents, config),
+            "model": model,
+            "contents": contents,
+            "config": _config_to_dict(config),
+            "latency": round(latency, 4),
+            "ts": round(time.time(), 3),
+        }
+        if error is not None:
+            entry["error"] = str(error)
+        else:
+            parts = _response_parts(response)
+            if parts is not None:
+                parts = [
+                    {"mime_type": p["mime_type"], "blob": self.archive.put_blob(p["data"])} if "data" in p else p
+                    for p in parts
+                ]
+            entry["parts"] = parts
+        self.archive.append(entry)
+        self.recorded += 1
+
+    def _generate_content(self, model, contents, config=None):
+        started = time.perf_counter()
+        try:
+            response = self.client.models.generate_content(model=model, contents=contents, config=config)
+        except Exception as e:
+            self._record(model, contents, config, time.perf_counter() - started, error=e)
+            raise
+        self._record(model, contents, config, time.perf_counter() - started, response=response)
+        return response
+
+    async def _generate_content_async(self, model, contents, config=None):
+        started = time.perf_counter()
+        try:
+            response = await self.client.aio.models.generate_content(model=model, contents=contents, config=config)
+        except Exception as e:
+            await asyncio.to_thread(self._record, model, contents, config, time.perf_counter() - started, error=e)
+            raise
+        await asyncio.to_thread(self._record, model, contents, config, time.perf_counter() - started,
+                                response=response)
+        return response
+
+
+class ReplayClient:
+    """기록된 아카이브에서 응답을 재생하는 genai.Client 대체품
+
+    같은 요청이 여러 번 기록되었으면 (예: 429 후 재시도 성공) 기록된 순서대로 재생하고,
+    다 쓰면 마지막 기록을 반복. preserve_timing이면 기록된 지연 시간을 speed 배속으로 재현.
+    """
+
+    def __init__(self, archive_dir, preserve_timing=False, speed=1.0):
+        self.archive = ReplayArchive(archive_dir)
+        self.preserve_timing = preserve_timing
+        self.speed = speed
+        self.calls = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._blobs = {}
+        self._entries = defaultdict(list)
+        self._positions = defaultdict(int)
+        for entry in self.archive.entries():
+            self._entries[entry["key"]].append(entry)
+        if not self._entries:
+            raise ValueError(f"No recorded responses in {archive_dir}")
+        self.models = SimpleNamespace(generate_content=self._generate_content)
+        self.aio = SimpleNamespace(models=SimpleNamespace(generate_content=self._generate_content_async))
+
+    def _next_entry(self, model, contents, config):
+        key = request_key(model, contents, config)
+        with self._lock:
+            self.calls += 1
+            entries = self._entries.get(key)
+            if not entries:
+                self.misses += 1
+                raise LookupError(f"No recorded response for request {key[:12]}")
+            position = self._positions[key]
+            self._positions[key] = position + 1
+            return entries[min(position, len(entries) - 1)]
+
+    def _delay(self, entry):
+        if not self.preserve_timing or self.speed <= 0:
+            return 0.0
+        return entry["latency"] / self.speed
+
+    def _blob(self, digest):
+        with self._lock:
+            data = self._blobs.get(digest)
+        if data is None:
+            data = self.archive.get_blob(digest)
+            with self._lock:
+                self._blobs[digest] = data
+        return data
+
+    def _result(self, entry):
+        if "error" in entry:
+            raise RuntimeError(entry["error"])
+        if entry["parts"] is None:
+            return SimpleNamespace(candidates=[])
+        return make_response([
+            ("text/plain", part["text"]) if "text" in part else (part["mime_type"], self._blob(part["blob"]))
+            for part in entry["parts"]
+        ])
+
+    def _generate_content(self, model, contents, config=None):
+        entry = self._next_entry(model, contents, config)
+        time.sleep(self._delay(entry))
+        return self._result(entry)
+
+    async def _generate_content_async(self, model, contents, config=None):
+        entry = self._next_entry(model, contents, config)
+        await asyncio.sleep(self._delay(entry))
+        return self._result(entry)
+
+
+def make_client(api_key, record=None, replay=None, preserve_timing=False):
+    """record / replay 이면 genai.Client 대신 기록/재생 클라이언트 (아니면 None = 생성기 기본 클라이언트)
+
+    CLI run과 분산 워커가 같은 규칙으로 클라이언트를 만듦 (--record / --replay / --replay-timing).
+    """
+    if replay:
+        return ReplayClient(replay, preserve_timing=preserve_timing)
+    if record:
+        from google import genai
+        from nano_banana.key_pool import parse_api_keys
+        # 기록은 첫 번째 키 하나로만 (요청 순서를 단순하게 유지)
+        return RecordingClient(genai.Client(api_key=parse_api_keys(api_key)[0]), record)
+    return None
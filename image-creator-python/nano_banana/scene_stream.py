@@ -0,0 +1,240 @@
+"""장면 스트리밍 입력 - RUN.SCENES를 한 번에 리스트로 만들지 않고 하나씩 읽기 (장면 수와 무관한 메모리)
+
+- JSON: 기존 설정 형식 그대로, RUN.SCENES 배열만 원소 단위로 점진 파싱 (json.JSONDecoder.raw_decode)
+- JSON Lines: 첫 줄 = 장면을 뺀 설정 (STYLE, OUTPUT_RULES ...), 이후 한 줄 = 한 장면
+
+처음 한 번 끝까지 훑어서 (장면은 읽고 버림) 설정과 장면 수를 구하고,
+반복할 때마다 파일/문자열을 처음부터 다시 읽음.
+"""
+import io
+import json
+from itertools import islice
+
+CHUNK_SIZE = 1 << 16
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+_NUMBER_CHARS = set("0123456789+-.eE")
+
+
+class _Reader:
+    """파일에서 조금씩 읽으면서 JSON 값을 하나씩 디코딩 (이미 읽은 부분은 버퍼에서 제거)"""
+
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """다음 공백이 아닌 문자 (끝이면 "")"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise json.JSONDecodeError(f"Expecting '{char}'", self.buf, self.pos)
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                obj, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # 버퍼 끝에서 끝난 값은 잘렸을 수 있음 → 더 읽고 다시
+            # 숫자는 청크 경계에서 "0.|5", "1e|5"처럼 잘리면 앞부분만 디코딩되므로 뒤에 숫자 문자만 남아 있어도 다시
+            if not self.eof and (end == len(self.buf) or (
+                    isinstance(obj, (int, float)) and not isinstance(obj, bool)
+                    and _NUMBER_CHARS.issuperset(self.buf[end:]))) and self._fill():
+                continue
+            self.pos = end
+            return obj
+
+
+def _object_keys(reader):
+    """객체의 키를 하나씩 yield (호출자가 값을 읽음)"""
+    reader.expect("{")
+    if reader.peek() == "}":
+        reader.pos += 1
+        return
+    while True:
+        key = reader.value()
+        if not isinstance(key, str):
+            raise json.JSONDecodeError("Expecting property name", reader.buf, reader.pos)
+        reader.expect(":")
+        yield key
+        char = reader.peek()
+        reader.pos += 1
+        if char == "}":
+            return
+        if char != ",":
+            raise json.JSONDecodeError("Expecting ',' delimiter", reader.buf, reader.pos - 1)
+
+
+def _array_items(reader):
+    reader.expect("[")
+    if reader.peek() == "]":
+        reader.pos += 1
+        return
+    while True:
+        yield reader.value()
+        char = reader.peek()
+        reader.pos += 1
+        if char == "]":
+            return
+        if char != ",":
+            raise json.JSONDecodeError("Expecting ',' delimiter", reader.buf, reader.pos - 1)
+
+
+def _walk_json(f, on_scene, chunk_size=CHUNK_SIZE):
+    """설정 JSON 전체를 읽으면서 장면은 on_scene으로 넘기고 나머지 설정만 반환"""
+    reader = _Reader(f, chunk_size)
+    config = {}
+    for key in _object_keys(reader):
+        if key != "RUN":
+            config[key] = reader.value()
+            continue
+        run = config["RUN"] = {}
+        for run_key in _object_keys(reader):
+            if run_key == "SCENES":
+                run["SCENES"] = []
+                for scene in _array_items(reader):
+                    on_scene(scene)
+            else:
+                run[run_key] = reader.value()
+    if reader.peek():
+        raise json.JSONDecodeError("Extra data", reader.buf, reader.pos)
+    return config
+
+
+def _iter_json(f):
+    """RUN.SCENES 원소를 하나씩 yield"""
+    reader = _Reader(f)
+    for key in _object_keys(reader):
+        if key != "RUN":
+            reader.value()
+            continue
+        for run_key in _object_keys(reader):
+            if run_key == "SCENES":
+                yield from _array_items(reader)
+            else:
+                reader.value()
+
+
+def _json_lines(f):
+    for line in f:
+        if line.strip():
+            yield json.loads(line)
+
+
+def _walk_jsonl(f, on_scene):
+    lines = _json_lines(f)
+    config = next(lines, None)
+    if not isinstance(config, dict):
+        raise ValueError("JSON Lines input must start with a config object")
+    run = config.setdefault("RUN", {})
+    if not isinstance(run, dict):
+        raise ValueError("JSON Lines config: RUN must be an object")
+    if not isinstance(run.get("SCENES", []), list):
+        raise ValueError("JSON Lines config: RUN.SCENES must be an array")
+    # 헤더에 장면이 들어 있으면 그 장면부터
+    for scene in run.pop("SCENES", []):
+        on_scene(scene)
+    config["RUN"]["SCENES"] = []
+    for scene in lines:
+        on_scene(scene)
+    return config
+
+
+def _iter_jsonl(f):
+    lines = _json_lines(f)
+    header = next(lines)
+    yield from header.get("RUN", {}).get("SCENES", [])
+    yield from lines
+
+
+def _looks_like_jsonl(text):
+    """첫 줄이 완전한 JSON 객체이고 뒤에 줄이 더 있으면 JSON Lines"""
+    first, _, rest = text.lstrip().partition("\n")
+    if not rest.strip():
+        return False
+    try:
+        return isinstance(json.loads(first), dict)
+    except json.JSONDecodeError:
+        return False
+
+
+class SceneSource:
+    """장면을 뺀 설정(config) + 장면 수 + 장면 반복자"""
+
+    def __init__(self, opener, jsonl=False):
+        self._opener = opener
+        self.jsonl = jsonl
+        count = 0
+
+        def count_scene(_scene):
+            nonlocal count
+            count += 1
+
+        with opener() as f:
+            self.config = (_walk_jsonl if jsonl else _walk_json)(f, count_scene)
+        if "SCENES" not in self.config.get("RUN", {}):
+            raise ValueError("Config has no RUN.SCENES")
+        self.total = count
+
+    def __len__(self):
+        return self.total
+
+    def __iter__(self):
+        with self._opener() as f:
+            yield from (_iter_jsonl if self.jsonl else _iter_json)(f)
+
+    def scene(self, index):
+        """index번째 장면 (없으면 None)"""
+        if not 0 <= index < self.total:
+            return None
+        scenes = iter(self)
+        try:
+            return next(islice(scenes, index, None))
+        finally:
+            scenes.close()  # 파일 핸들 닫기 (제너레이터의 with 블록 종료)
+
+    def write_json(self, f):
+        """기존 설정 형식(JSON)으로 기록 - 장면은 하나씩"""
+        def members(mapping, skip):
+            return "".join(f"{json.dumps(key, ensure_ascii=False)}: {json.dumps(value, ensure_ascii=False)}, "
+                           for key, value in mapping.items() if key != skip)
+
+        f.write("{" + members(self.config, "RUN") + '"RUN": {' + members(self.config["RUN"], "SCENES") + '"SCENES": [')
+        for i, scene in enumerate(self):
+            f.write((",\n" if i else "\n") + json.dumps(scene, ensure_ascii=False))
+        f.write("\n]}}")
+
+
+def open_scene_source(path):
+    """설정 파일 (.jsonl이면 JSON Lines)"""
+    return SceneSource(lambda: open(path, encoding="utf-8"), jsonl=path.endswith(".jsonl"))
+
+
+def scene_source_from_text(text):
+    """Gradio 입력 문자열 (JSON 또는 JSON Lines)"""
+    return SceneSource(lambda: io.StringIO(text), jsonl=_looks_like_jsonl(text))
@@ -0,0 +1,194 @@
+"""서버 전역 공정 스케줄러 - 여러 사용자(Gradio 세션)가 하나의 동시 요청 예산을 나눠 쓰도록
+
+- 전체 동시 실행 장면 수 제한 (NANO_BANANA_GLOBAL_CONCURRENCY)
+- 세션별 라운드 로빈 (큰 배치 하나가 다른 사용자를 굶기지 않도록)
+- 단일 장면 요청은 우선 처리
+- 입장 제한: 세션별/전체 제출 장면 수 상한 (실행은 제출 창만큼만 예약, 넘으면 AdmissionError)
+"""
+import asyncio
+import os
+import threading
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+GLOBAL_CONCURRENCY = int(os.environ.get("NANO_BANANA_GLOBAL_CONCURRENCY", "20"))
+MAX_SESSION_SCENES = int(os.environ.get("NANO_BANANA_MAX_SESSION_SCENES", "1000"))
+MAX_QUEUED_SCENES = int(os.environ.get("NANO_BANANA_MAX_QUEUED_SCENES", "5000"))
+
+DEFAULT_SESSION = "default"
+
+
+class AdmissionError(Exception):
+    """대기열이 가득 차서 새 작업을 받을 수 없음"""
+
+
+class _Waiter:
+    __slots__ = ("session", "loop", "future", "granted")
+
+    def __init__(self, session):
+        self.session = session
+        self.loop = asyncio.get_running_loop()
+        self.future = self.loop.create_future()
+        self.granted = False
+
+    def grant(self):
+        self.granted = True
+        self.loop.call_soon_threadsafe(self._set)
+
+    def _set(self):
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+class FairScheduler:
+    """전역 슬롯 배분 (스레드/이벤트 루프 무관하게 안전)"""
+
+    def __init__(self, max_in_flight=GLOBAL_CONCURRENCY, max_session_scenes=MAX_SESSION_SCENES,
+                 max_queued_scenes=MAX_QUEUED_SCENES):
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.max_session_scenes = max_session_scenes
+        self.max_queued_scenes = max_queued_scenes
+        self.in_flight = 0
+        self._priority = deque()  # 단일 장면 요청
+        self._queues = OrderedDict()  # {세션: deque(_Waiter)} - 순서 = 라운드 로빈 순서
+        self._reserved = {}  # {세션: 입장 허가된 장면 수}
+        self._lock = threading.Lock()
+
+    # ---- 입장 제한 ----
+
+    def reserve(self, session, count):
+        """실행 시작 전에 동시에 제출될 장면 수(engine.scene_window)만큼 자리 예약 (한도를 넘으면 AdmissionError)"""
+        session = session or DEFAULT_SESSION
+        with self._lock:
+            session_total = self._reserved.get(session, 0) + count
+            total = sum(self._reserved.values()) + count
+            if session_total > self.max_session_scenes:
+                raise AdmissionError(
+                    f"Too many scenes queued for this session ({session_total} > {self.max_session_scenes}). "
+                    "Wait for your current run to finish."
+                )
+            if total > self.max_queued_scenes:
+                raise AdmissionError(f"Server is busy ({total} scenes queued). Please try again later.")
+            self._reserved[session] = session_total
+
+    def unreserve(self, session, count):
+        session = session or DEFAULT_SESSION
+        with self._lock:
+            remaining = self._reserved.get(session, 0) - count
+            if remaining > 0:
+                self._reserved[session] = remaining
+            else:
+                self._reserved.pop(session, None)
+
+    # ---- 슬롯 ----
+
+    def _dispatch_locked(self):
+        while self.in_flight < self.max_in_flight:
+            if self._priority:
+                waiter = self._priority.popleft()
+            elif self._queues:
+                # 맨 앞 세션에서 하나 꺼내고 그 세션을 맨 뒤로 (라운드 로빈)
+                session, queue = next(iter(self._queues.items()))
+                waiter = queue.popleft()
+                if queue:
+                    self._queues.move_to_end(session)
+                else:
+                    del self._queues[session]
+            else:
+                return
+            self.in_flight += 1
+            waiter.grant()
+
+    def _remove_locked(self, waiter):
+        if waiter in self._priority:
+            self._priority.remove(waiter)
+            return
+        queue = self._queues.get(waiter.session)
+        if queue is not None and waiter in queue:
+            queue.remove(waiter)
+            if not queue:
+                del self._queues[waiter.session]
+
+    async def acquire(self, session=None, priority=False):
+        waiter = _Waiter(session or DEFAULT_SESSION)
+        with self._lock:
+            if priority:
+                self._priority.append(waiter)
+            else:
+                self._queues.setdefault(waiter.session, deque()).append(waiter)
+            self._dispatch_locked()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter.granted:
+                    # 슬롯을 받은 직후 취소됨 → 돌려줌
+                    self.in_flight -= 1
+                    self._dispatch_locked()
+                else:
+                    self._remove_locked(waiter)
+            raise
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+            self._dispatch_locked()
+
+    @asynccontextmanager
+    async def slot(self, session=None, priority=False):
+        await self.acquire(session, priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    # ---- 상태 ----
+
+    def queue_position(self, session=None, priority=False):
+        """다음 장면이 슬롯을 받기까지 앞에 있는 요청 수 (대략값, 0 = 바로 실행)"""
+        session = session or DEFAULT_SESSION
+        with self._lock:
+            if self.in_flight < self.max_in_flight:
+                return 0
+            if priority:
+                return len(self._priority) + 1
+            ahead = len(self._priority)
+            for other in self._queues:
+                if other == session:
+                    break
+                ahead += 1
+            return ahead + 1
+
+    def waiting(self, session=None):
+        with self._lock:
+            if session is None:
+                return len(self._priority) + sum(len(q) for q in self._queues.values())
+            queue = self._queues.get(session)
+            return (len(queue) if queue else 0) + sum(1 for w in self._priority if w.session == session)
+
+    def status_line(self, session=None):
+        with self._lock:
+            sessions = len(self._reserved)
+        line = (f"🧮 Server: {self.in_flight}/{self.max_in_flight} in flight | "
+                f"{self.waiting()} scenes waiting | {sessions} active sessions")
+        if session is not None:
+            line += f" | Yours waiting: {self.waiting(session)}"
+        return line
+
+
+_shared_scheduler = None
+_shared_lock = threading.Lock()
+
+
+def get_scheduler():
+    """프로세스 전역 FairScheduler (최초 호출 시 생성)"""
+    global _shared_scheduler
+    with _shared_lock:
+        if _shared_scheduler is None:
+            _shared_scheduler = FairScheduler()
+        return _shared_scheduler
+
+
+def session_id_from_request(request):
+    """gr.Request → 세션 ID (CLI 등 요청 객체가 없으면 기본 세션)"""
+    return getattr(request, "session_hash", None) or DEFAULT_SESSION
@@ -0,0 +1,217 @@
+"""유사 프롬프트 캐시 - 공백/스타일 순서/네거티브 항목 하나 차이 정도인 프롬프트는 기존 렌더를 재사용
+
+1. 정규화: 소문자 + 구두점/줄바꿈으로 절(clause) 단위로 나눠서 절 안의 단어 bigram 집합
+   (절 순서는 무시, 절 안의 단어 순서는 유지 → "red car, blue house"와 "blue car, red house"는 다름)
+2. MinHash 서명 (NUM_PERM개) → LSH 밴드 (BANDS개)로 후보 검색, 서명 일치 비율 = 추정 Jaccard 유사도
+3. 점수 = min(프롬프트 전체 유사도, 장면 고유 부분 유사도)
+   프롬프트 대부분은 모든 장면이 공유하는 템플릿(스타일, 배경, 네거티브)이라 전체 유사도만 보면
+   설명 한 단어만 다른 장면("coffee" → "tea")도 0.97이 됨 → 장면 값에서 온 bigram만 따로 비교
+4. 점수가 임계값 이상이면 그 프롬프트의 렌더 캐시 항목을 재사용 (이미지 설정/후처리가 같은 것만)
+
+NANO_BANANA_SIMILAR_THRESHOLD (0 = 끄기, 예: 0.9)로 켬. 색인은 렌더 캐시 디렉토리의 similar_index.jsonl
+(렌더 캐시 LRU 정리 대상이 아님). 추가 기록만 하므로, 읽을 때와 삭제된 항목이 살아 있는 항목보다 많아질 때
+렌더 파일이 남아 있는 항목만 다시 써서 압축.
+"""
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+
+from nano_banana.render_cache import DEFAULT_CACHE_DIR, cache_path
+
+SIMILAR_THRESHOLD = float(os.environ.get("NANO_BANANA_SIMILAR_THRESHOLD", "0"))
+
+INDEX_NAME = "similar_index.jsonl"
+COMPACT_MIN_DEAD = 64  # 삭제된 줄이 이만큼 쌓이고 살아 있는 항목보다 많으면 압축
+NUM_PERM = 128
+BANDS = 32  # 밴드당 4행 → 유사도 0.8이면 후보가 될 확률 99.9%+, 0.5면 약 87%
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(0x6E616E6F)  # 고정 시드 - 실행/프로세스가 달라도 같은 서명
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+_CLAUSE_SPLIT = re.compile(r"[\n.,;:!?()\[\]]+")
+_WORD = re.compile(r"\w+")
+
+
+def normalize_prompt(prompt):
+    """프롬프트 → 절 단위 단어 bigram 집합 (한 단어짜리 절은 단어 그대로)"""
+    text = unicodedata.normalize("NFKC", prompt).lower()
+    shingles = set()
+    for clause in _CLAUSE_SPLIT.split(text):
+        words = _WORD.findall(clause)
+        if len(words) == 1:
+            shingles.add(words[0])
+        shingles.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+    return shingles
+
+
+def _token_hash(shingle):
+    return int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def _minhash(shingles):
+    hashes = [_token_hash(shingle) for shingle in shingles] or [0]
+    return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS)
+
+
+def _scene_text(value):
+    """장면 dict의 모든 문자열 값 (키/중첩 구조 무시)"""
+    if isinstance(value, dict):
+        return "\n".join(_scene_text(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return "\n".join(_scene_text(item) for item in value)
+    return str(value)
+
+
+def prompt_signature(prompt, scene=None):
+    """(프롬프트 전체 MinHash, 장면 고유 부분 MinHash) - 장면 고유 부분 = 장면 값에도 있는 프롬프트 bigram"""
+    shingles = normalize_prompt(prompt)
+    own = shingles & normalize_prompt(_scene_text(scene)) if scene else set()
+    return _minhash(shingles), _minhash(own)
+
+
+def _estimate(signature, other):
+    return sum(x == y for x, y in zip(signature, other)) / NUM_PERM
+
+
+def similarity(signature, other):
+    """두 prompt_signature의 유사도 (Jaccard 추정값 - 전체와 장면 고유 부분 중 낮은 쪽)"""
+    return min(_estimate(signature[0], other[0]), _estimate(signature[1], other[1]))
+
+
+def _bands(signature):
+    """LSH 밴드 해시 (프롬프트 전체 서명 기준)"""
+    rows = NUM_PERM // BANDS
+    return [hash(signature[0][i * rows:(i + 1) * rows]) for i in range(BANDS)]
+
+
+class SimilarIndex:
+    """렌더 캐시 키 ↔ 프롬프트 서명 색인 (LSH 버킷은 메모리, 항목은 JSONL에 추가 기록)"""
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.index_path = os.path.join(self.cache_dir, INDEX_NAME)
+        self._entries = {}  # {캐시 키: (context, signature, prompt_hash)}
+        self._buckets = defaultdict(set)  # {(context, 밴드 번호, 밴드 해시): {캐시 키}}
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._dead_lines = 0  # 파일에는 남아 있지만 메모리에서는 지워진 줄 수
+
+    def _load(self):
+        # 처음 사용할 때 한 번 읽음 (같은 키가 여러 번 기록됐으면 마지막 것, 렌더 파일이 없는 항목은 버림)
+        self._loaded = True
+        lines = 0
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                for line in f:
+                    lines += 1
+                    try:
+                        entry = json.loads(line)
+                        signature = (tuple(entry["signature"]), tuple(entry["scene_signature"]))
+                    except (json.JSONDecodeError, KeyError):
+                        # 프로세스가 죽으면서 잘린 줄은 무시
+                        continue
+                    self._insert(entry["key"], entry["context"], signature, entry.get("prompt_hash"))
+        except OSError:
+            return
+        for key in [key for key in self._entries if not os.path.exists(cache_path(self.cache_dir, key))]:
+            self._remove(key)
+        if lines > len(self._entries):
+            self._compact()
+
+    def _record(self, key, context, signature, prompt_hash):
+        return json.dumps({"key": key, "context": context, "signature": list(signature[0]),
+                           "scene_signature": list(signature[1]), "prompt_hash": prompt_hash}) + "\n"
+
+    def _compact(self):
+        """살아 있는 항목만 다시 기록 (임시 파일 → 원자적 교체)"""
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for key, (context, signature, prompt_hash) in self._entries.items():
+                    f.write(self._record(key, context, signature, prompt_hash))
+            os.replace(tmp_path, self.index_path)
+            self._dead_lines = 0
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _insert(self, key, context, signature, prompt_hash):
+        self._remove(key)
+        self._entries[key] = (context, signature, prompt_hash)
+        for band, value in enumerate(_bands(signature)):
+            self._buckets[(context, band, value)].add(key)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        context, signature, _ = entry
+        for band, value in enumerate(_bands(signature)):
+            bucket = self._buckets.get((context, band, value))
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[(context, band, value)]
+
+    def add(self, key, context, signature, prompt_hash=None):
+        """렌더 캐시에 저장된 항목 등록"""
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            if key in self._entries:
+                return
+            self._insert(key, context, signature, prompt_hash)
+            try:
+                os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+                with open(self.index_path, "a", encoding="utf-8") as f:
+                    f.write(self._record(key, context, signature, prompt_hash))
+            except OSError:
+                pass
+
+    def discard(self, key):
+        """캐시에서 사라진 항목 (LRU로 삭제됨) 제거 - 삭제된 줄이 쌓이면 파일도 압축"""
+        with self._lock:
+            if key not in self._entries:
+                return
+            self._remove(key)
+            self._dead_lines += 1
+            if self._dead_lines >= COMPACT_MIN_DEAD and self._dead_lines > len(self._entries):
+                self._compact()
+
+    def lookup(self, context, signature, threshold):
+        """가장 비슷한 항목 → (캐시 키, 유사도, prompt_hash) 또는 None"""
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            candidates = set()
+            for band, value in enumerate(_bands(signature)):
+                candidates.update(self._buckets.get((context, band, value), ()))
+            best = None
+            for key in candidates:
+                _, other, prompt_hash = self._entries[key]
+                score = similarity(signature, other)
+                if score >= threshold and (best is None or score > best[1]):
+                    best = (key, score, prompt_hash)
+            return best
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_shared_index = None
+_shared_lock = threading.Lock()
+
+
+def get_similar_index():
+    """프로세스 전역 SimilarIndex (최초 호출 시 생성)"""
+    global _shared_index
+    with _shared_lock:
+        if _shared_index is None:
+            _shared_index = SimilarIndex()
+        return _shared_index
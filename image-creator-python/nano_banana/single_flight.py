@@ -0,0 +1,73 @@
+"""동일 요청 합치기 (single-flight) - 같은 캐시 키의 요청이 진행 중이면 새로 보내지 않고 그 결과를 공유
+
+프로세스 전역이므로 한 실행 안의 반복 장면뿐 아니라 같은 템플릿을 동시에 실행한 여러 사용자 세션도 합쳐짐.
+성공한 결과만 공유: 먼저 보낸 요청이 실패하면 (다른 세션의 예산 초과, 요청 제한 재시도 소진 등)
+대기자마다 다시 claim해서 자기 예산/재시도 설정으로 직접 요청.
+concurrent.futures.Future를 쓰므로 이벤트 루프/스레드가 달라도 (예: generate_scene 동기 래퍼) 동작.
+"""
+import asyncio
+import threading
+from concurrent.futures import Future
+
+
+class LeaderCancelled(Exception):
+    """먼저 보낸 요청이 실패/취소됨 (대기자 중 하나가 대신 요청)"""
+
+
+class SharedRender:
+    """공유되는 성공 결과 (인코딩된 이미지)"""
+
+    __slots__ = ("image_bytes",)
+
+    def __init__(self, image_bytes):
+        self.image_bytes = image_bytes
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls = {}  # {캐시 키: Future}
+        self._lock = threading.Lock()
+
+    def claim(self, key):
+        """(future, leader 여부) - leader면 직접 요청 후 성공하면 resolve, 실패/취소면 abandon 호출"""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                return future, False
+            future = self._calls[key] = Future()
+            return future, True
+
+    def _pop(self, key, future):
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+    def resolve(self, key, future, shared):
+        self._pop(key, future)
+        future.set_result(shared)
+
+    def abandon(self, key, future):
+        self._pop(key, future)
+        future.set_exception(LeaderCancelled())
+
+    async def wait(self, future):
+        """leader 결과 대기 (이 대기자가 취소되어도 다른 대기자의 future는 취소하지 않음)"""
+        return await asyncio.shield(asyncio.wrap_future(future))
+
+    @property
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+
+_shared_flight = None
+_shared_lock = threading.Lock()
+
+
+def get_single_flight():
+    """프로세스 전역 SingleFlight (최초 호출 시 생성)"""
+    global _shared_flight
+    with _shared_lock:
+        if _shared_flight is None:
+            _shared_flight = SingleFlight()
+        return _shared_flight
@@ -0,0 +1,151 @@
+"""Gradio 진행 화면 갱신 - 초당 갱신 횟수 제한 + 크기가 제한된 로그 (대규모 실행에서도 O(1) 갱신)
+
+Gradio는 generator가 yield할 때마다 이전 값과의 차이(diff)만 브라우저로 보내므로,
+갤러리를 완료 순서대로 뒤에만 추가하는 리스트로 유지하면 새로 끝난 이미지만 전송됨.
+"""
+import asyncio
+import os
+import time
+from collections import deque
+
+UI_UPDATES_PER_SECOND = float(os.environ.get("NANO_BANANA_UI_UPDATES_PER_SEC", "4"))
+LOG_TAIL_LINES = int(os.environ.get("NANO_BANANA_LOG_TAIL", "50"))
+MAX_LISTED_FAILURES = 50
+
+
+class UpdateThrottle:
+    """최대 max_per_second 번만 갱신 허용 (force면 항상 허용 - 마지막 장면 등)
+
+    갱신을 건너뛰면 pending으로 남겨 두고, trailing()이 간격이 지나도록 다음 결과가 없으면
+    None을 끼워 넣어서 마지막 상태가 화면에 늦게라도 반영되게 함 (느린 장면 사이에 결과가 숨지 않음).
+    """
+
+    def __init__(self, max_per_second=UI_UPDATES_PER_SECOND):
+        self.interval = 1.0 / max_per_second if max_per_second > 0 else 0.0
+        self._last = 0.0
+        self.pending = False  # 건너뛴 갱신이 있음
+
+    def ready(self, force=False):
+        now = time.monotonic()
+        if force or now - self._last >= self.interval:
+            self._last = now
+            self.pending = False
+            return True
+        self.pending = True
+        return False
+
+    def flush_delay(self):
+        """건너뛴 갱신을 내보낼 때까지 남은 시간 (없으면 None)"""
+        if not self.pending:
+            return None
+        return max(0.0, self._last + self.interval - time.monotonic())
+
+    async def trailing(self, results):
+        """async 결과 스트림 그대로 + 건너뛴 갱신이 있고 간격이 지나면 None (결과를 기다리는 중에도)"""
+        next_result = None
+        try:
+            while True:
+                if next_result is None:
+                    next_result = asyncio.ensure_future(anext(results))
+                done, _ = await asyncio.wait({next_result}, timeout=self.flush_delay())
+                if not done:
+                    yield None
+                    continue
+                try:
+                    result = next_result.result()
+                except StopAsyncIteration:
+                    return
+                finally:
+                    next_result = None
+                yield result
+        finally:
+            if next_result is not None:
+                # 기다리던 결과 취소가 끝난 뒤에 닫기 (실행 중인 async generator는 닫을 수 없음)
+                next_result.cancel()
+                await asyncio.gather(next_result, return_exceptions=True)
+            await results.aclose()
+
+
+class RunLog:
+    """진행 로그 - 요약 카운터 + 최근 이벤트 tail 줄 + 실패 장면 목록 (장면 수와 무관한 크기)"""
+
+    def __init__(self, total_scenes, tail=LOG_TAIL_LINES, max_failures=MAX_LISTED_FAILURES):
+        self.total_scenes = total_scenes
+        self.succeeded = 0
+        self.cached = 0
+        self.deduplicated = 0
+        self.similar = 0
+        self.previous = 0
+        self.failures = {}  # {scene_index: 마지막 실패 줄} - 재개로 성공하면 제거
+        self.max_failures = max_failures
+        self._recent = deque(maxlen=tail)
+
+    @property
+    def completed(self):
+        return self.succeeded + len(self.failures)
+
+    def add_previous(self, count):
+        """이전 실행에서 이미 성공한 장면 (재개)"""
+        self.previous += count
+        self.succeeded += count
+        if count:
+            self._recent.append(f"♻️ {count} scenes restored from previous run")
+
+    def add_result(self, result, title):
+        scene_idx = result['scene_index']
+        if result['success']:
+            self.succeeded += 1
+            self.failures.pop(scene_idx, None)
+            cached_mark = ""
+            if result.get('similar_to'):
+                self.similar += 1
+                cached_mark = f" 🧩 (similar {result['similarity']:.2f} to {result['similar_to']})"
+            elif result.get('cached'):
+                self.cached += 1
+                cached_mark = " 💾 (cached)"
+            elif result.get('deduplicated'):
+                self.deduplicated += 1
+                cached_mark = " 🔁 (shared)"
+            line = f"✅ Scene {scene_idx + 1}: {title}{cached_mark}"
+        else:
+            line = f"❌ Scene {scene_idx + 1}: {result['error']}"
+            self.failures[scene_idx] = line
+        self._recent.append(line)
+
+    def add_line(self, line):
+        self._recent.append(line)
+
+    def summary_line(self):
+        line = f"✅ {self.succeeded} ok | ❌ {len(self.failures)} failed"
+        if self.cached:
+            line += f" | 💾 {self.cached} cached"
+        if self.deduplicated:
+            line += f" | 🔁 {self.deduplicated} shared"
+        if self.similar:
+            line += f" | 🧩 {self.similar} similar"
+        pending = self.total_scenes - self.completed
+        if pending > 0:
+            line += f" | ⏳ {pending} pending"
+        return line
+
+    def failure_lines(self):
+        lines = [self.failures[idx] for idx in sorted(self.failures)[:self.max_failures]]
+        hidden = len(self.failures) - len(lines)
+        if hidden > 0:
+            lines.append(f"... and {hidden} more failed scenes (see manifest.jsonl)")
+        return lines
+
+    def render(self, header, footer=""):
+        """header/footer 사이에 요약, 최근 이벤트, 실패 목록"""
+        parts = [header, self.summary_line(), ""]
+        if len(self._recent) < self.completed:
+            parts.append(f"🕒 Last {len(self._recent)} events:")
+        parts.extend(self._recent)
+        if self.failures and len(self._recent) < self.completed:
+            parts.append("")
+            parts.append("⚠️ Failed scenes:")
+            parts.extend(self.failure_lines())
+        text = "\n".join(parts)
+        if footer:
+            text += "\n\n" + footer
+        return text
@@ -0,0 +1,187 @@
+"""공유 작업 대기열 (SQLite) - 여러 호스트의 워커가 장면을 lease로 가져가서 생성
+
+공유 볼륨의 디렉토리 하나를 대기열로 사용:
+    <queue_dir>/queue.db               실행/장면 상태
+    <queue_dir>/runs/<run_id>/         워커가 생성한 이미지 (collect가 최종 출력으로 모음)
+
+lease가 만료된 장면(워커가 죽거나 연결이 끊김)은 다른 워커가 다시 가져감.
+네트워크 파일시스템은 SQLite 잠금이 느릴 수 있으므로 busy timeout을 길게 둠.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from nano_banana.journal import new_run_id
+
+DB_NAME = "queue.db"
+RUNS_SUBDIR = "runs"
+
+QUEUED = "queued"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    variant TEXT NOT NULL,
+    config TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    run_id TEXT NOT NULL,
+    scene_index INTEGER NOT NULL,
+    scene TEXT NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_until REAL,
+    output_path TEXT,
+    prompt_hash TEXT,
+    error TEXT,
+    updated REAL NOT NULL,
+    PRIMARY KEY (run_id, scene_index)
+);
+CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (state, lease_until);
+"""
+
+
+class WorkQueue:
+    def __init__(self, queue_dir):
+        self.queue_dir = queue_dir
+        self.db_path = os.path.join(queue_dir, DB_NAME)
+        self._local = threading.local()  # 스레드마다 연결 (asyncio.to_thread에서 호출)
+        os.makedirs(os.path.join(queue_dir, RUNS_SUBDIR), exist_ok=True)
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=60, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self, fn):
+        """BEGIN IMMEDIATE - 쓰기 잠금을 먼저 잡아서 두 워커가 같은 장면을 가져가지 않도록"""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return result
+
+    def run_dir(self, run_id):
+        return os.path.join(self.queue_dir, RUNS_SUBDIR, run_id)
+
+    # ---- 코디네이터 ----
+
+    def enqueue(self, source, variant):
+        """SceneSource의 모든 장면을 대기열에 추가 (장면은 행마다 따로 저장) → run_id"""
+        run_id = new_run_id()
+        now = time.time()
+        os.makedirs(self.run_dir(run_id), exist_ok=True)
+
+        def insert(conn):
+            conn.execute("INSERT INTO runs (run_id, variant, config, created) VALUES (?, ?, ?, ?)",
+                         (run_id, variant, json.dumps(source.config, ensure_ascii=False), now))
+            conn.executemany(
+                "INSERT INTO jobs (run_id, scene_index, scene, state, updated) VALUES (?, ?, ?, ?, ?)",
+                ((run_id, i, json.dumps(scene, ensure_ascii=False), QUEUED, now) for i, scene in enumerate(source))
+            )
+        self._transaction(insert)
+        return run_id
+
+    def get_run(self, run_id):
+        """실행 설정 (장면 제외 - 장면은 claim/jobs로)"""
+        row = self._connection().execute("SELECT * FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        if row is None:
+            raise ValueError(f"Unknown run: {run_id}")
+        return {"run_id": run_id, "variant": row["variant"], "config": json.loads(row["config"])}
+
+    def counts(self, run_id=None):
+        """{상태: 장면 수}"""
+        query = "SELECT state, COUNT(*) AS n FROM jobs"
+        params = ()
+        if run_id:
+            query += " WHERE run_id = ?"
+            params = (run_id,)
+        rows = self._connection().execute(query + " GROUP BY state", params).fetchall()
+        return {row["state"]: row["n"] for row in rows}
+
+    def jobs(self, run_id):
+        rows = self._connection().execute(
+            "SELECT * FROM jobs WHERE run_id = ? ORDER BY scene_index", (run_id,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    # ---- 워커 ----
+
+    def claim(self, worker_id, lease_seconds, run_id=None):
+        """대기 중이거나 lease가 만료된 장면 하나 가져오기 → (run_id, scene_index, scene) 또는 None"""
+        def take(conn):
+            now = time.time()
+            query = ("SELECT run_id, scene_index, scene FROM jobs "
+                     "WHERE (state = ? OR (state = ? AND lease_until < ?))")
+            params = [QUEUED, LEASED, now]
+            if run_id:
+                query += " AND run_id = ?"
+                params.append(run_id)
+            row = conn.execute(query + " ORDER BY run_id, scene_index LIMIT 1", params).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET state = ?, worker = ?, lease_until = ?, attempts = attempts + 1, updated = ? "
+                "WHERE run_id = ? AND scene_index = ?",
+                (LEASED, worker_id, now + lease_seconds, now, row["run_id"], row["scene_index"])
+            )
+            return row["run_id"], row["scene_index"], json.loads(row["scene"])
+        return self._transaction(take)
+
+    def renew(self, worker_id, jobs, lease_seconds):
+        """처리 중인 장면들의 lease 연장 (heartbeat)"""
+        if not jobs:
+            return
+        now = time.time()
+
+        def extend(conn):
+            conn.executemany(
+                "UPDATE jobs SET lease_until = ?, updated = ? "
+                "WHERE run_id = ? AND scene_index = ? AND worker = ? AND state = ?",
+                [(now + lease_seconds, now, run_id, scene_index, worker_id, LEASED) for run_id, scene_index in jobs]
+            )
+        self._transaction(extend)
+
+    def complete(self, worker_id, run_id, scene_index, output_path, prompt_hash=None):
+        """성공 기록 (lease를 잃었으면 - 다른 워커가 가져갔으면 - 무시하고 False)"""
+        def finish(conn):
+            cursor = conn.execute(
+                "UPDATE jobs SET state = ?, output_path = ?, prompt_hash = ?, error = NULL, lease_until = NULL, "
+                "updated = ? WHERE run_id = ? AND scene_index = ? AND worker = ? AND state = ?",
+                (DONE, output_path, prompt_hash, time.time(), run_id, scene_index, worker_id, LEASED)
+            )
+            return cursor.rowcount == 1
+        return self._transaction(finish)
+
+    def fail(self, worker_id, run_id, scene_index, error, max_attempts):
+        """실패 기록 - 시도 횟수가 남았으면 다시 대기열로 (True), 아니면 failed"""
+        def finish(conn):
+            row = conn.execute(
+                "SELECT attempts FROM jobs WHERE run_id = ? AND scene_index = ? AND worker = ? AND state = ?",
+                (run_id, scene_index, worker_id, LEASED)
+            ).fetchone()
+            if row is None:
+                return False
+            retry = row["attempts"] < max_attempts
+            conn.execute(
+                "UPDATE jobs SET state = ?, error = ?, worker = NULL, lease_until = NULL, updated = ? "
+                "WHERE run_id = ? AND scene_index = ?",
+                (QUEUED if retry else FAILED, error, time.time(), run_id, scene_index)
+            )
+            return retry
+        return self._transaction(finish)
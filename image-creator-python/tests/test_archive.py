@@ -0,0 +1,52 @@
+"""StreamingZip - 항목 수가 배로 늘 때만 checkpoint, checkpoint마다 열 수 있는 ZIP (python -m unittest discover tests)"""
+import os
+import tempfile
+import unittest
+import zipfile
+
+from nano_banana.archive import StreamingZip
+
+
+class StreamingZipTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.zip_path = os.path.join(self.dir.name, "scenes.zip")
+
+    def test_checkpoint_growth(self):
+        checkpoints = []
+        with StreamingZip(self.zip_path, checkpoint_interval=0.0, checkpoint_growth=2.0) as writer:
+            for i in range(1, 21):
+                writer.add_bytes(f"scene_{i:02d}.png", b"x" * 10)
+                if writer.checkpoint():
+                    checkpoints.append(i)
+        self.assertEqual(checkpoints, [1, 2, 4, 8, 16])
+
+    def test_checkpoint_interval(self):
+        writer = StreamingZip(self.zip_path, checkpoint_interval=3600.0, checkpoint_growth=1.0)
+        self.addCleanup(writer.close)
+        writer.add_bytes("a.png", b"a")
+        # 첫 checkpoint는 간격과 무관 (_last_checkpoint = 0), 이후는 간격이 지나야
+        self.assertTrue(writer.checkpoint())
+        writer.add_bytes("b.png", b"b")
+        self.assertFalse(writer.checkpoint())
+        self.assertTrue(writer.checkpoint(force=True))
+        self.assertFalse(writer.checkpoint(force=True))  # 새 항목 없음
+
+    def test_checkpointed_zip_is_readable(self):
+        writer = StreamingZip(self.zip_path, checkpoint_interval=0.0)
+        self.addCleanup(writer.close)
+        writer.add_bytes("a.png", b"a")
+        writer.add_bytes("b.png", b"b")
+        self.assertTrue(writer.checkpoint(force=True))
+        with zipfile.ZipFile(self.zip_path) as zf:
+            self.assertEqual(zf.namelist(), ["a.png", "b.png"])
+        writer.add_bytes("c.png", b"c")
+        self.assertEqual(writer.close(), self.zip_path)
+        with zipfile.ZipFile(self.zip_path) as zf:
+            self.assertEqual(zf.namelist(), ["a.png", "b.png", "c.png"])
+            self.assertEqual(zf.read("c.png"), b"c")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+"""실행 예산 - 제출 허용 수, 호출 상한, 제출 중단 (python -m unittest discover tests)"""
+import unittest
+
+from nano_banana.budget import RunBudget
+
+
+class RunBudgetTest(unittest.TestCase):
+    def test_unlimited(self):
+        budget = RunBudget(max_calls=0, max_cost=0, max_minutes=0)
+        self.assertFalse(budget.enabled)
+        self.assertIsNone(budget.admissible(100))
+        self.assertTrue(all(budget.take_call() for _ in range(50)))
+
+    def test_call_budget_admission(self):
+        budget = RunBudget(max_calls=5, max_cost=0, max_minutes=0)
+        # 진행 중인 장면은 호출 1번씩 예약된 것으로 계산
+        self.assertEqual(budget.admissible(0), 5)
+        self.assertEqual(budget.admissible(3), 2)
+        for _ in range(4):
+            self.assertTrue(budget.take_call())
+        self.assertEqual(budget.admissible(0), 1)
+        self.assertEqual(budget.admissible(1), 0)
+        self.assertIn("API call budget reached", budget.blocked)
+
+    def test_take_call_refuses_past_limit(self):
+        budget = RunBudget(max_calls=2, max_cost=0, max_minutes=0)
+        self.assertTrue(budget.take_call())
+        self.assertTrue(budget.take_call())
+        self.assertFalse(budget.take_call())
+        self.assertEqual(budget.calls, 2)
+        self.assertEqual(budget.refused_calls, 1)
+        budget.refund_call()
+        self.assertEqual(budget.calls, 1)
+        self.assertTrue(budget.take_call())
+
+    def test_cost_limit_is_a_call_limit(self):
+        budget = RunBudget(max_calls=0, max_cost=0.12, max_minutes=0, cost_per_call=0.04)
+        self.assertEqual(budget.call_limit, 3)
+        budget = RunBudget(max_calls=2, max_cost=1.0, max_minutes=0, cost_per_call=0.04)
+        self.assertEqual(budget.call_limit, 2)
+
+    def test_time_budget_blocks_admission(self):
+        budget = RunBudget(max_calls=0, max_cost=0, max_minutes=1)
+        self.assertIsNone(budget.admissible(0))
+        budget.started -= 61
+        self.assertEqual(budget.admissible(0), 0)
+        self.assertIn("time budget reached", budget.blocked)
+        self.assertFalse(budget.take_call())
+        self.assertEqual(budget.time_left(), 0.0)
+
+    def test_stop_keeps_reason(self):
+        budget = RunBudget(max_calls=1, max_cost=0, max_minutes=0)
+        budget.take_call()
+        budget.admissible(0)
+        budget.stop()
+        self.assertEqual(budget.stopped, budget.blocked)
+        self.assertIn("3 scenes not started", budget.stopped_line(3))
+        self.assertEqual(budget.summary()["stopped"], budget.stopped)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+"""헤드리스 실행 - 같은 출력 디렉토리에 다시 실행/재개할 때의 ZIP 내용 (python -m unittest discover tests)
+
+가짜 백엔드(nano_banana.fake_backend)로 실행하므로 API 키/네트워크가 필요 없음.
+"""
+import asyncio
+import contextlib
+import glob
+import io
+import json
+import os
+import tempfile
+import unittest
+import zipfile
+from unittest import mock
+
+from nano_banana import cli, render_cache
+from nano_banana.fake_backend import FakeGeminiClient
+from nano_banana.journal import RunJournal
+
+SCENES = 4
+
+
+def _scenes_json(path):
+    config = {
+        "OUTPUT_RULES": {"encoder": "png-fast"},
+        "RUN": {"SCENES": [{"SCENE_NUMBER": i + 1, "TITLE": f"scene {i + 1}", "DESCRIPTION": f"room #{i}"}
+                           for i in range(SCENES)]},
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(config, f)
+
+
+class RunBatchZipTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.scenes = os.path.join(tmp.name, "scenes.json")
+        self.output_dir = os.path.join(tmp.name, "out")
+        _scenes_json(self.scenes)
+        # 사용자 렌더 캐시(~/.cache)를 건드리지 않도록
+        cache_dir = mock.patch.object(render_cache, "DEFAULT_CACHE_DIR", os.path.join(tmp.name, "cache"))
+        cache_dir.start()
+        self.addCleanup(cache_dir.stop)
+        client = mock.patch.object(cli, "client_from_args",
+                                   lambda args: FakeGeminiClient(image_size=(64, 36), latency=0.0, jitter=0.0))
+        client.start()
+        self.addCleanup(client.stop)
+
+    def _run(self, *extra):
+        """run 실행 → (가장 최근 ZIP의 항목 이름, 이번에 생성한 장면 인덱스)"""
+        args = cli.build_parser().parse_args(
+            ["run", self.scenes, self.output_dir, "--zip", "--api-key", "test", "--workers", "4", *extra]
+        )
+        generated = []
+
+        def emit(event, **fields):
+            if event == "scene":
+                generated.append(fields["index"])
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            ok = asyncio.run(cli.run_batch(args, emit))
+        self.assertTrue(ok)
+        zip_path = max(glob.glob(os.path.join(self.output_dir, "*.zip")), key=os.path.getmtime)
+        with zipfile.ZipFile(zip_path) as zf:
+            return zf.namelist(), sorted(generated)
+
+    def test_rerun_without_resume_has_no_duplicates(self):
+        first, generated = self._run()
+        self.assertEqual(len(first), SCENES)
+        self.assertEqual(generated, list(range(SCENES)))
+        # 같은 출력 디렉토리에 --resume 없이 다시 → 모든 장면을 다시 생성하지만 ZIP에는 한 번씩만
+        second, generated = self._run()
+        self.assertEqual(generated, list(range(SCENES)))
+        self.assertEqual(sorted(second), sorted(first))
+        self.assertEqual(len(second), len(set(second)))
+
+    def test_resume_prefills_skipped_scenes_only(self):
+        first, _ = self._run()
+        # 한 장면을 실패로 기록 → 재개 시 그 장면만 다시 생성, 나머지는 기존 파일로 ZIP에
+        RunJournal(self.output_dir).record({'success': False, 'scene_index': 2, 'error': "test"})
+        resumed, generated = self._run("--resume")
+        self.assertEqual(generated, [2])
+        self.assertEqual(sorted(resumed), sorted(first))
+        self.assertEqual(len(resumed), len(set(resumed)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+"""scene_stream 점진 파서 회귀 테스트 - 청크 경계에서 잘린 값 (python -m unittest discover tests)"""
+import io
+import json
+import random
+import unittest
+
+from nano_banana.scene_stream import SceneSource, _walk_json, scene_source_from_text
+
+
+def _walk(text, chunk_size):
+    scenes = []
+    config = _walk_json(io.StringIO(text), scenes.append, chunk_size)
+    return config, scenes
+
+
+class SmallChunkTest(unittest.TestCase):
+    CONFIG = {
+        "STYLE": {"ratio": 1.5, "seed": 12345, "scale": 1e5, "neg": -0.25, "flag": True, "none": None},
+        "RUN": {"SCENES": [
+            {"SCENE_NUMBER": 1, "TITLE": "a", "WEIGHT": 0.5},
+            {"SCENE_NUMBER": 20, "TITLE": "유니코드 \"quoted\"", "WEIGHT": 1e-3},
+            [1.25, -3, 2E+10, False],
+        ], "MODE": "fast"},
+        "TAIL": 0.125,
+    }
+
+    def test_every_chunk_size(self):
+        for indent in (None, 2):
+            text = json.dumps(self.CONFIG, ensure_ascii=False, indent=indent)
+            for chunk_size in range(1, 12):
+                with self.subTest(indent=indent, chunk_size=chunk_size):
+                    config, scenes = _walk(text, chunk_size)
+                    self.assertEqual(scenes, self.CONFIG["RUN"]["SCENES"])
+                    self.assertEqual(config["STYLE"], self.CONFIG["STYLE"])
+                    self.assertEqual(config["TAIL"], self.CONFIG["TAIL"])
+
+    def test_random_numbers(self):
+        rng = random.Random(0)
+        values = [rng.choice([rng.uniform(-1e6, 1e6), rng.randint(-10**9, 10**9), rng.random() * 1e-7])
+                  for _ in range(200)]
+        text = json.dumps({"RUN": {"SCENES": values}})
+        for chunk_size in (1, 2, 3, 7):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(_walk(text, chunk_size)[1], values)
+
+    def test_jsonl_header_must_be_valid(self):
+        for header in ({"RUN": "oops"}, {"RUN": ["a"]}, {"RUN": {"SCENES": "abc"}}, ["not", "a", "dict"]):
+            text = json.dumps(header) + "\n" + json.dumps({"TITLE": "a"}) + "\n"
+            with self.subTest(header=header):
+                with self.assertRaises(ValueError):
+                    scene_source_from_text(text)
+
+    def test_scene_closes_file(self):
+        opened = []
+
+        def opener():
+            f = io.StringIO(json.dumps(self.CONFIG))
+            opened.append(f)
+            return f
+
+        source = SceneSource(opener)
+        self.assertEqual(source.scene(1), self.CONFIG["RUN"]["SCENES"][1])
+        self.assertTrue(all(f.closed for f in opened))
+
+
+if __name__ == "__main__":
+    unittest.main()
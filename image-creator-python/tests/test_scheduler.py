@@ -0,0 +1,88 @@
+"""서버 전역 스케줄러 - 입장 예약/해제, 슬롯 상한, 세션별 라운드 로빈 (python -m unittest discover tests)"""
+import asyncio
+import unittest
+
+from nano_banana.scheduler import AdmissionError, FairScheduler
+
+
+class ReserveTest(unittest.TestCase):
+    def test_session_limit(self):
+        scheduler = FairScheduler(max_in_flight=4, max_session_scenes=10, max_queued_scenes=100)
+        scheduler.reserve("a", 6)
+        scheduler.reserve("a", 4)
+        with self.assertRaises(AdmissionError):
+            scheduler.reserve("a", 1)
+        # 다른 세션은 따로
+        scheduler.reserve("b", 10)
+
+    def test_queued_limit(self):
+        scheduler = FairScheduler(max_in_flight=4, max_session_scenes=10, max_queued_scenes=15)
+        scheduler.reserve("a", 10)
+        with self.assertRaises(AdmissionError):
+            scheduler.reserve("b", 6)
+        scheduler.reserve("b", 5)
+
+    def test_rejected_reserve_takes_nothing(self):
+        scheduler = FairScheduler(max_in_flight=4, max_session_scenes=10, max_queued_scenes=100)
+        scheduler.reserve("a", 8)
+        with self.assertRaises(AdmissionError):
+            scheduler.reserve("a", 5)
+        scheduler.reserve("a", 2)
+
+    def test_unreserve_releases(self):
+        scheduler = FairScheduler(max_in_flight=4, max_session_scenes=10, max_queued_scenes=100)
+        scheduler.reserve("a", 10)
+        scheduler.unreserve("a", 10)
+        self.assertIn("0 active sessions", scheduler.status_line())
+        scheduler.reserve("a", 10)
+        # 예약보다 많이 해제해도 음수가 되지 않음
+        scheduler.unreserve("a", 20)
+        scheduler.reserve("a", 10)
+
+
+class SlotTest(unittest.TestCase):
+    def test_in_flight_cap_and_round_robin(self):
+        scheduler = FairScheduler(max_in_flight=2)
+        order = []
+        peak = 0
+
+        async def scene(session, index):
+            nonlocal peak
+            async with scheduler.slot(session):
+                peak = max(peak, scheduler.in_flight)
+                order.append(session)
+                await asyncio.sleep(0.01)
+
+        async def main():
+            # 세션 a가 먼저 장면 6개를 넣어도 b, c가 번갈아 슬롯을 받음
+            tasks = [asyncio.create_task(scene("a", i)) for i in range(6)]
+            await asyncio.sleep(0)
+            tasks += [asyncio.create_task(scene(s, i)) for i in range(2) for s in ("b", "c")]
+            await asyncio.gather(*tasks)
+
+        asyncio.run(main())
+        self.assertEqual(peak, 2)
+        self.assertEqual(scheduler.in_flight, 0)
+        self.assertEqual(len(order), 10)
+        self.assertLess(order.index("c"), 5)
+        self.assertLess(max(i for i, s in enumerate(order) if s in ("b", "c")), 8)
+
+    def test_cancelled_waiter_leaves_queue(self):
+        scheduler = FairScheduler(max_in_flight=1)
+
+        async def main():
+            await scheduler.acquire("a")
+            waiter = asyncio.create_task(scheduler.acquire("b"))
+            await asyncio.sleep(0)
+            self.assertEqual(scheduler.waiting(), 1)
+            waiter.cancel()
+            await asyncio.gather(waiter, return_exceptions=True)
+            self.assertEqual(scheduler.waiting(), 0)
+            scheduler.release()
+            self.assertEqual(scheduler.in_flight, 0)
+
+        asyncio.run(main())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+"""동일 요청 합치기 - 성공만 공유, leader 실패 시 대기자가 다시 claim (python -m unittest discover tests)"""
+import asyncio
+import types
+import unittest
+
+from nano_banana.generator import SceneGenerator
+from nano_banana.single_flight import LeaderCancelled, SharedRender, SingleFlight
+
+
+class _Metrics:
+    def inc(self, *args):
+        pass
+
+
+def _generator(render):
+    """_render_shared에 필요한 속성만 가진 생성기 (render: 가짜 _render_scene)"""
+    generator = types.SimpleNamespace(single_flight=SingleFlight(), metrics=_Metrics(),
+                                      _write_file=lambda filepath, data: None)
+    generator._render_scene = types.MethodType(render, generator)
+    return generator
+
+
+def _render_all(generator, count):
+    async def run():
+        return await asyncio.gather(*(
+            SceneGenerator._render_shared(generator, {}, i, f"scene_{i}.png", "same-key", 3, "prompt")
+            for i in range(count)
+        ))
+    return asyncio.run(run())
+
+
+class SingleFlightTest(unittest.TestCase):
+    def test_success_is_shared(self):
+        calls = []
+
+        async def render(self, scene, scene_index, filepath, cache_key, max_retries, prompt):
+            calls.append(scene_index)
+            await asyncio.sleep(0.01)
+            return {'success': True, 'scene_index': scene_index, 'filepath': filepath, 'image_bytes': b"img"}
+
+        results = _render_all(_generator(render), 3)
+        self.assertEqual(calls, [0])
+        self.assertTrue(all(r['success'] for r in results))
+        self.assertEqual([bool(r.get('deduplicated')) for r in results], [False, True, True])
+        self.assertEqual([r['image_bytes'] for r in results], [b"img"] * 3)
+
+    def test_leader_failure_is_not_shared(self):
+        # 첫 요청(다른 세션의 예산 초과 등)이 실패해도 대기자는 각자 다시 요청
+        calls = []
+
+        async def render(self, scene, scene_index, filepath, cache_key, max_retries, prompt):
+            calls.append(scene_index)
+            await asyncio.sleep(0.01)
+            if scene_index == 0:
+                return {'success': False, 'scene_index': scene_index, 'error': "Run budget exceeded"}
+            return {'success': True, 'scene_index': scene_index, 'filepath': filepath, 'image_bytes': b"img"}
+
+        results = _render_all(_generator(render), 3)
+        self.assertEqual(calls, [0, 1])
+        self.assertEqual([r['success'] for r in results], [False, True, True])
+        self.assertNotIn("Run budget exceeded", [r.get('error') for r in results[1:]])
+
+    def test_abandon_wakes_waiters(self):
+        flight = SingleFlight()
+        future, leader = flight.claim("key")
+        self.assertTrue(leader)
+        same, leader = flight.claim("key")
+        self.assertIs(same, future)
+        self.assertFalse(leader)
+        flight.abandon("key", future)
+        self.assertIsInstance(future.exception(), LeaderCancelled)
+        self.assertEqual(flight.in_flight, 0)
+        _, leader = flight.claim("key")
+        self.assertTrue(leader)
+
+    def test_resolve(self):
+        flight = SingleFlight()
+        future, _ = flight.claim("key")
+        flight.resolve("key", future, SharedRender(b"img"))
+        self.assertEqual(future.result().image_bytes, b"img")
+        self.assertEqual(flight.in_flight, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
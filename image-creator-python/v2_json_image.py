@@ -1,474 +1,265 @@
 # app_gradio.py (수정 버전 - 16:9 비율 정확히 유지 + 조건부 배경)
 import gradio as gr
-from google import genai
-from google.genai import types
-from PIL import Image
-from io import BytesIO
-import json
-import time
-import zipfile
+import asyncio
 import os
-import tempfile
-import shutil
-from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import threading
 
-class NanoBananaGenerator:
-    def __init__(self, api_key, config_dict):
-        self.client = genai.Client(api_key=api_key)
-        self.config = config_dict
-        self.output_rules = self.config.get("OUTPUT_RULES", {})
-        self.style = self.config.get("STYLE", {})
-        self.negative_prompts = self.config.get("NEGATIVE_PROMPTS", [])
-        self.character_bible = self.config.get("CHARACTER_BIBLE", {})
-        self.scenes = self.config["RUN"]["SCENES"]
-        
-    def _parse_aspect_ratio(self):
-        """16:9 고정"""
-        return "16:9"
-    
-    def _parse_target_size(self):
-        """1920x1080 고정 (유튜브 롱폼)"""
-        return (1920, 1080)
-    
-    def _build_style_description(self):
-        style_parts = []
-        if self.style.get("photorealism"):
-            style_parts.append("photorealistic")
-        if self.style.get("cinematic"):
-            style_parts.append("cinematic composition")
-        if "color_grade" in self.style:
-            style_parts.append(f"{self.style['color_grade']} color grading")
-        if "depth_of_field" in self.style:
-            style_parts.append(f"{self.style['depth_of_field']} depth of field")
-        if "skin_texture" in self.style:
-            style_parts.append(f"{self.style['skin_texture']} skin texture")
-        if "film_grain" in self.style:
-            style_parts.append(f"{self.style['film_grain']} film grain")
-        return ", ".join(style_parts)
-    
-    def _is_illustration_or_diagram(self, description):
-        """3D 일러스트, 다이어그램, 그래픽인지 판단"""
-        keywords = [
-            'illustration', 'diagram', '3d', 'icon', 'infographic', 
-            'graphic', 'chart', 'visualization', 'concept',
-            '일러스트', '다이어그램', '그래픽', '도표', '아이콘'
-        ]
-        description_lower = description.lower()
-        return any(keyword in description_lower for keyword in keywords)
-    
-    def _build_negative_prompt(self, is_illustration=False):
-        """네거티브 프롬프트 생성 (장면 타입에 따라 다르게)"""
-        avoid_items = []
-        avoid_items.extend(self.negative_prompts)
-        disallow = self.output_rules.get("disallow", [])
-        avoid_items.extend(disallow)
-        
-        if is_illustration:
-            # 일러스트/다이어그램: 배경 요소 제거
-            avoid_items.extend([
-                "busy background",
-                "complex background",
-                "architectural background",
-                "landscape background",
-                "Korean buildings",
-                "traditional architecture",
-                "street scene"
-            ])
-        else:
-            # 실사 장면: 비한국적 요소 및 전통 요소 제거
-            avoid_items.extend([
-                "non-Korean people",
-                "Western faces",
-                "Caucasian",
-                "African",
-                "European setting",
-                "American setting",
-                "foreign country",
-                "traditional hanbok",
-                "traditional Korean clothing",
-                "hanok",
-                "traditional Korean architecture",
-                "traditional Korean building",
-                "historic Korea",
-                "ancient Korea",
-                "Joseon era"
-            ])
-        
-        if avoid_items:
-            return f"Avoid: {', '.join(avoid_items)}. "
-        return ""
-    
-    def _build_camera_description(self, camera):
-        camera_parts = []
-        if "shot" in camera:
-            camera_parts.append(camera["shot"])
-        if "angle" in camera:
-            camera_parts.append(camera["angle"])
-        if "movement" in camera:
-            camera_parts.append(camera["movement"])
-        return ", ".join(camera_parts)
-    
-    def _create_prompt(self, scene):
-        """프롬프트 생성 - 조건부 배경 적용"""
-        prompt_parts = []
-        
-        # 기본 설명
-        description = scene.get("DESCRIPTION", "")
-        prompt_parts.append(description)
-        
-        # 캐릭터 추가
-        characters = scene.get("CHARACTERS", [])
-        if characters:
-            for char in characters:
-                char_info = self.character_bible.get(char, {})
-                if char_info:
-                    char_desc = f"{char}: {char_info.get('description', '')}"
-                    prompt_parts.append(char_desc)
-        
-        # 🔧 장면 타입 판단
-        is_illustration = self._is_illustration_or_diagram(description)
-        
-        if is_illustration:
-            # 일러스트/다이어그램: 깔끔한 배경
-            prompt_parts.append("\nBackground: Clean, minimal background with soft gradient or solid color")
-            prompt_parts.append("Style: Professional 3D illustration or educational diagram with clear focus on subject")
-        else:
-            # 실사 장면: 현대 한국 배경
-            prompt_parts.append("\nLocation: Present-day Korea (2020s), modern Korean setting")
-            prompt_parts.append("Environment: Contemporary Korean architecture with modern buildings, city streets with Korean signage, modern Korean interior design")
-            prompt_parts.append("People: Korean ethnicity with natural Korean features, wearing modern casual clothing (contemporary fashion, casual wear, everyday clothes)")
-            prompt_parts.append("Time period: Modern era (2020s), contemporary lifestyle")
-        
-        # 스타일
-        style_desc = self._build_style_description()
-        if style_desc:
-            prompt_parts.append(f"\nStyle: {style_desc}")
-        
-        # 카메라
-        camera = scene.get("CAMERA", {})
-        camera_desc = self._build_camera_description(camera)
-        if camera_desc:
-            prompt_parts.append(f"\nCamera: {camera_desc}")
-        
-        # 네거티브 프롬프트
-        negative = self._build_negative_prompt(is_illustration)
-        if negative:
-            prompt_parts.append(f"\n{negative}")
-        
-        # 마무리
-        prompt_parts.append("\nCreate a single cohesive scene with realistic details.")
-        
-        if not is_illustration:
-            prompt_parts.append("Ensure Korean ethnicity for all people in modern casual clothing and contemporary Korean setting (2020s).")
-        
-        return "\n".join(prompt_parts)
-    
-    def _crop_to_aspect_ratio(self, image, target_ratio=(16, 9)):
-        """이미지를 왜곡 없이 16:9 비율로 중앙 크롭"""
-        img_width, img_height = image.size
-        img_ratio = img_width / img_height
-        target_ratio_value = target_ratio[0] / target_ratio[1]
-        
-        if abs(img_ratio - target_ratio_value) < 0.01:
-            # 이미 비율이 맞으면 그대로 반환
-            return image
-        
-        if img_ratio > target_ratio_value:
-            # 이미지가 더 가로로 넓음 -> 좌우 크롭
-            new_width = int(img_height * target_ratio_value)
-            left = (img_width - new_width) // 2
-            return image.crop((left, 0, left + new_width, img_height))
-        else:
-            # 이미지가 더 세로로 길음 -> 상하 크롭
-            new_height = int(img_width / target_ratio_value)
-            top = (img_height - new_height) // 2
-            return image.crop((0, top, img_width, top + new_height))
-    
-    def generate_scene(self, scene, scene_index, temp_dir, max_retries=3):
-        """단일 장면 생성 (재시도 로직 포함) - PNG 파일로 저장 with Gemini Image"""
-        import base64
-        import re
-        
-        target_size = self._parse_target_size()
-        
-        prompt = self._create_prompt(scene)
-        
-        # 16:9 비율 강조 및 현대적 설정 강조
-        prompt = f"16:9 aspect ratio, widescreen format, modern contemporary setting. {prompt}"
-        
-        for attempt in range(max_retries):
-            try:
-                # ✅ Gemini 2.5 Flash Image API 호출
-                response = self.client.models.generate_content(
-                    model='gemini-2.5-flash-image',
-                    contents=prompt
-                )
-                
-                # ✅ Gemini 응답 처리
-                if not response.candidates:
-                    return {
-                        'success': False,
-                        'scene_index': scene_index,
-                        'error': "No response from API",
-                        'scene': scene
-                    }
-                
-                for part in response.candidates[0].content.parts:
-                    if hasattr(part, 'inline_data') and part.inline_data:
-                        # inline_data.data 타입 확인 및 처리
-                        image_data_raw = part.inline_data.data
-                        
-                        # 타입에 따라 처리
-                        if isinstance(image_data_raw, str):
-                            image_data = base64.b64decode(image_data_raw)
-                        elif isinstance(image_data_raw, bytes):
-                            image_data = image_data_raw
-                        else:
-                            image_data = bytes(image_data_raw)
-                        
-                        # BytesIO로 이미지 로드
-                        image = Image.open(BytesIO(image_data))
-                        
-                        # 🔧 16:9 비율로 중앙 크롭 (왜곡 없음)
-                        image = self._crop_to_aspect_ratio(image, target_ratio=(16, 9))
-                        
-                        # RGB 모드 변환 (PNG 호환성)
-                        if image.mode == 'RGBA':
-                            # RGBA를 RGB로 변환 (흰 배경)
-                            rgb_image = Image.new('RGB', image.size, (255, 255, 255))
-                            rgb_image.paste(image, mask=image.split()[3])
-                            image = rgb_image
-                        elif image.mode != 'RGB':
-                            image = image.convert('RGB')
-                        
-                        # 🔧 1920x1080으로 리사이즈 (이미 16:9이므로 왜곡 없음)
-                        if image.size != target_size:
-                            image = image.resize(target_size, Image.LANCZOS)
-                        
-                        # PNG 파일로 저장
-                        scene_num_raw = scene.get("SCENE_NUMBER", scene_index + 1)
-                        scene_num = int(scene_num_raw) if isinstance(scene_num_raw, (str, int)) else scene_index + 1
-                        title = scene.get("TITLE", f"Scene_{scene_index+1}")
-                        safe_title = title.replace(' ', '_').replace('/', '_')
-                        filename = f"scene_{scene_num:02d}_{safe_title}.png"
-                        filepath = os.path.join(temp_dir, filename)
-                        
-                        # PNG로 저장 (압축 최적화)
-                        image.save(filepath, format='PNG', optimize=True)
-                        
-                        return {
-                            'success': True,
-                            'scene_index': scene_index,
-                            'filepath': filepath,
-                            'prompt': prompt,
-                            'scene': scene
-                        }
-                
-                return {
-                    'success': False,
-                    'scene_index': scene_index,
-                    'error': "No image data in response",
-                    'scene': scene
-                }
-                    
-            except Exception as e:
-                error_str = str(e)
-                
-                # Rate limit 처리
-                if "429" in error_str or "RESOURCE_EXHAUSTED" in error_str or "quota" in error_str.lower():
-                    wait_match = re.search(r'retry in (\d+(?:\.\d+)?)', error_str)
-                    if wait_match:
-                        wait_time = float(wait_match.group(1))
-                    else:
-                        wait_time = 60
-                    
-                    if attempt < max_retries - 1:
-                        print(f"⏳ Scene {scene_index + 1} rate limit hit. Waiting {wait_time:.0f} seconds...")
-                        time.sleep(wait_time + 1)
-                        continue
-                    else:
-                        return {
-                            'success': False,
-                            'scene_index': scene_index,
-                            'error': f"Rate limit exceeded. Wait {wait_time:.0f}s",
-                            'scene': scene
-                        }
-                
-                # 기타 에러
-                if attempt < max_retries - 1:
-                    wait_time = (attempt + 1) * 2
-                    print(f"⚠️ Scene {scene_index + 1} failed (attempt {attempt + 1}/{max_retries}): {error_str}")
-                    time.sleep(wait_time)
-                    continue
-                else:
-                    return {
-                        'success': False,
-                        'scene_index': scene_index,
-                        'error': error_str,
-                        'scene': scene
-                    }
-        
-        return {
-            'success': False,
-            'scene_index': scene_index,
-            'error': "Max retries exceeded",
-            'scene': scene
-        }
+from nano_banana.archive import StreamingZip, new_zip_path, parse_compression
+from nano_banana.budget import COST_PER_CALL, MAX_CALLS, MAX_COST, MAX_MINUTES, RunBudget
+from nano_banana.engine import generate_scenes, scene_window
+from nano_banana.geometry import geometry_line
+from nano_banana.journal import RunJournal
+from nano_banana.metrics import start_metrics_server
+from nano_banana.output_store import get_output_store, gradio_delete_cache
+from nano_banana.postprocess import preview_or_original
+from nano_banana.scene_stream import scene_source_from_text
+from nano_banana.scheduler import AdmissionError, get_scheduler, session_id_from_request
+from nano_banana.ui_updates import RunLog, UpdateThrottle
+from nano_banana.generator_v2 import NanoBananaGenerator
 
 
-def create_zip_file(filepaths_dict, scenes):
-    """PNG 파일들을 ZIP으로 압축"""
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    zip_filename = f"nano_banana_scenes_{timestamp}.zip"
-    zip_path = os.path.join(tempfile.gettempdir(), zip_filename)
-    
-    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+def create_zip_file(filepaths_dict, scenes, directory=None):
+    """이미지 파일들을 ZIP으로 묶기 (이미 압축된 이미지이므로 무압축 저장)"""
+    with StreamingZip(new_zip_path(directory)) as zip_writer:
         # scene_index 순서대로 정렬
-        sorted_indices = sorted(filepaths_dict.keys())
-        
-        for idx in sorted_indices:
-            filepath = filepaths_dict[idx]
-            # 파일명만 추출
-            filename = os.path.basename(filepath)
-            # ZIP에 추가
-            zipf.write(filepath, filename)
+        for idx in sorted(filepaths_dict.keys()):
+            zip_writer.add_file(filepaths_dict[idx])
     
-    return zip_path
+    return zip_writer.zip_path
+
 
+def open_full_resolution(full_paths, evt: gr.SelectData):
+    """갤러리에서 선택한 장면의 원본 파일 (갤러리는 미리보기만 표시)"""
+    index = evt.index if isinstance(evt.index, int) else None
+    if index is None or not full_paths or index >= len(full_paths):
+        return None
+    filepath = full_paths[index]
+    return filepath if os.path.exists(filepath) else None
 
-def generate_all_images(api_key, json_text, retry_on_limit, max_workers, progress=gr.Progress()):
-    """모든 장면을 병렬로 생성 (실시간 업데이트)"""
+
+async def generate_all_images(api_key, json_text, retry_on_limit, max_workers, bypass_cache=False, max_calls=0, max_cost=0, max_minutes=0, resume_run_id="", progress=gr.Progress(), request: gr.Request = None):
+    """모든 장면을 asyncio로 동시 생성 (실시간 업데이트) - resume_run_id가 있으면 실패/누락 장면만, 예산(호출/비용/시간)을 넘기기 전에 제출 중단"""
     
     if not api_key:
-        yield [], "❌ Please enter your API key", None
+        yield [], "❌ Please enter your API key", None, []
         return
     
-    try:
-        config_dict = json.loads(json_text)
-    except json.JSONDecodeError as e:
-        yield [], f"❌ Invalid JSON: {e}", None
-        return
+    # 🧹 오래된 실행 정리 (총 크기/보관 기간 제한, 사용 중인 실행은 제외)
+    store = get_output_store()
+    await asyncio.to_thread(store.cleanup)
     
-    # 임시 디렉토리 생성
-    temp_dir = tempfile.mkdtemp(prefix="nano_banana_")
+    if resume_run_id and resume_run_id.strip():
+        # ♻️ 재개: 저장된 설정 + manifest 사용 (JSON 입력은 무시)
+        try:
+            journal = RunJournal.load_run(resume_run_id)
+            source = journal.load_scene_source()
+        except (ValueError, OSError) as e:
+            yield [], f"❌ Cannot resume run: {e}", None, []
+            return
+    else:
+        # 📜 장면은 하나씩 읽음 (JSON 또는 JSON Lines - 전체 목록을 한 번에 만들지 않음)
+        try:
+            source = scene_source_from_text(json_text)
+        except ValueError as e:
+            yield [], f"❌ Invalid JSON: {e}", None, []
+            return
+        journal = RunJournal.new_run(source)
+    
+    # 실행 디렉토리 (재개할 수 있도록 유지)
+    temp_dir = journal.run_dir
+    zip_writer = None
+    # 생성/다운로드 중에는 정리 대상에서 제외
+    store.acquire(temp_dir)
+    # 🧮 서버 전역 스케줄러 (세션별 공정 분배 + 입장 제한)
+    scheduler = get_scheduler()
+    session_id = session_id_from_request(request)
+    reserved = 0
     
     try:
-        generator = NanoBananaGenerator(api_key, config_dict)
-        scenes = config_dict['RUN']['SCENES']
-        total_scenes = len(scenes)
-        
-        # 결과 저장용
-        filepaths_dict = {}  # {scene_index: filepath}
-        gallery_data = [None] * total_scenes  # 순서 유지용
-        logs = [f"⏳ Waiting..." for _ in range(total_scenes)]
+        generator = NanoBananaGenerator(api_key, source.config, use_cache=not bypass_cache)
+        # 🖼️ 갤러리에는 작은 미리보기만, 원본은 선택/다운로드할 때
+        generator.previews = True
+        total_scenes = len(source)
+        
+        # 📦 완료되는 대로 ZIP에 추가 (OUTPUT_RULES.zip_compression, 기본: stored)
+        zip_writer = StreamingZip(
+            new_zip_path(temp_dir),
+            compression=parse_compression(generator.output_rules.get("zip_compression"))
+        )
+        
+        # 갤러리는 완료 순서대로 뒤에만 추가 (Gradio가 새 항목만 전송) - 재개 시 이전 실행에서 성공한 장면 포함
+        previous_paths = journal.completed_paths()  # {scene_index: filepath}
+        full_paths = [previous_paths[idx] for idx in sorted(previous_paths)]  # 갤러리와 같은 순서의 원본 (서버 상태)
+        gallery_items = [preview_or_original(filepath) for filepath in full_paths]
+        run_log = RunLog(total_scenes)
+        run_log.add_previous(len(previous_paths))
+        for filepath in full_paths:
+            await asyncio.to_thread(zip_writer.add_file, filepath)
+        pending_indices = journal.pending_indices(total_scenes)
+        # 입장 제한은 동시에 제출되는 장면(창)만큼만 예약 (실행 전체 길이와 무관 - 대량 장면도 받음)
+        window = min(len(pending_indices), scene_window(max_workers))
+        try:
+            scheduler.reserve(session_id, window)
+        except AdmissionError as e:
+            yield [], f"❌ {e}\n\n{scheduler.status_line()}", None, []
+            return
+        reserved = window
         
         max_retries = 3 if retry_on_limit else 1
-        completed = 0
-        lock = threading.Lock()
+        completed = total_scenes - len(pending_indices)
+        # 💰 실행 예산 (0 = 제한 없음) - 시작 전에 예상 비용부터 표시
+        budget = RunBudget(max_calls, max_cost, max_minutes)
+        footer = f"🇰🇷 Modern Korean people (2020s) | Contemporary clothing & settings | Clean background for illustrations | 16:9 Format | {generator.encoder['label']}"
         
         # 초기 상태 yield
-        initial_log = f"🚀 Starting parallel generation of {total_scenes} scenes with {max_workers} workers...\n\n"
-        initial_log += "\n".join([f"Scene {i+1}: ⏳ Queued" for i in range(total_scenes)])
-        yield [], initial_log, None
-        
-        # 병렬 처리
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # 모든 작업 제출
-            future_to_index = {
-                executor.submit(generator.generate_scene, scene, i, temp_dir, max_retries): i 
-                for i, scene in enumerate(scenes)
-            }
-            
-            # 완료되는 대로 처리
-            for future in as_completed(future_to_index):
-                result = future.result()
-                scene_idx = result['scene_index']
+        initial_log = f"🗂️ Run ID: {journal.run_id}\n"
+        initial_log += f"🚀 Starting parallel generation of {len(pending_indices)} scenes (adaptive concurrency, up to {max_workers} requests)..."
+        initial_log += f"\n{budget.projection_line(len(pending_indices))}"
+        queue_position = scheduler.queue_position(session_id)
+        if queue_position:
+            initial_log += f"\n⏳ Server busy - queue position {queue_position}\n{scheduler.status_line(session_id)}"
+        yield list(gallery_items), run_log.render(initial_log, footer), None, full_paths
+        
+        # 화면 갱신은 초당 최대 N번으로 묶어서 (장면마다 전체 로그/갤러리를 다시 보내지 않음)
+        throttle = UpdateThrottle()
+        
+        # 동시 처리 (asyncio, 단일 스레드)
+        # 완료되는 대로 처리
+        # 장면은 일정 개수씩만 제출 (NANO_BANANA_SCENE_WINDOW), 끝난 장면의 결과는 기록 후 바로 버림
+        # 결과가 뜸해도 건너뛴 갱신은 간격이 지나면 내보냄 (trailing이 None을 끼워 넣음)
+        async for result in throttle.trailing(generate_scenes(
+                generator, source, temp_dir, max_retries, max_workers, pending_indices,
+                session_id=session_id, scheduler=scheduler, budget=budget)):
+            if result is not None:
                 scene = result['scene']
+            
+                completed += 1
+                # 🗂️ 완료 즉시 manifest에 기록 (프로세스가 죽어도 재개 가능)
+                await asyncio.to_thread(journal.record, result)
+                run_log.add_result(result, scene.get('TITLE', 'Untitled'))
+            
+                if result['success']:
+                    filepath = result['filepath']
+                    full_paths.append(filepath)
+                    gallery_items.append(result.get('preview', filepath))
                 
-                with lock:
-                    completed += 1
-                    
-                    if result['success']:
-                        filepath = result['filepath']
-                        filepaths_dict[scene_idx] = filepath
-                        
-                        # Gallery 데이터 업데이트 (파일 경로 사용)
-                        gallery_data[scene_idx] = filepath
-                        
-                        logs[scene_idx] = f"✅ Scene {scene_idx + 1}: {scene.get('TITLE', 'Untitled')}"
-                    else:
-                        logs[scene_idx] = f"❌ Scene {scene_idx + 1}: {result['error']}"
-                    
-                    # 로그 생성
-                    log_text = f"🎬 Progress: {completed}/{total_scenes} scenes completed\n\n"
-                    log_text += "\n".join(logs)
-                    log_text += f"\n\n🇰🇷 Modern Korean people (2020s) | Contemporary clothing & settings | Clean background for illustrations | 16:9 Format | PNG"
-                    
-                    # None이 아닌 파일 경로만 필터링
-                    current_gallery = [fp for fp in gallery_data if fp is not None]
-                    
-                    # 실시간 업데이트
-                    progress(completed / total_scenes, desc=f"Completed: {completed}/{total_scenes}")
-                    yield current_gallery, log_text, None
-        
+                    with generator.metrics.timer("zip_add"):
+                        await asyncio.to_thread(zip_writer.add_output, filepath, result.pop('image_bytes', None))
+            
+            if not throttle.ready(force=result is None or completed == total_scenes):
+                continue
+            
+            # 로그 생성 (최근 이벤트만 - 장면 수와 무관한 크기)
+            header = f"🗂️ Run ID: {journal.run_id}\n"
+            header += f"🎬 Progress: {completed}/{total_scenes} scenes completed"
+            status = f"{generator.cache.stats_line()}\n{generator.key_pool.status_line()}"
+            status += f"\n{generator.concurrency.status_line()}"
+            status += f"\n{scheduler.status_line(session_id)}"
+            status += f"\n{budget.projection_line(total_scenes - completed)}"
+            
+            # 부분 ZIP (항목 수가 두 배가 될 때마다만 갱신 - Gradio가 매번 파일 전체를 복사하므로, 그 사이에는 다운로드 버튼 유지)
+            zip_update = gr.update()
+            if completed < total_scenes and await asyncio.to_thread(zip_writer.checkpoint):
+                zip_update = zip_writer.zip_path
+                status += f"\n📦 Partial ZIP ready: {zip_writer.count} images"
+            
+            # 실시간 업데이트
+            progress(completed / total_scenes, desc=f"Completed: {completed}/{total_scenes}")
+            yield list(gallery_items), run_log.render(header, f"{status}\n\n{footer}"), zip_update, full_paths
+
         # 최종 로그
-        final_log = f"🎉 Generation complete! {len(filepaths_dict)}/{total_scenes} scenes generated.\n\n"
-        final_log += "\n".join(logs)
-        final_log += f"\n\n🇰🇷 Modern Korean people (2020s) | Contemporary clothing & settings | Clean background for illustrations | 16:9 Format | PNG"
-        
-        # ZIP 파일 생성
-        zip_path = None
-        if len(filepaths_dict) > 0:
-            try:
-                zip_path = create_zip_file(filepaths_dict, scenes)
-                final_log += f"\n\n📦 ZIP file ready! Click the download button below."
-                final_log += f"\n   File: {os.path.basename(zip_path)}"
-                final_log += f"\n   Contains: {len(filepaths_dict)} PNG images"
-            except Exception as e:
-                final_log += f"\n\n⚠️ Failed to create ZIP file: {e}"
+        final_log = f"🗂️ Run ID: {journal.run_id}\n"
+        final_log += f"🎉 Generation complete! {len(full_paths)}/{total_scenes} scenes generated."
+        final_log = run_log.render(final_log, f"{generator.cache.stats_line()}\n\n{footer}")
+        
+        # ZIP 파일 마무리 (마지막 장면과 함께 이미 추가됨)
+        zip_path = zip_writer.close()
+        
+        # 📊 실행 요약 (단계별 시간/카운터) - 실행 디렉토리에 metrics.json
+        metrics_path = await asyncio.to_thread(
+            generator.metrics.write_summary, os.path.join(journal.run_dir, "metrics.json"),
+            run_id=journal.run_id, total_scenes=total_scenes, succeeded=len(full_paths),
+            keys=generator.key_pool.summary(),
+            concurrency=generator.concurrency.summary() if generator.concurrency is not None else None,
+            budget=budget.summary()
+        )
+        final_log += f"\n{budget.projection_line(total_scenes - completed)}"
+        if budget.stopped:
+            final_log += f"\n{budget.stopped_line(total_scenes - completed)}"
+        final_log += f"\n{generator.metrics.stage_line()}"
+        final_log += f"\n{geometry_line(generator.metrics)}"
+        if generator.concurrency is not None:
+            final_log += f"\n{generator.concurrency.history_line()}"
+        if len(generator.key_pool.slots) > 1:
+            final_log += f"\n{generator.key_pool.keys_line()}"
+        final_log += f"\n📊 Metrics summary: {metrics_path}"
+        final_log += f"\n{await asyncio.to_thread(store.usage_line)}"
+        
+        if not full_paths:
+            os.remove(zip_path)
+            zip_path = None
+        else:
+            final_log += f"\n\n📦 ZIP file ready! Click the download button below."
+            final_log += f"\n   File: {os.path.basename(zip_path)}"
+            final_log += f"\n   Contains: {len(full_paths)} {generator.encoder['label']} images"
         
-        if len(filepaths_dict) < total_scenes:
+        if len(full_paths) < total_scenes:
             final_log += "\n\n⚠️ Some scenes failed. Check billing settings."
+            final_log += f"\n♻️ To retry only failed scenes, enter Run ID {journal.run_id} and click 'Resume Run'."
         
-        # 최종 Gallery 데이터 (None 제거)
-        final_gallery = [fp for fp in gallery_data if fp is not None]
-        
-        yield final_gallery, final_log, zip_path
+        yield list(gallery_items), final_log, zip_path, full_paths
             
     except Exception as e:
-        yield [], f"❌ Error: {e}", None
+        yield [], f"❌ Error: {e}", None, []
     finally:
-        # 임시 디렉토리는 cleanup에서 처리하지 않음 (다운로드 위해 유지)
-        pass
+        # 실행 디렉토리는 다운로드 유예 기간 동안 유지 (이후 output_store 정리 대상)
+        if zip_writer is not None:
+            zip_writer.close()
+        store.release(temp_dir)
+        scheduler.unreserve(session_id, reserved)
 
 
-def generate_single_image(api_key, json_text, scene_index, retry_on_limit, progress=gr.Progress()):
+async def generate_single_image(api_key, json_text, scene_index, retry_on_limit, bypass_cache=False, progress=gr.Progress(), request: gr.Request = None):
     """단일 장면 생성"""
     
     if not api_key:
-        return [], "❌ Please enter your API key", None
+        return [], "❌ Please enter your API key", None, []
     
     try:
-        config_dict = json.loads(json_text)
-    except json.JSONDecodeError as e:
-        return [], f"❌ Invalid JSON: {e}", None
+        source = scene_source_from_text(json_text)
+    except ValueError as e:
+        return [], f"❌ Invalid JSON: {e}", None, []
     
-    # 임시 디렉토리 생성
-    temp_dir = tempfile.mkdtemp(prefix="nano_banana_")
+    # 출력 저장소의 실행 디렉토리 생성 (크기/기간 제한으로 자동 정리)
+    store = get_output_store()
+    await asyncio.to_thread(store.cleanup)
+    # 🧮 단일 장면은 서버 스케줄러에서 배치보다 먼저 처리
+    scheduler = get_scheduler()
+    session_id = session_id_from_request(request)
+    try:
+        scheduler.reserve(session_id, 1)
+    except AdmissionError as e:
+        return [], f"❌ {e}", None, []
+    temp_dir = None
     
     try:
-        generator = NanoBananaGenerator(api_key, config_dict)
-        scenes = config_dict['RUN']['SCENES']
+        # 예약 직후부터 try 안에서 (실행 디렉토리 생성이 실패해도 finally에서 예약 해제)
+        temp_dir = store.new_run_dir("single")
+        store.acquire(temp_dir)
+        
+        generator = NanoBananaGenerator(api_key, source.config, use_cache=not bypass_cache)
+        generator.previews = True
         
         scene_idx = int(scene_index)
         max_retries = 3 if retry_on_limit else 1
-        
-        if 0 <= scene_idx < len(scenes):
-            progress(0.5, desc=f"Generating scene {scene_idx + 1}...")
-            scene = scenes[scene_idx]
-            result = generator.generate_scene(scene, scene_idx, temp_dir, max_retries=max_retries)
+        scene = source.scene(scene_idx)
+        
+        if scene is not None:
+            queue_position = scheduler.queue_position(session_id, priority=True)
+            if queue_position:
+                progress(0.2, desc=f"Queued (position {queue_position})...")
+            async with scheduler.slot(session_id, priority=True):
+                progress(0.5, desc=f"Generating scene {scene_idx + 1}...")
+                result = await generator.generate_scene_async(scene, scene_idx, temp_dir, max_retries=max_retries)
             progress(1.0, desc="Complete!")
             
             if result['success']:
@@ -476,11 +267,14 @@ def generate_single_image(api_key, json_text, scene_index, retry_on_limit, progr
                 
                 # ZIP 파일 생성
                 filepaths_dict = {scene_idx: filepath}
-                zip_path = create_zip_file(filepaths_dict, [scene])
+                zip_path = await asyncio.to_thread(create_zip_file, filepaths_dict, [scene], temp_dir)
                 
-                return [filepath], \
-                       f"✅ Scene {scene_idx + 1} generated successfully!\n\n🇰🇷 Modern Korea (2020s) | 16:9 Format | PNG\n\nFile: {os.path.basename(filepath)}\n\nPrompt:\n{result['prompt']}", \
-                       zip_path
+                cached_mark = " 💾 (cached)" if result.get('cached') else (" 🔁 (shared)" if result.get('deduplicated') else "")
+                if result.get('similar_to'):
+                    cached_mark = f" 🧩 (similar {result['similarity']:.2f} to prompt {result['similar_to']})"
+                return [result.get('preview', filepath)], \
+                       f"✅ Scene {scene_idx + 1} generated successfully!{cached_mark}\n\n🇰🇷 Modern Korea (2020s) | 16:9 Format | {generator.encoder['label']}\n\nFile: {os.path.basename(filepath)}\n\nPrompt:\n{result['prompt']}", \
+                       zip_path, [filepath]
             else:
                 error_msg = f"❌ Failed to generate scene {scene_idx + 1}\n\nError: {result['error']}"
                 if "Rate limit" in result['error'] or "quota" in result['error'].lower():
@@ -488,16 +282,21 @@ def generate_single_image(api_key, json_text, scene_index, retry_on_limit, progr
                     error_msg += "1. Enable billing in Google Cloud Console\n"
                     error_msg += "2. Wait for quota reset\n"
                     error_msg += "3. Enable 'Auto-retry on rate limit'"
-                return [], error_msg, None
+                return [], error_msg, None, []
         else:
-            return [], f"❌ Invalid scene index: {scene_idx}", None
+            return [], f"❌ Invalid scene index: {scene_idx}", None, []
             
     except Exception as e:
-        return [], f"❌ Error: {e}", None
+        return [], f"❌ Error: {e}", None, []
+    finally:
+        if temp_dir is not None:
+            store.release(temp_dir)
+        scheduler.unreserve(session_id, 1)
 
 
 # Gradio Interface
-with gr.Blocks(title="Nano Banana Generator 🇰🇷 (Modern Korea)", theme=gr.themes.Soft()) as demo:
+with gr.Blocks(title="Nano Banana Generator 🇰🇷 (Modern Korea)", theme=gr.themes.Soft(),
+               delete_cache=gradio_delete_cache()) as demo:
     gr.Markdown("""
     # 🌟 Nano Banana Image Generator 🇰🇷 (Modern Korea Edition)
     Generate cinematic images from JSON scene descriptions using **Gemini 2.5 Flash Image**
@@ -510,7 +309,8 @@ with gr.Blocks(title="Nano Banana Generator 🇰🇷 (Modern Korea)", theme=gr.t
             gr.Markdown("### ⚙️ Settings")
             api_key_input = gr.Textbox(
                 label="API Key",
-                placeholder="Enter your Gemini API key",
+                placeholder="Enter your Gemini API key (여러 키는 쉼표로 구분)",
+                info="키마다 할당량을 따로 사용, 429가 난 키는 잠시 제외",
                 type="password"
             )
             
@@ -523,11 +323,39 @@ with gr.Blocks(title="Nano Banana Generator 🇰🇷 (Modern Korea)", theme=gr.t
                 
                 max_workers_slider = gr.Slider(
                     minimum=1,
-                    maximum=10,
-                    value=3,
+                    maximum=100,
+                    value=20,
                     step=1,
-                    label="Parallel Workers",
-                    info="병렬 작업 수 (높을수록 빠름)"
+                    label="Max Parallel Workers",
+                    info="동시 요청 수 상한 (실제 동시성은 지연 시간/429에 따라 자동 조절, 서버 전체 상한은 NANO_BANANA_GLOBAL_CONCURRENCY)"
+                )
+            
+            cache_bypass_checkbox = gr.Checkbox(
+                label="Bypass render cache",
+                value=False,
+                info="캐시 무시하고 항상 새로 생성"
+            )
+            
+            # 💰 실행 예산 - 넘길 것 같으면 새 장면 제출 중단 (0 = 제한 없음)
+            with gr.Row():
+                max_calls_input = gr.Number(
+                    label="Max API calls",
+                    value=MAX_CALLS,
+                    precision=0,
+                    minimum=0,
+                    info="재시도 포함, 0 = 제한 없음"
+                )
+                max_cost_input = gr.Number(
+                    label="Max cost (USD)",
+                    value=MAX_COST,
+                    minimum=0,
+                    info=f"호출당 ${COST_PER_CALL:.2f}로 추정"
+                )
+                max_minutes_input = gr.Number(
+                    label="Max minutes",
+                    value=MAX_MINUTES,
+                    minimum=0,
+                    info="경과 시간 상한"
                 )
             
             gr.Markdown("""
@@ -585,6 +413,15 @@ with gr.Blocks(title="Nano Banana Generator 🇰🇷 (Modern Korea)", theme=gr.t
                 with gr.Tab("Generate All (Parallel)"):
                     generate_all_btn = gr.Button("🚀 Generate All Scenes", variant="primary", size="lg")
                     
+                    with gr.Row():
+                        resume_run_input = gr.Textbox(
+                            label="Run ID",
+                            placeholder="e.g. 20250101_120000_ab12cd",
+                            info="실패/누락 장면만 다시 생성",
+                            scale=3
+                        )
+                        resume_btn = gr.Button("♻️ Resume Run", scale=1)
+                    
                 with gr.Tab("Generate Single"):
                     scene_selector = gr.Number(
                         label="Scene Index (0-based)",
@@ -605,6 +442,12 @@ with gr.Blocks(title="Nano Banana Generator 🇰🇷 (Modern Korea)", theme=gr.t
                 object_fit="contain",
                 type="filepath"
             )
+            # 갤러리 순서대로 원본 경로 (서버에만 보관)
+            full_res_state = gr.State([])
+            full_res_file = gr.File(
+                label="Selected image (full resolution)",
+                interactive=False
+            )
             
             gr.Markdown("### 📦 Download All (ZIP)")
             download_zip_btn = gr.File(
@@ -621,16 +464,30 @@ with gr.Blocks(title="Nano Banana Generator 🇰🇷 (Modern Korea)", theme=gr.t
             )
     
     # Event handlers
+    output_gallery.select(
+        fn=open_full_resolution,
+        inputs=[full_res_state],
+        outputs=[full_res_file]
+    )
+    
     generate_all_btn.click(
         fn=generate_all_images,
-        inputs=[api_key_input, json_input, retry_checkbox, max_workers_slider],
-        outputs=[output_gallery, output_log, download_zip_btn]
+        inputs=[api_key_input, json_input, retry_checkbox, max_workers_slider, cache_bypass_checkbox,
+                max_calls_input, max_cost_input, max_minutes_input],
+        outputs=[output_gallery, output_log, download_zip_btn, full_res_state]
+    )
+    
+    resume_btn.click(
+        fn=generate_all_images,
+        inputs=[api_key_input, json_input, retry_checkbox, max_workers_slider, cache_bypass_checkbox,
+                max_calls_input, max_cost_input, max_minutes_input, resume_run_input],
+        outputs=[output_gallery, output_log, download_zip_btn, full_res_state]
     )
     
     generate_single_btn.click(
         fn=generate_single_image,
-        inputs=[api_key_input, json_input, scene_selector, retry_checkbox],
-        outputs=[output_gallery, output_log, download_zip_btn]
+        inputs=[api_key_input, json_input, scene_selector, retry_checkbox, cache_bypass_checkbox],
+        outputs=[output_gallery, output_log, download_zip_btn, full_res_state]
     )
     
     gr.Markdown("""
@@ -638,8 +495,8 @@ with gr.Blocks(title="Nano Banana Generator 🇰🇷 (Modern Korea)", theme=gr.t
     ### 💡 사용 방법
     
     **개별 다운로드 (PNG):**
-    1. Gallery에서 이미지 클릭
-    2. 우클릭 → "다른 이름으로 저장"
+    1. Gallery에서 이미지 클릭 (Gallery는 빠른 표시를 위한 작은 미리보기)
+    2. "Selected image (full resolution)"에서 원본 파일 다운로드
     3. **확장자 확인: .png로 저장됨**
     
     **일괄 다운로드 (ZIP):**
@@ -652,8 +509,17 @@ with gr.Blocks(title="Nano Banana Generator 🇰🇷 (Modern Korea)", theme=gr.t
     - **조건부 배경**: 일러스트는 깔끔한 배경, 실사는 현대 한국 배경
     - **현대적 설정**: 모든 실사는 2020년대 현대 한국 (현대 의상, 현대 배경)
     - **PNG 형식**: 모든 이미지가 PNG로 저장 (무손실)
-    - **병렬 처리**: 여러 이미지 동시 생성
-    - **실시간 표시**: 완료 즉시 Gallery 업데이트
+    - **인코더 선택**: `OUTPUT_RULES.encoder` = png / png-fast / webp-lossless / jpeg-hq (`encoder_options`로 세부 조정)
+    - **병렬 처리**: 여러 이미지 동시 생성 (동시성 자동 조절 - 429가 나면 절반으로, 안정적이면 점차 증가)
+    - **공정한 대기열**: 여러 사용자가 서버 전체 동시 요청 수(`NANO_BANANA_GLOBAL_CONCURRENCY`)를 나눠 사용, 단일 장면 생성이 우선
+    - **실시간 표시**: 완료 즉시 Gallery 업데이트 (480px JPEG 미리보기 - `NANO_BANANA_PREVIEW_WIDTH`, 원본은 선택할 때만 전송)
+    - **실행 재개**: 장면마다 manifest 기록, Run ID로 실패/누락 장면만 다시 생성
+    - **대량 장면**: 장면을 하나씩 읽어서 일정 개수(`NANO_BANANA_SCENE_WINDOW`)씩만 제출, JSON Lines 입력도 가능 (첫 줄 = 설정, 이후 한 줄 = 한 장면)
+    - **스트리밍 ZIP**: 완료되는 대로 ZIP에 추가, 생성 중에도 부분 ZIP 다운로드 (`OUTPUT_RULES.zip_compression`: stored/deflated)
+    - **렌더 캐시**: 같은 프롬프트·설정은 API 호출 없이 저장된 이미지 재사용, 동시에 진행 중인 같은 요청은 하나로 합침 ("Bypass render cache"로 끄기)
+    - **실행 예산**: 최대 API 호출 수 / 추정 비용 / 시간을 넘기기 전에 새 장면 제출 중단, 진행 로그에 현재 비용·예상 총비용·ETA 표시 (`NANO_BANANA_MAX_COST` 등으로 기본값)
+    - **유사 프롬프트 재사용**: `NANO_BANANA_SIMILAR_THRESHOLD` (예: 0.9)를 설정하면 공백·스타일 순서·네거티브 항목 정도만 다른 프롬프트도 캐시된 이미지 재사용 (로그와 manifest에 유사도 기록)
+    - **저장 공간 관리**: 오래된 실행은 자동 삭제 (`NANO_BANANA_OUTPUT_MAX_MB`, `NANO_BANANA_OUTPUT_MAX_AGE_HOURS`), 생성·다운로드 중인 실행은 보존
     
     ### 🎨 자동 배경 선택
     - **3D 일러스트/다이어그램**: "illustration", "3D", "diagram" 감지 → 깔끔한 단색 배경
@@ -670,4 +536,6 @@ with gr.Blocks(title="Nano Banana Generator 🇰🇷 (Modern Korea)", theme=gr.t
     """)
 
 if __name__ == "__main__":
+    # 📊 Prometheus /metrics - NANO_BANANA_METRICS_PORT를 지정한 경우만 (기본 끔, NANO_BANANA_METRICS_HOST 기본 127.0.0.1)
+    start_metrics_server()
     demo.launch(share=True)
\ No newline at end of file